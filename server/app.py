@@ -11,23 +11,33 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 import mysql.connector
 import os
+from datetime import timedelta
 from dotenv import load_dotenv
 import db_utils
+import password_hashing
+import user_cache
 from auth_system import auth_bp, attach_blocklist_checker
+from investment_routes import investment_bp, preload as preload_investment
 
 load_dotenv()
 db_utils.initialize_database()
 
+# Fork the hashing pool now, while this process has no other threads
+password_hashing.start()
+
 app = Flask(__name__)
 
-# Configure CORS with specific origins
-CORS(app, origins=['http://localhost:5173', 'http://127.0.0.1:5173'], 
+# Configure CORS with specific origins (asgi.py applies the same list to the routes it serves itself)
+CORS_ORIGINS = ['http://localhost:5173', 'http://127.0.0.1:5173']
+CORS(app, origins=CORS_ORIGINS, 
      methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
      allow_headers=['Content-Type', 'Authorization'])
 
 # Configure JWT
 app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-this')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = False  # Tokens don't expire for now
+# Token lifetime in hours (0 = never expire); revocations are kept until the token would expire
+token_hours = float(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES_HOURS', '24'))
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=token_hours) if token_hours > 0 else False
 jwt = JWTManager(app)
 
 # Attach blocklist checker for logout functionality
@@ -36,23 +46,39 @@ attach_blocklist_checker(jwt)
 # Register the auth blueprint
 app.register_blueprint(auth_bp, url_prefix='/')
 
+# Investment endpoints load the ML stack on first use; ENABLE_INVESTMENT_API=false leaves them out
+# (e.g. for an auth-only deployment) and PRELOAD_INVESTMENT=true loads it at startup instead
+if os.environ.get('ENABLE_INVESTMENT_API', 'true').lower() != 'false':
+    app.register_blueprint(investment_bp, url_prefix='/')
+    if os.environ.get('PRELOAD_INVESTMENT', 'false').lower() == 'true':
+        preload_investment()
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "ok"})
 
 @app.route("/api/db-test")
 def db_test():
-    conn = db_utils.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT NOW()")
-    result = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    with db_utils.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT NOW()")
+        result = cursor.fetchone()
+        cursor.close()
     return jsonify({"db_time": str(result[0])})
 
+@app.route("/api/db-pool", methods=['GET'])
+def db_pool_stats():
+    return jsonify(db_utils.pool_stats())
+
+@app.route("/api/user-cache", methods=['GET'])
+def user_cache_stats():
+    return jsonify(user_cache.cache_stats())
+
 
 # Removed duplicate routes - they are handled by auth_system blueprint
 
+# Development server only; use serve.py in production
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    debug = os.environ.get('FLASK_DEBUG', 'false').lower() == 'true'
+    app.run(host='0.0.0.0', port=port, debug=debug)
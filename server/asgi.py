@@ -0,0 +1,180 @@
+# asgi.py
+#
+# ASGI entry point (python serve.py --mode asgi, or uvicorn asgi:app). /google-auth and
+# /forgot-password spend most of their time waiting on Google's API, SMTP and MySQL, so here they
+# run as coroutines on the event loop with aiohttp, aiosmtplib and aiomysql: a slow upstream holds an
+# open socket instead of a worker thread. Every other request goes to the Flask app, run on a
+# thread pool of WSGI_THREADS threads per worker (a2wsgi), exactly as it behaves under WSGI.
+#
+
+import asyncio
+import json
+import os
+
+from a2wsgi import WSGIMiddleware
+
+import async_db
+import auth_system
+import db_utils
+import password_hashing
+import password_reset
+from app import app as flask_app, CORS_ORIGINS
+
+WSGI_THREADS = int(os.environ.get('WSGI_THREADS', 10))
+# Concurrent requests to Google per worker; more wait for a free connection
+GOOGLE_MAX_CONNECTIONS = int(os.environ.get('GOOGLE_MAX_CONNECTIONS', 100))
+MAX_BODY_BYTES = 64 * 1024
+
+wsgi_app = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+
+_http_session = None
+
+
+def get_http_session():
+    """Shared aiohttp session (keeps connections to Google alive); must be called on the event loop"""
+    global _http_session
+    if _http_session is None:
+        import aiohttp
+        _http_session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=auth_system.GOOGLE_TIMEOUT),
+            connector=aiohttp.TCPConnector(limit=GOOGLE_MAX_CONNECTIONS)
+        )
+    return _http_session
+
+
+async def read_json(receive):
+    """Request body parsed as JSON ({} if it is empty, too large or not JSON)"""
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if len(body) > MAX_BODY_BYTES:
+            return {}
+        if not message.get('more_body'):
+            break
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def send_json(scope, send, payload, status, extra_headers=()):
+    body = json.dumps(payload).encode()
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    headers.extend(extra_headers)
+    # Same CORS answer flask_cors gives for the Flask routes (preflight OPTIONS still goes to Flask)
+    origin = dict(scope['headers']).get(b'origin', b'').decode('latin-1')
+    if origin in CORS_ORIGINS:
+        headers.append((b'access-control-allow-origin', origin.encode('latin-1')))
+        headers.append((b'vary', b'Origin'))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def google_auth(data):
+    """Async /google-auth; same responses as auth_system.google_auth"""
+    import aiohttp
+
+    google_token = data.get('token')
+    if not google_token:
+        return {"msg": "Google token is required"}, 400
+
+    try:
+        async with get_http_session().get(
+            auth_system.GOOGLE_USERINFO_URL, params={'access_token': google_token}
+        ) as google_response:
+            if google_response.status != 200:
+                return {"msg": "Invalid Google token"}, 401
+            google_user = await google_response.json(content_type=None)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return {"msg": f"Error verifying Google token: {str(e)}"}, 500
+
+    email = google_user.get('email')
+    name = google_user.get('name', '')
+
+    if not email:
+        return {"msg": "Email not provided by Google"}, 400
+
+    try:
+        user = await async_db.get_user_by_email(email)
+        if user:
+            user_id, created = user['id'], False
+        else:
+            # New account: bcrypt runs in the hashing pool, so hand the blocking call to a thread
+            import secrets
+            random_password = secrets.token_urlsafe(32)
+            user_id = await asyncio.to_thread(
+                db_utils.add_user, username=email, password=random_password, email=email, full_name=name
+            )
+            created = True
+    except password_hashing.PasswordHashingBusy:
+        raise
+    except Exception as e:
+        return {"msg": f"Error during Google authentication: {str(e)}"}, 500
+
+    with flask_app.app_context():
+        return auth_system.google_account_reply(user_id, created)
+
+
+async def forgot_password(data):
+    """Async /forgot-password; same responses as auth_system.forgot_password"""
+    email = data.get('email')
+
+    if not email:
+        return {"msg": "Email is required"}, 400
+
+    user = await async_db.get_user_by_email(email)
+    if not user:
+        # Return success even if user doesn't exist (security best practice)
+        return {"msg": auth_system.RESET_REQUESTED_MSG}, 200
+
+    token = password_reset.generate_reset_token()
+
+    if await async_db.save_reset_token(email, token):
+        email_sent = await password_reset.send_reset_email_async(email, token, user.get('username', 'User'))
+        return auth_system.forgot_password_reply(token, email_sent)
+
+    # For security, always return 200 even if token generation fails
+    return {"msg": auth_system.RESET_REQUESTED_MSG}, 200
+
+
+ASYNC_ROUTES = {
+    ('POST', '/google-auth'): google_auth,
+    ('POST', '/forgot-password'): forgot_password,
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            get_http_session()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _http_session is not None:
+                await _http_session.close()
+            await async_db.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    handler = ASYNC_ROUTES.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+    if handler is None:
+        await wsgi_app(scope, receive, send)
+        return
+
+    try:
+        payload, status = await handler(await read_json(receive))
+        await send_json(scope, send, payload, status)
+    except password_hashing.PasswordHashingBusy as e:
+        await send_json(scope, send, {"msg": "Server is busy, please try again shortly"}, 503,
+                        [(b'retry-after', str(e.retry_after).encode())])
+    except Exception as e:
+        print(f"Error handling {scope['path']}: {e}")
+        await send_json(scope, send, {"msg": "Internal server error"}, 500)
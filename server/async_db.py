@@ -0,0 +1,72 @@
+# async_db.py
+#
+# aiomysql connection pool for the routes asgi.py serves on the event loop. It uses db_utils'
+# connection settings and DB_POOL_* limits, and is created on first use in each worker process
+# (pools are tied to the event loop that made them) and closed when the server shuts down. The
+# queries mirror their db_utils / password_reset counterparts.
+#
+
+import asyncio
+from datetime import datetime, timedelta
+
+import db_utils
+from db_pool import pool_settings_from_env
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_pool():
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                import aiomysql
+                settings = pool_settings_from_env()
+                _pool = await aiomysql.create_pool(
+                    host=db_utils.db_config["host"],
+                    user=db_utils.db_config["user"],
+                    password=db_utils.db_config["password"],
+                    db=db_utils.db_config["database"],
+                    minsize=1,
+                    maxsize=settings["size"],
+                    pool_recycle=int(settings["max_lifetime"]),
+                    connect_timeout=settings["timeout"],
+                    # The pool closes connections released mid-transaction, so without this
+                    # every read would leave its connection unusable and force a reconnect
+                    autocommit=True,
+                )
+    return _pool
+
+
+async def close():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+async def get_user_by_email(email):
+    """id, username and email of the user with this email, or None"""
+    import aiomysql
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute("SELECT id, username, email FROM users WHERE email=%s LIMIT 1", (email,))
+            return await cur.fetchone()
+
+
+async def save_reset_token(email, token):
+    """Store a reset token valid for an hour; False if no user has this email"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            # Set token expiration to 1 hour from now
+            expires_at = datetime.now() + timedelta(hours=1)
+            await cur.execute("""
+                UPDATE users
+                SET reset_token = %s, reset_token_expires = %s
+                WHERE email = %s
+            """, (token, expires_at, email))
+            return cur.rowcount > 0
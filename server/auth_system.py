@@ -3,27 +3,35 @@
 # Jason Albanus Virginia Tech August 22, 2025
 #
 # Authentication system blueprint. Handles user registration, login, logout, password reset,
-# profile management, stock recommendations, and watchlist functionality with JWT token authentication.
+# profile management, preferences and savings goals with JWT token authentication. Stock and
+# watchlist endpoints live in investment_routes.py.
 #
 
-from flask import request, jsonify, Blueprint
+from flask import request, jsonify, Blueprint, Response
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt
-import bcrypt
+import math
 import mysql.connector
 import os
-import requests
 from dotenv import load_dotenv
 
 import db_utils
+import financial_export
+import password_hashing
 import password_reset
-from ml_models.stock_predictor import get_recommendations, get_stock_details
+import token_revocation
 
 load_dotenv()
 
 # blueprint for auth enpoints
 auth_bp  = Blueprint('auth', __name__)
 
-BLOCKLIST = set()
+MAX_BULK_ENTRIES = int(os.environ.get('MAX_BULK_ENTRIES', 50000))
+
+# Google token verification (also used by the async /google-auth in asgi.py)
+GOOGLE_USERINFO_URL = os.environ.get('GOOGLE_USERINFO_URL', 'https://www.googleapis.com/oauth2/v1/userinfo')
+GOOGLE_TIMEOUT = float(os.environ.get('GOOGLE_TIMEOUT', 10))
+
+RESET_REQUESTED_MSG = "If an account with that email exists, we've sent a password reset link"
 
 # internal db helper for pulling singular user
 def get_user_single(username: str):
@@ -35,6 +43,56 @@ def get_user_single(username: str):
     finally:
         conn.close()
 
+# saturated password hashing pool: tell the client to back off instead of queueing
+@auth_bp.errorhandler(password_hashing.PasswordHashingBusy)
+def hashing_busy(e):
+    response = jsonify({"msg": "Server is busy, please try again shortly"})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+# response helpers shared with /dashboard
+PROFILE_FIELDS = ('id', 'username', 'email', 'full_name', 'phone', 'age', 'occupation', 'annual_income',
+                  'financial_goal', 'risk_tolerance')
+PREFERENCE_FIELDS = ('current_savings', 'monthly_expenses', 'emergency_fund_target', 'monthly_contribution',
+                     'emergency_goal', 'budget_housing_percent', 'budget_food_percent',
+                     'budget_transportation_percent', 'budget_utilities_percent',
+                     'budget_entertainment_percent', 'budget_other_percent')
+
+def profile_payload(user: dict):
+    """Profile fields safe to return to the user"""
+    return {field: user.get(field) for field in PROFILE_FIELDS}
+
+def preferences_payload(preferences):
+    """Preferences with Decimals as floats; every field None when the user has no row"""
+    preferences = preferences or {}
+    result = {}
+    for field in PREFERENCE_FIELDS:
+        value = preferences.get(field)
+        if field == 'emergency_goal' or value is None:
+            result[field] = value
+        else:
+            result[field] = float(value)
+    return result
+
+def forgot_password_reply(token, email_sent):
+    """(body, status) for /forgot-password once the reset token is saved and the email attempted"""
+    if email_sent:
+        return {"msg": "Password reset email sent successfully"}, 200
+    # For development/testing - show the reset link directly
+    reset_url = f"http://localhost:5173/reset-password?token={token}"
+    return {
+        "msg": "Password reset link generated (email not configured)",
+        "reset_link": reset_url,
+        "note": "This is for development only. Configure email for production."
+    }, 200
+
+def google_account_reply(user_id, created):
+    """(body, status) for a Google sign-in; needs an app context to issue the token"""
+    access_token = create_access_token(identity=str(user_id))
+    if created:
+        return {"access_token": access_token, "msg": "Account created successfully"}, 201
+    return {"access_token": access_token, "msg": "Login successful"}, 200
+
 # route helper
 def extract_credentials(data: dict):
     username = (data or {}).get('email') or (data or {}).get('username')
@@ -129,6 +187,8 @@ def handle_register(data: dict):
             "user_id": user_id
         }), 201
         
+    except password_hashing.PasswordHashingBusy:
+        raise
     except mysql.connector.IntegrityError as e:
         if getattr(e, 'errno', None) == 1062:
             return jsonify({"msg": "Email already exists"}), 409
@@ -155,12 +215,16 @@ def login():
         return jsonify({"msg": "Bad credentials"}), 401
 
     stored_hash = user["password_hash"]
-    if isinstance(stored_hash, str):
-        stored_hash = stored_hash.encode('utf-8')
-
-    if not bcrypt.checkpw(password.encode('utf-8'), stored_hash):
+    if not password_hashing.verify_password(password, stored_hash):
         return jsonify({"msg": "Bad credentials"}), 401
 
+    # BCRYPT_ROUNDS changed since this hash was made: re-hash now that we have the password
+    if password_hashing.needs_rehash(stored_hash):
+        try:
+            db_utils.update_password_hash(user["id"], password_hashing.hash_password(password))
+        except (password_hashing.PasswordHashingBusy, mysql.connector.Error) as e:
+            print(f"Skipped password rehash for user {user['id']}: {e}")
+
     access_token = create_access_token(identity=str(user["id"]))
     return jsonify(access_token=access_token), 200
 
@@ -168,9 +232,11 @@ def login():
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    jti = get_jwt().get('jti')
-    if jti:
-        BLOCKLIST.add(jti)
+    claims = get_jwt()
+    if claims.get('jti'):
+        # Shared with every worker and kept until the token would have expired anyway
+        user_id = claims.get('sub')
+        token_revocation.revoke(claims['jti'], int(user_id) if user_id else None, claims.get('exp'))
     return jsonify({"msg": "Successfully logged out"}), 200
 
 @auth_bp.route('/forgot-password', methods=['POST'])
@@ -186,7 +252,7 @@ def forgot_password():
     user = db_utils.get_user_by_email(email)
     if not user:
         # Return success even if user doesn't exist (security best practice)
-        return jsonify({"msg": "If an account with that email exists, we've sent a password reset link"}), 200
+        return jsonify({"msg": RESET_REQUESTED_MSG}), 200
     
     # Generate reset token
     token = password_reset.generate_reset_token()
@@ -194,19 +260,12 @@ def forgot_password():
     # Save token to database
     if password_reset.save_reset_token(email, token):
         # Send email
-        if password_reset.send_reset_email(email, token, user.get('username', 'User')):
-            return jsonify({"msg": "Password reset email sent successfully"}), 200
-        else:
-            # For development/testing - show the reset link directly
-            reset_url = f"http://localhost:5173/reset-password?token={token}"
-            return jsonify({
-                "msg": "Password reset link generated (email not configured)",
-                "reset_link": reset_url,
-                "note": "This is for development only. Configure email for production."
-            }), 200
+        email_sent = password_reset.send_reset_email(email, token, user.get('username', 'User'))
+        body, status = forgot_password_reply(token, email_sent)
+        return jsonify(body), status
     else:
         # For security, always return 200 even if token generation fails
-        return jsonify({"msg": "If an account with that email exists, we've sent a password reset link"}), 200
+        return jsonify({"msg": RESET_REQUESTED_MSG}), 200
 
 @auth_bp.route('/reset-password', methods=['POST'])
 def reset_password():
@@ -227,7 +286,7 @@ def reset_password():
         return jsonify({"msg": "Invalid or expired reset token"}), 400
     
     # Update password
-    hashed = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt())
+    hashed = password_hashing.hash_password(new_password)
     
     conn = db_utils.get_connection()
     try:
@@ -280,24 +339,15 @@ def get_profile():
         return jsonify({"msg": "User not found"}), 404
     
     # Remove sensitive data
-    user_data = {
-        'id': user['id'],
-        'username': user['username'],
-        'email': user['email'],
-        'full_name': user['full_name'],
-        'phone': user['phone'],
-        'age': user['age'],
-        'occupation': user['occupation'],
-        'annual_income': user.get('annual_income'),
-        'financial_goal': user['financial_goal'],
-        'risk_tolerance': user['risk_tolerance']
-    }
+    user_data = profile_payload(user)
     
     return jsonify(user_data), 200
 
 @auth_bp.route('/google-auth', methods=['POST'])
 def google_auth():
     """Handle Google OAuth authentication"""
+    import requests
+    
     data = request.get_json(silent=True) or {}
     google_token = data.get('token')
     
@@ -307,7 +357,7 @@ def google_auth():
     try:
         # Verify the Google token with Google's API
         google_response = requests.get(
-            f'https://www.googleapis.com/oauth2/v1/userinfo?access_token={google_token}'
+            GOOGLE_USERINFO_URL, params={'access_token': google_token}, timeout=GOOGLE_TIMEOUT
         )
         
         if google_response.status_code != 200:
@@ -328,11 +378,8 @@ def google_auth():
         
         if user:
             # User exists, create JWT token
-            access_token = create_access_token(identity=str(user["id"]))
-            return jsonify({
-                "access_token": access_token,
-                "msg": "Login successful"
-            }), 200
+            body, status = google_account_reply(user["id"], created=False)
+            return jsonify(body), status
         else:
             # New user, create account
             # Generate a random password for OAuth users (they won't use it)
@@ -347,14 +394,13 @@ def google_auth():
             )
             
             # Create JWT token
-            access_token = create_access_token(identity=str(user_id))
-            return jsonify({
-                "access_token": access_token,
-                "msg": "Account created successfully"
-            }), 201
+            body, status = google_account_reply(user_id, created=True)
+            return jsonify(body), status
             
     except requests.RequestException as e:
         return jsonify({"msg": f"Error verifying Google token: {str(e)}"}), 500
+    except password_hashing.PasswordHashingBusy:
+        raise
     except Exception as e:
         return jsonify({"msg": f"Error during Google authentication: {str(e)}"}), 500
 
@@ -372,54 +418,8 @@ def get_user_preferences():
     
     preferences = db_utils.get_user_preferences(user_id)
     
-    if not preferences:
-        # Return empty preferences if none exist
-        return jsonify({
-            "current_savings": None,
-            "monthly_expenses": None,
-            "emergency_fund_target": None,
-            "monthly_contribution": None,
-            "emergency_goal": None,
-            "budget_housing_percent": None,
-            "budget_food_percent": None,
-            "budget_transportation_percent": None,
-            "budget_utilities_percent": None,
-            "budget_entertainment_percent": None,
-            "budget_other_percent": None
-        }), 200
-    
-    # Convert Decimal to float for JSON serialization
-    result = {}
-    
-    if preferences.get('current_savings') is not None:
-        result['current_savings'] = float(preferences['current_savings'])
-    else:
-        result['current_savings'] = None
-    
-    if preferences.get('monthly_expenses') is not None:
-        result['monthly_expenses'] = float(preferences['monthly_expenses'])
-    else:
-        result['monthly_expenses'] = None
-    
-    if preferences.get('emergency_fund_target') is not None:
-        result['emergency_fund_target'] = float(preferences['emergency_fund_target'])
-    else:
-        result['emergency_fund_target'] = None
-    
-    if preferences.get('monthly_contribution') is not None:
-        result['monthly_contribution'] = float(preferences['monthly_contribution'])
-    else:
-        result['monthly_contribution'] = None
-    
-    result['emergency_goal'] = preferences.get('emergency_goal')
-    
-    # Budget breakdown fields
-    for field in ['budget_housing_percent', 'budget_food_percent', 'budget_transportation_percent', 
-                  'budget_utilities_percent', 'budget_entertainment_percent', 'budget_other_percent']:
-        if preferences.get(field) is not None:
-            result[field] = float(preferences[field])
-        else:
-            result[field] = None
+    # Convert Decimal to float for JSON serialization (all None if no preferences exist yet)
+    result = preferences_payload(preferences)
     
     return jsonify(result), 200
 
@@ -510,6 +510,58 @@ def update_user_preferences():
         return jsonify({"msg": f"Error updating preferences: {str(e)}"}), 500
 
 
+@auth_bp.route('/goal-projection', methods=['GET'])
+@jwt_required()
+def goal_projection():
+    """
+    Monte Carlo projection of when the savings goal is reached. Defaults come from the user's
+    preferences; current_savings, monthly_contribution, target, annual_return, volatility,
+    years and paths can be overridden as query parameters.
+    """
+    from flask_jwt_extended import get_jwt_identity
+    from ml_models.goal_projection import (
+        DEFAULT_ANNUAL_RETURN, DEFAULT_ANNUAL_VOLATILITY, DEFAULT_PATHS, project_goal
+    )
+    
+    identity = get_jwt_identity()
+    user_id = int(identity) if identity else None
+    
+    if not user_id:
+        return jsonify({"msg": "Invalid token"}), 401
+    
+    preferences = db_utils.get_user_preferences(user_id) or {}
+    
+    def number(name, default):
+        value = request.args.get(name)
+        if value is None or value == '':
+            return float(default) if default is not None else None
+        value = float(value)
+        # inf/nan parse as floats but would overflow int() or end up as bare NaN in the response
+        if not math.isfinite(value):
+            raise ValueError(f"{name} must be finite")
+        return value
+    
+    try:
+        current_savings = number('current_savings', preferences.get('current_savings') or 0)
+        monthly_contribution = number('monthly_contribution', preferences.get('monthly_contribution') or 0)
+        target = number('target', preferences.get('emergency_fund_target'))
+        annual_return = number('annual_return', DEFAULT_ANNUAL_RETURN)
+        annual_volatility = number('volatility', DEFAULT_ANNUAL_VOLATILITY)
+        months = int(number('years', 30) * 12)
+        paths = int(number('paths', DEFAULT_PATHS))
+    except (ValueError, OverflowError):
+        return jsonify({"msg": "Projection parameters must be numbers"}), 400
+    
+    if target is None:
+        return jsonify({"msg": "Set an emergency fund target first (or pass ?target=)"}), 400
+    
+    try:
+        return jsonify(project_goal(current_savings, monthly_contribution, target, annual_return,
+                                    annual_volatility, months, paths)), 200
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+
 @auth_bp.route('/profile', methods=['PUT'])
 @jwt_required()
 def update_profile():
@@ -585,10 +637,10 @@ def update_profile():
         return jsonify({"msg": f"Error updating profile: {str(e)}"}), 500
 
 
-@auth_bp.route('/stock-recommendations', methods=['GET'])
+@auth_bp.route('/monthly-summary/<table_name>', methods=['GET'])
 @jwt_required()
-def get_stock_recommendations():
-    """Get personalized stock recommendations based on user's risk tolerance"""
+def get_monthly_summary(table_name):
+    """Get monthly totals for incomes, expenses or savings (?start=YYYY-MM&end=YYYY-MM)"""
     from flask_jwt_extended import get_jwt_identity
     
     identity = get_jwt_identity()
@@ -597,54 +649,29 @@ def get_stock_recommendations():
     if not user_id:
         return jsonify({"msg": "Invalid token"}), 401
     
-    # Get user's risk tolerance
-    user = db_utils.get_user_by_id(user_id)
-    if not user:
-        return jsonify({"msg": "User not found"}), 404
-    
-    # Map risk_tolerance string to number
-    risk_map = {
-        'conservative': 3,
-        'moderate': 6,
-        'aggressive': 9
-    }
+    if table_name not in db_utils.FINANCIAL_TABLES:
+        return jsonify({"msg": "Unknown table"}), 404
     
-    risk_tolerance_str = user.get('risk_tolerance', 'moderate')
-    risk_tolerance = risk_map.get(risk_tolerance_str, 6)
-    
-    try:
-        # Get recommendations from ML model
-        recommendations = get_recommendations(risk_tolerance)
-        
-        return jsonify({
-            "user_risk_tolerance": risk_tolerance,
-            "user_risk_profile": risk_tolerance_str,
-            "recommendations": recommendations
-        }), 200
-    except Exception as e:
-        return jsonify({"msg": f"Error getting recommendations: {str(e)}"}), 500
-
-
-@auth_bp.route('/stock-details/<ticker>', methods=['GET'])
-@jwt_required()
-def get_stock_detail(ticker):
-    """Get detailed information about a specific stock"""
     try:
-        stock_details = get_stock_details(ticker)
-        
-        if not stock_details:
-            return jsonify({"msg": "Stock not found"}), 404
-        
-        return jsonify(stock_details), 200
+        summary = db_utils.get_monthly_summary(
+            user_id, table_name,
+            start=request.args.get('start'),
+            end=request.args.get('end')
+        )
+    except (ValueError, IndexError):
+        return jsonify({"msg": "start and end must be formatted as YYYY-MM"}), 400
     except Exception as e:
-        return jsonify({"msg": f"Error getting stock details: {str(e)}"}), 500
+        return jsonify({"msg": f"Error getting monthly summary: {str(e)}"}), 500
+    
+    return jsonify({"table": table_name, "months": summary}), 200
 
 
-@auth_bp.route('/watchlist', methods=['GET'])
+@auth_bp.route('/entries/<table_name>', methods=['GET'])
 @jwt_required()
-def get_watchlist():
-    """Get user's stock watchlist"""
+def get_entries_page(table_name):
+    """Get one page of incomes, expenses or savings (?limit=&cursor=&start=&end=)"""
     from flask_jwt_extended import get_jwt_identity
+    from datetime import datetime
     
     identity = get_jwt_identity()
     user_id = int(identity) if identity else None
@@ -652,30 +679,38 @@ def get_watchlist():
     if not user_id:
         return jsonify({"msg": "Invalid token"}), 401
     
-    conn = db_utils.get_connection()
+    if table_name not in db_utils.FINANCIAL_TABLES:
+        return jsonify({"msg": "Unknown table"}), 404
+    
     try:
-        with conn.cursor(dictionary=True) as cur:
-            cur.execute("""
-                SELECT id, stock_ticker, stock_name, current_price, notes, added_at
-                FROM stock_watchlist WHERE user_id=%s
-                ORDER BY added_at DESC
-            """, (user_id,))
-            watchlist = cur.fetchall()
-            
-            # Convert Decimal to float for JSON
-            for item in watchlist:
-                if item.get('current_price'):
-                    item['current_price'] = float(item['current_price'])
-            
-            return jsonify({"watchlist": watchlist}), 200
-    finally:
-        conn.close()
+        limit = int(request.args.get('limit', 100))
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = datetime.fromisoformat(start) if start else None
+        end = datetime.fromisoformat(end) if end else None
+    except (ValueError, TypeError):
+        return jsonify({"msg": "limit must be an integer and start/end ISO dates"}), 400
+    
+    try:
+        page = db_utils.get_entries_page(
+            user_id, table_name,
+            cursor=request.args.get('cursor'),
+            limit=limit,
+            start=start,
+            end=end
+        )
+    except (ValueError, UnicodeDecodeError):
+        return jsonify({"msg": "Invalid cursor"}), 400
+    except Exception as e:
+        return jsonify({"msg": f"Error getting entries: {str(e)}"}), 500
+    
+    return jsonify(page), 200
 
 
-@auth_bp.route('/watchlist', methods=['POST'])
+@auth_bp.route('/entries/<table_name>/bulk', methods=['POST'])
 @jwt_required()
-def add_to_watchlist():
-    """Add stock to user's watchlist"""
+def add_entries_bulk(table_name):
+    """Add many incomes, expenses or savings at once ({"entries": [{"amount", "created_at"}, ...]})"""
     from flask_jwt_extended import get_jwt_identity
     
     identity = get_jwt_identity()
@@ -684,48 +719,32 @@ def add_to_watchlist():
     if not user_id:
         return jsonify({"msg": "Invalid token"}), 401
     
-    data = request.get_json(silent=True) or {}
-    ticker = data.get('ticker')
-    stock_name = data.get('stock_name')
-    current_price = data.get('current_price')
-    notes = data.get('notes')
+    if table_name not in db_utils.FINANCIAL_TABLES:
+        return jsonify({"msg": "Unknown table"}), 404
     
-    if not ticker:
-        return jsonify({"msg": "Stock ticker is required"}), 400
+    data = request.get_json(silent=True)
+    entries = data.get('entries') if isinstance(data, dict) else data
     
-    # Get stock details
-    stock_details = get_stock_details(ticker)
-    if not stock_details:
-        return jsonify({"msg": "Stock not found"}), 404
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"msg": "entries must be a non-empty array"}), 400
     
-    conn = db_utils.get_connection()
-    cursor = conn.cursor()
+    if len(entries) > MAX_BULK_ENTRIES:
+        return jsonify({"msg": f"At most {MAX_BULK_ENTRIES} entries per request"}), 413
     
     try:
-        cursor.execute("""
-            INSERT INTO stock_watchlist (user_id, stock_ticker, stock_name, current_price, notes)
-            VALUES (%s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-                stock_name = VALUES(stock_name),
-                current_price = VALUES(current_price),
-                notes = VALUES(notes)
-        """, (user_id, ticker, stock_name or stock_details['name'], 
-              current_price or stock_details['current_price'], notes))
-        
-        conn.commit()
-        return jsonify({"msg": "Stock added to watchlist"}), 200
+        ids = db_utils.add_entries_bulk(user_id, entries, table_name)
+    except (ValueError, TypeError):
+        return jsonify({"msg": "Every entry needs a numeric amount and an optional ISO created_at"}), 400
     except mysql.connector.Error as e:
-        conn.rollback()
-        return jsonify({"msg": f"Error adding to watchlist: {str(e)}"}), 500
-    finally:
-        cursor.close()
-        conn.close()
+        return jsonify({"msg": f"Error adding entries: {str(e)}"}), 500
+    
+    return jsonify({"msg": "Entries added", "ids": ids}), 201
 
 
-@auth_bp.route('/watchlist/<int:watchlist_id>', methods=['DELETE'])
+@auth_bp.route('/export/<fmt>', methods=['GET'])
 @jwt_required()
-def remove_from_watchlist(watchlist_id):
-    """Remove stock from user's watchlist"""
+def export_financial_history(fmt):
+    """Stream the user's full financial history as csv, ndjson or parquet (?tables=incomes,expenses)"""
     from flask_jwt_extended import get_jwt_identity
     
     identity = get_jwt_identity()
@@ -734,126 +753,27 @@ def remove_from_watchlist(watchlist_id):
     if not user_id:
         return jsonify({"msg": "Invalid token"}), 401
     
-    conn = db_utils.get_connection()
-    cursor = conn.cursor()
+    if fmt not in financial_export.FORMATS:
+        return jsonify({"msg": "Format must be csv, ndjson or parquet"}), 400
+    
+    tables = request.args.get('tables')
+    tables = [t.strip() for t in tables.split(',') if t.strip()] if tables else None
+    if tables and any(t not in db_utils.FINANCIAL_TABLES for t in tables):
+        return jsonify({"msg": "Unknown table"}), 400
     
     try:
-        cursor.execute("""
-            DELETE FROM stock_watchlist WHERE id=%s AND user_id=%s
-        """, (watchlist_id, user_id))
-        
-        conn.commit()
-        
-        if cursor.rowcount == 0:
-            return jsonify({"msg": "Watchlist item not found"}), 404
-        
-        return jsonify({"msg": "Stock removed from watchlist"}), 200
-    except mysql.connector.Error as e:
-        conn.rollback()
-        return jsonify({"msg": f"Error removing from watchlist: {str(e)}"}), 500
-    finally:
-        cursor.close()
-        conn.close()
-
-
-@auth_bp.route('/update-risk-tolerance', methods=['POST'])
-@jwt_required()
-def update_risk_tolerance():
-    """Update user's risk tolerance"""
-    try:
-        claims = get_jwt()
-        user_id = claims.get('user_id')
-        
-        data = request.get_json()
-        risk_tolerance = data.get('risk_tolerance')
-        
-        if risk_tolerance is None or not (1 <= risk_tolerance <= 10):
-            return jsonify({"msg": "Risk tolerance must be between 1 and 10"}), 400
-        
-        conn = db_utils.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            UPDATE users SET risk_tolerance=%s WHERE id=%s
-        """, (risk_tolerance, user_id))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({"msg": "Risk tolerance updated successfully", "risk_tolerance": risk_tolerance}), 200
-    except Exception as e:
-        return jsonify({"msg": f"Error updating risk tolerance: {str(e)}"}), 500
-
-@auth_bp.route('/update-stock-prices', methods=['GET'])
-@jwt_required()
-def update_stock_prices():
-    """Update stock prices with simulated real-time data"""
-    try:
-        claims = get_jwt()
-        user_id = claims.get('user_id')
-        
-        # Get user's risk tolerance to fetch recommendations
-        conn = db_utils.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("SELECT risk_tolerance FROM users WHERE id=%s", (user_id,))
-        user = cursor.fetchone()
-        risk_tolerance = user.get('risk_tolerance', 5) if user else 5
-        
-        cursor.close()
-        conn.close()
-        
-        # Get current recommendations
-        recommendations = get_recommendations(risk_tolerance)
-        
-        # Simulate price updates (in production, this would fetch from real API)
-        import random
-        updated_prices = []
-        for stock in recommendations:
-            # Simulate small price changes (-5% to +5%)
-            price_change_factor = 1 + (random.random() - 0.5) * 0.1
-            new_price = stock['current_price'] * price_change_factor
-            updated_prices.append({
-                'ticker': stock['ticker'],
-                'current_price': round(new_price, 2),
-                'previous_price': stock['current_price']
-            })
-        
-        return jsonify({"prices": updated_prices}), 200
-    except Exception as e:
-        return jsonify({"msg": f"Error updating prices: {str(e)}"}), 500
+        chunks = financial_export.stream_export(user_id, fmt, tables)
+    except financial_export.ExportFormatUnavailable as e:
+        return jsonify({"msg": str(e)}), 501
+    
+    mimetype, extension = financial_export.FORMATS[fmt]
+    return Response(chunks, mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=moneymap-export.{extension}"
+    })
 
-@auth_bp.route('/stock-details/<ticker>', methods=['GET'])
-@jwt_required()
-def get_stock_details_endpoint(ticker):
-    """Get detailed stock information including price history"""
-    try:
-        stock_details = get_stock_details(ticker.upper())
-        
-        if not stock_details:
-            return jsonify({"msg": "Stock not found"}), 404
-        
-        # Generate price history for risk calculation
-        import random
-        price_history = []
-        base_price = stock_details['current_price']
-        volatility = stock_details.get('volatility', 0.2)
-        
-        for i in range(30, -1, -1):
-            days_ago = i
-            random_change = (random.random() - 0.5) * 2 * volatility
-            price = base_price * (1 - (days_ago / 30) * 0.1) * (1 + random_change)
-            price_history.append(round(max(price * 0.7, price * 1.3), 2))
-        
-        stock_details['price_history'] = price_history
-        
-        return jsonify(stock_details), 200
-    except Exception as e:
-        return jsonify({"msg": f"Error fetching stock details: {str(e)}"}), 500
 
 # blocklist check to jwtmanager
 def attach_blocklist_checker(jwt_manager):
     @jwt_manager.token_in_blocklist_loader
     def _is_token_revoked(jwt_header, jwt_payload):
-        return jwt_payload.get('jti') in BLOCKLIST
\ No newline at end of file
+        return token_revocation.is_revoked(jwt_payload.get('jti'))
\ No newline at end of file
@@ -0,0 +1,64 @@
+# bench_bulk_insert.py
+#
+# Compares importing N entries with per-row add_entry against add_entries_bulk, reporting wall time
+# and server round-trips (the MySQL 'Questions' counter). Runs against the database configured in
+# .env; it creates a throwaway user and deletes it afterwards.
+#
+# Usage: python benchmarks/bench_bulk_insert.py [--rows 10000] [--per-row-rows 1000]
+#
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_utils
+
+
+def questions():
+    with db_utils.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
+            return int(cur.fetchone()[1])
+
+
+def measure(label, rows, fn):
+    # The two status reads themselves count as questions; subtract them
+    before = questions()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    trips = questions() - before - 1
+    print(f"{label:<12} {rows:>8} rows {elapsed:>9.3f}s {rows / elapsed:>10,.0f} rows/s {trips:>8} round-trips")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row vs bulk entry import")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--per-row-rows", type=int, default=1000,
+                        help="rows for the per-row baseline (it is slow; keep it smaller)")
+    parser.add_argument("--table", default="expenses", choices=db_utils.FINANCIAL_TABLES)
+    args = parser.parse_args()
+
+    name = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    user_id = db_utils.add_user(name, uuid.uuid4().hex, name)
+    amounts = [round(random.uniform(1, 500), 2) for _ in range(max(args.rows, args.per_row_rows))]
+
+    try:
+        measure("per-row", args.per_row_rows,
+                lambda: [db_utils.add_entry(user_id, amount, args.table) for amount in amounts[:args.per_row_rows]])
+        measure("bulk", args.rows,
+                lambda: db_utils.add_entries_bulk(user_id, amounts[:args.rows], args.table))
+    finally:
+        with db_utils.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM users WHERE id=%s", (user_id,))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# bench_decrypt.py
+#
+# Compares per-row Fernet decryption (the old get_entries list comprehension) against
+# fernet_batch.decrypt_many with thread and process fan-out at 1k/10k/100k rows.
+#
+# Usage: python benchmarks/bench_decrypt.py [--sizes 1000,10000,100000] [--workers 4]
+#
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet
+
+import fernet_batch
+
+
+def per_row(cipher, tokens):
+    return [float(cipher.decrypt(token).decode()) for token in tokens]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row vs batched Fernet decryption")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--workers", type=int, default=fernet_batch.DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    key = Fernet.generate_key()
+    cipher = Fernet(key)
+    sizes = [int(s) for s in args.sizes.split(",")]
+    tokens_all = [cipher.encrypt(str(i * 1.25).encode()) for i in range(max(sizes))]
+
+    print(f"{'rows':>8} {'mode':<16} {'seconds':>9} {'rows/s':>12} {'speedup':>8}")
+    for size in sizes:
+        tokens = tokens_all[:size]
+        baseline, expected = timed(lambda: per_row(cipher, tokens))
+        print(f"{size:>8} {'per-row':<16} {baseline:>9.3f} {size / baseline:>12,.0f} {1.0:>8.2f}")
+
+        modes = [
+            ("batch-inline", dict(workers=1)),
+            ("batch-thread", dict(workers=args.workers, executor="thread")),
+            ("batch-process", dict(workers=args.workers, executor="process", key=key)),
+        ]
+        for label, kwargs in modes:
+            # Warm the pool so executor start-up is not billed to the first size
+            fernet_batch.decrypt_many(cipher, tokens_all[:fernet_batch.INLINE_THRESHOLD], as_float=True, **kwargs)
+            elapsed, got = timed(lambda: fernet_batch.decrypt_many(cipher, tokens, as_float=True, **kwargs))
+            assert got == expected
+            print(f"{size:>8} {label:<16} {elapsed:>9.3f} {size / elapsed:>12,.0f} {baseline / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
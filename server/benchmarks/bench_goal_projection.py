@@ -0,0 +1,54 @@
+# bench_goal_projection.py
+#
+# Times the Monte Carlo goal projection (default 100,000 paths x 360 months) inline and across a
+# process pool, then the cached repeat. Also confirms the pool gives bit-identical results, since
+# chunk RNG streams don't depend on the worker count.
+#
+# Usage: python benchmarks/bench_goal_projection.py [--paths 100000] [--months 360] [--workers 4]
+#
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_models import goal_projection
+
+
+def timed(label, paths, months, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<14} {elapsed * 1000:>10.1f} ms {paths * months / elapsed:>16,.0f} path-months/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo goal projection timings")
+    parser.add_argument("--paths", type=int, default=100000)
+    parser.add_argument("--months", type=int, default=360)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    params = dict(current_savings=2500, monthly_contribution=250, target=20000,
+                  months=args.months, paths=args.paths)
+    inline = timed("inline", args.paths, args.months,
+                   lambda: goal_projection.project_goal(**params, workers=1))
+    goal_projection.clear_cache()
+    # First pool call includes starting the workers; time a second, uncached run as well
+    timed("pool (cold)", args.paths, args.months,
+          lambda: goal_projection.project_goal(**params, workers=args.workers))
+    goal_projection.clear_cache()
+    pooled = timed(f"pool x{args.workers}", args.paths, args.months,
+                   lambda: goal_projection.project_goal(**params, workers=args.workers))
+    timed("cached", args.paths, args.months, lambda: goal_projection.project_goal(**params))
+
+    assert pooled == inline, "pool and inline results differ"
+    print(f"P(reached in {args.months} months) = {inline['probability_reached']}, "
+          f"median {inline['months_to_target']['p50']} months")
+
+
+if __name__ == "__main__":
+    main()
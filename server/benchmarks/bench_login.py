@@ -0,0 +1,87 @@
+# bench_login.py
+#
+# Login burst against password verification. A fixed number of request threads each verify
+# passwords back to back through a PasswordHasher, for several pool sizes (0 = bcrypt on the
+# request thread, as before). Reports throughput, latency percentiles, how many attempts were
+# turned away with PasswordHashingBusy (503) and how much CPU the request threads themselves used.
+#
+# Usage: python benchmarks/bench_login.py [--workers 0,1,2,4] [--threads 16] [--logins 200] [--rounds 10]
+#
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+import bcrypt
+
+from password_hashing import PasswordHasher, PasswordHashingBusy
+
+
+def run_burst(workers, threads, logins, rounds, max_pending, stored_hash):
+    hasher = PasswordHasher(workers=workers, max_pending=max_pending, rounds=rounds)
+    if workers > 0:
+        hasher.verify_password("warm-up", stored_hash)  # start the pool outside the timing
+    latencies = []
+    rejected = [0]
+    thread_cpu = [0.0]
+    lock = threading.Lock()
+    per_thread = logins // threads
+
+    def client():
+        cpu_start = time.thread_time()
+        for _ in range(per_thread):
+            started = time.perf_counter()
+            try:
+                ok = hasher.verify_password("correct horse battery staple", stored_hash)
+                assert ok
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+            except PasswordHashingBusy as e:
+                with lock:
+                    rejected[0] += 1
+                time.sleep(min(e.retry_after, 0.05))  # a client backing off
+        with lock:
+            thread_cpu[0] += time.thread_time() - cpu_start
+
+    pool = [threading.Thread(target=client) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+
+    latencies.sort()
+    pct = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000 if latencies else float('nan')
+    return len(latencies) / elapsed, pct(0.5), pct(0.95), rejected[0], thread_cpu[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark login throughput across hashing pool sizes")
+    parser.add_argument("--workers", default="0,1,2,4", help="pool sizes to compare (0 = inline)")
+    parser.add_argument("--threads", type=int, default=16, help="concurrent request threads")
+    parser.add_argument("--logins", type=int, default=200, help="login attempts per run")
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost")
+    parser.add_argument("--max-pending", type=int, default=None, help="queue bound (default 4 x workers)")
+    args = parser.parse_args()
+
+    stored_hash = bcrypt.hashpw(b"correct horse battery staple", bcrypt.gensalt(args.rounds))
+    print(f"{os.cpu_count()} CPUs, bcrypt cost {args.rounds}, {args.threads} request threads, "
+          f"{args.logins} logins per run\n")
+    print(f"{'workers':>7} {'pending':>7} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'503s':>6} "
+          f"{'request-thread CPU s':>21}")
+    for workers in [int(w) for w in args.workers.split(",")]:
+        max_pending = args.max_pending or max(workers, 1) * 4
+        rate, p50, p95, rejected, cpu = run_burst(workers, args.threads, args.logins, args.rounds,
+                                                  max_pending, stored_hash)
+        print(f"{workers:>7} {max_pending:>7} {rate:>9.1f} {p50:>8.1f} {p95:>8.1f} {rejected:>6} {cpu:>21.2f}")
+
+
+if __name__ == "__main__":
+    main()
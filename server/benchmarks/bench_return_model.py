@@ -0,0 +1,99 @@
+# bench_return_model.py
+#
+# Trains the return model on the local market data store into a temporary directory, then
+# measures (1) cold load in a fresh interpreter: memory-mapped .npy artifact vs a joblib-pickled
+# scikit-learn pipeline (which also has to import scikit-learn), and (2) batch inference latency
+# over synthetic feature matrices of increasing size, plus scoring the stored universe end to end.
+#
+# Usage: python benchmarks/bench_return_model.py [--rows 1000,100000,1000000]
+#
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+import numpy as np
+
+from ml_models import return_model
+from ml_models.market_data import get_store
+
+COLD_LOAD_NPY = """
+import time; start = time.perf_counter()
+from ml_models.return_model import ReturnModel
+model = ReturnModel({path!r}); model.predict(model.feature_mean[None, :])
+print(time.perf_counter() - start)
+"""
+
+COLD_LOAD_JOBLIB = """
+import time; start = time.perf_counter()
+import joblib
+pipeline = joblib.load({path!r}); pipeline.predict([[0.0] * {features}])
+print(time.perf_counter() - start)
+"""
+
+
+def cold_load(script, repeat):
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", script], cwd=SERVER_DIR, check=True,
+                             capture_output=True, text=True).stdout
+        times.append(float(out.strip().splitlines()[-1]))
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Return model cold-load and batch inference timings")
+    parser.add_argument("--rows", default="1000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    import joblib
+    from sklearn.linear_model import RidgeCV
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        path = return_model.train(model_dir=model_dir, log=lambda message: None)
+        model = return_model.ReturnModel(path)
+
+        x, y, _ = return_model.training_set()
+        pipeline = make_pipeline(StandardScaler(), RidgeCV(alphas=[model.metadata["alpha"]])).fit(x, y)
+        pickle_path = os.path.join(model_dir, "pipeline.joblib")
+        joblib.dump(pipeline, pickle_path)
+
+        npy_s = cold_load(COLD_LOAD_NPY.format(path=path), args.repeat)
+        joblib_s = cold_load(COLD_LOAD_JOBLIB.format(path=pickle_path, features=x.shape[1]), args.repeat)
+        print(f"cold load (fresh interpreter, best of {args.repeat})")
+        print(f"  {'npy + mmap':<16} {npy_s * 1000:>9.1f} ms")
+        print(f"  {'joblib sklearn':<16} {joblib_s * 1000:>9.1f} ms")
+
+        print(f"\n{'rows':>10} {'npy ms':>9} {'sklearn ms':>11} {'rows/s (npy)':>15}")
+        rng = np.random.default_rng(0)
+        for rows in [int(r) for r in args.rows.split(",")]:
+            features = rng.normal(size=(rows, x.shape[1])) * x.std(axis=0) + x.mean(axis=0)
+            timings = []
+            for predict in (model.predict, pipeline.predict):
+                best = float("inf")
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    predict(features)
+                    best = min(best, time.perf_counter() - start)
+                timings.append(best)
+            assert np.allclose(model.predict(features[:1000]), pipeline.predict(features[:1000]))
+            print(f"{rows:>10} {timings[0] * 1000:>9.2f} {timings[1] * 1000:>11.2f} {rows / timings[0]:>15,.0f}")
+
+        tickers = get_store().tickers()
+        start = time.perf_counter()
+        model.predict_latest(tickers)
+        print(f"\nstored universe ({len(tickers)} tickers, features + predict): "
+              f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
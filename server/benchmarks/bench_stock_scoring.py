@@ -0,0 +1,100 @@
+# bench_stock_scoring.py
+#
+# Scores and ranks a synthetic stock universe two ways: the original per-dict loop
+# (calculate_risk_score/predict_returns on each dict, then list.sort) and the vectorized
+# StockUniverse path (one NumPy pass over columnar arrays, then argsort).
+#
+# Usage: python benchmarks/bench_stock_scoring.py [--sizes 1000,10000,100000]
+#
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from ml_models.stock_predictor import StockUniverse, RISK_BUCKETS
+
+
+def risk_score_per_dict(stock):
+    beta_norm = min(stock.get('beta', 1.0), 3.0) / 3.0
+    vol_norm = min(stock.get('volatility', 0.3), 1.0)
+    return round((beta_norm * 0.6 + vol_norm * 0.4) * 10, 1)
+
+
+def predicted_return_per_dict(stock):
+    predicted = stock.get('volatility', 0.3) * 30 + (stock.get('beta', 1.0) - 1.0) * 5 + stock.get('dividend_yield', 0) * 2
+    if stock.get('beta', 1.0) < 0.8:
+        predicted = min(predicted, 12.0)
+    elif stock.get('beta', 1.0) > 1.5:
+        predicted = min(predicted, 40.0)
+    else:
+        predicted = min(predicted, 20.0)
+    return round(predicted, 1)
+
+
+def synthetic_universe(size, seed=7):
+    rng = np.random.default_rng(seed)
+    beta = rng.uniform(0.3, 2.5, size).round(2)
+    volatility = rng.uniform(0.1, 0.9, size).round(2)
+    dividend_yield = rng.uniform(0.0, 6.0, size).round(2)
+    price = rng.uniform(5, 900, size).round(2)
+    buckets = rng.integers(0, len(RISK_BUCKETS), size)
+    dicts = {bucket: [] for bucket in RISK_BUCKETS}
+    for i in range(size):
+        dicts[RISK_BUCKETS[buckets[i]]].append({
+            'ticker': f'T{i:06d}', 'name': f'Company {i}', 'current_price': float(price[i]),
+            'beta': float(beta[i]), 'volatility': float(volatility[i]),
+            'dividend_yield': float(dividend_yield[i]), 'sector': 'Technology',
+        })
+    return dicts
+
+
+def rank_per_dict(stock_data):
+    ranked = {}
+    for bucket, stocks in stock_data.items():
+        for stock in stocks:
+            stock['predicted_return_1yr'] = predicted_return_per_dict(stock)
+            stock['risk_score'] = risk_score_per_dict(stock)
+        ranked[bucket] = sorted(stocks, key=lambda x: x['predicted_return_1yr'], reverse=True)
+    return ranked
+
+
+def rank_vectorized(universe):
+    universe.rescore()
+    return {bucket: universe.rank(bucket) for bucket in RISK_BUCKETS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-dict vs vectorized stock scoring")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'stocks':>8} {'mode':<12} {'best ms':>9} {'stocks/s':>14} {'speedup':>8}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        stock_data = synthetic_universe(size)
+        universe = StockUniverse.from_stock_data(stock_data)
+
+        def best_of(fn):
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                result = fn()
+                times.append(time.perf_counter() - start)
+            return min(times), result
+
+        baseline, expected = best_of(lambda: rank_per_dict(stock_data))
+        vectorized, got = best_of(lambda: rank_vectorized(universe))
+        for bucket in RISK_BUCKETS:
+            assert [s['ticker'] for s in expected[bucket]] == list(universe.tickers[got[bucket]])
+
+        print(f"{size:>8} {'per-dict':<12} {baseline * 1000:>9.2f} {size / baseline:>14,.0f} {1.0:>8.1f}")
+        print(f"{size:>8} {'vectorized':<12} {vectorized * 1000:>9.2f} {size / vectorized:>14,.0f} {baseline / vectorized:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# import_time.py
+#
+# Import-time and memory regression check for the API. Each target is imported in a fresh
+# interpreter under `python -X importtime`, several times; the report shows the median total
+# import time, peak RSS and the slowest modules, and the run fails if a target goes over the
+# limits in import_budget.json or loads a module it must not (the API workers must not pull in
+# NumPy or anything under ml_models until an investment endpoint is used).
+#
+# Targets (only the timed part counts; interpreter startup and the setup imports are excluded):
+#   api                   what app.py imports before serving (blueprints, JWT, CORS), without
+#                         the database initialization
+#   investment_first_use  extra cost paid by the first investment request in a running worker:
+#                         the ML modules plus the recommendation snapshot
+#
+# Usage: python benchmarks/import_time.py [--runs 5] [--top 15] [--target api]
+#
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'import_budget.json')
+
+API_IMPORTS = "import flask_cors, flask_jwt_extended\nimport auth_system, investment_routes"
+
+# name -> (untimed setup, timed code)
+TARGETS = {
+    'api': ("", API_IMPORTS),
+    'investment_first_use': (API_IMPORTS, "investment_routes.preload()"),
+}
+
+CHILD = """
+import json as _json, resource as _resource, sys as _sys, time as _time
+{setup}
+_before = set(_sys.modules)
+_rss_before = _resource.getrusage(_resource.RUSAGE_SELF).ru_maxrss / 1024
+_start = _time.perf_counter()
+{code}
+_elapsed = _time.perf_counter() - _start
+_sys.stdout.write(_json.dumps({{
+    'wall_ms': _elapsed * 1000,
+    'rss_mb': _resource.getrusage(_resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'rss_before_mb': _rss_before,
+    'before': sorted(_before),
+    'modules': sorted(_sys.modules),
+}}))
+"""
+
+
+def parse_importtime(stderr: str):
+    """[(module, self_us, cumulative_us, depth)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def run_once(setup: str, code: str):
+    script = CHILD.format(setup=setup, code=code)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        cwd=SERVER_DIR, capture_output=True, text=True, env=child_env(),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'import failed')
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    # Keep only imports made by the timed code. importtime lists a module after its dependencies, so
+    # the cut goes just past the last top-level module that was already loaded before the timer.
+    before = set(result.pop('before'))
+    imports = parse_importtime(proc.stderr)
+    cut = 0
+    for i, (module, _, _, depth) in enumerate(imports):
+        if depth == 0 and module in before:
+            cut = i + 1
+    result['imports'] = imports[cut:]
+    result['import_ms'] = sum(cumulative for _, _, cumulative, depth in result['imports'] if depth == 0) / 1000
+    return result
+
+
+def child_env():
+    env = dict(os.environ)
+    env.setdefault('ENCRYPTION_KEY', 'MDEyMzQ1Njc4OWFiY2RlZjAxMjM0NTY3ODlhYmNkZWY=')
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    return env
+
+
+def measure(name: str, runs: int):
+    results = [run_once(*TARGETS[name]) for _ in range(runs)]
+    results.sort(key=lambda r: r['import_ms'])
+    median = results[len(results) // 2]
+    return {
+        'import_ms': statistics.median(r['import_ms'] for r in results),
+        'wall_ms': statistics.median(r['wall_ms'] for r in results),
+        'rss_mb': max(r['rss_mb'] for r in results),
+        'rss_added_mb': max(r['rss_mb'] - r['rss_before_mb'] for r in results),
+        'modules': median['modules'],
+        'imports': median['imports'],
+    }
+
+
+def check(name: str, measured, budget):
+    """List of budget violations for one target."""
+    problems = []
+    limit = budget.get('max_import_ms')
+    if limit is not None and measured['import_ms'] > limit:
+        problems.append(f"{name}: import time {measured['import_ms']:.0f} ms > {limit} ms")
+    limit = budget.get('max_rss_mb')
+    if limit is not None and measured['rss_mb'] > limit:
+        problems.append(f"{name}: peak RSS {measured['rss_mb']:.1f} MB > {limit} MB")
+    for forbidden in budget.get('forbidden_modules', []):
+        loaded = [m for m in measured['modules'] if m == forbidden or m.startswith(forbidden + '.')]
+        if loaded:
+            problems.append(f"{name}: imports {forbidden} ({len(loaded)} modules)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile API import time and memory against a budget")
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per target (median is reported)')
+    parser.add_argument('--top', type=int, default=15, help='slowest modules to list per target')
+    parser.add_argument('--target', choices=sorted(TARGETS), action='append', help='default: all targets')
+    parser.add_argument('--budget', default=BUDGET_PATH)
+    args = parser.parse_args()
+
+    with open(args.budget) as handle:
+        budgets = json.load(handle)
+
+    problems = []
+    for name in args.target or list(TARGETS):
+        measured = measure(name, args.runs)
+        budget = budgets.get(name, {})
+        print(f"\n{name}: import {measured['import_ms']:.0f} ms (budget {budget.get('max_import_ms', '-')}), "
+              f"wall {measured['wall_ms']:.0f} ms, peak RSS {measured['rss_mb']:.1f} MB "
+              f"(budget {budget.get('max_rss_mb', '-')}, +{measured['rss_added_mb']:.1f} MB here), "
+              f"{len(measured['modules'])} modules loaded")
+        print(f"  {'cumulative ms':>13} {'self ms':>8}  module")
+        slowest = sorted((row for row in measured['imports'] if row[3] <= 1), key=lambda row: -row[2])
+        for module, self_us, cumulative_us, depth in slowest[:args.top]:
+            print(f"  {cumulative_us / 1000:>13.1f} {self_us / 1000:>8.1f}  {'  ' * depth}{module}")
+        problems += check(name, measured, budget)
+
+    print()
+    if problems:
+        for problem in problems:
+            print(f"OVER BUDGET  {problem}")
+        sys.exit(1)
+    print("All targets within budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+# load_test.py
+#
+# Concurrent-connection load test of WSGI vs ASGI serving (serve.py). A local stand-in for
+# Google's userinfo API answers every request after --upstream-delay seconds, and the server is
+# started with GOOGLE_USERINFO_URL pointing at it; clients then hold N connections open, each
+# posting to /google-auth back to back. The stand-in rejects every token, so no database is needed.
+# Under WSGI each waiting request holds one of workers x threads threads; under ASGI it holds only
+# a socket. Reports throughput, latency percentiles and failed requests per concurrency level.
+#
+# The stand-in runs in its own process and the clients speak keep-alive HTTP/1.1 over raw asyncio
+# streams, so on a small machine the load generator takes as little CPU from the server as possible.
+#
+# Usage: python benchmarks/load_test.py [--modes wsgi,asgi] [--concurrency 10,50,200,500]
+#                                       [--seconds 10] [--upstream-delay 0.5] [--workers 1] [--threads 10]
+#
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_upstream(port, delay, ready):
+    """Slow fake of the Google userinfo endpoint (runs in a child process)."""
+    body = b'{"error": "invalid_token"}'
+    response = (b"HTTP/1.1 401 Unauthorized\r\nContent-Type: application/json\r\n"
+                b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+
+    async def handle(reader, writer):
+        # Keep-alive, like the real API, so clients that pool connections can reuse them
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                await asyncio.sleep(delay)
+                writer.write(response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve():
+        server = await asyncio.start_server(handle, "127.0.0.1", port, backlog=4096)
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def start_upstream(port, delay):
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=run_upstream, args=(port, delay, ready), daemon=True)
+    process.start()
+    ready.wait()
+    return process
+
+
+def start_server(mode, port, workers, threads, upstream_url):
+    env = dict(os.environ, GOOGLE_USERINFO_URL=upstream_url, GOOGLE_TIMEOUT="30",
+               ENABLE_INVESTMENT_API="false")
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(SERVER_DIR, "serve.py"), "--mode", mode, "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--threads", str(threads)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{mode} server did not start on port {port}")
+
+
+async def post(reader, writer, request):
+    """Send one keep-alive request and return the response status."""
+    writer.write(request)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def run_level(port, concurrency, seconds, timeout):
+    body = b'{"token": "load-test"}'
+    request = (b"POST /google-auth HTTP/1.1\r\nHost: 127.0.0.1:%d\r\nContent-Type: application/json\r\n"
+               b"Content-Length: %d\r\n\r\n%s" % (port, len(body), body))
+    latencies = []
+    failures = [0]
+    deadline = time.monotonic() + seconds
+
+    async def user():
+        connection = None
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+                status = await asyncio.wait_for(post(*connection, request), timeout)
+                if status != 401:
+                    failures[0] += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                failures[0] += 1
+                if connection is not None:
+                    connection[1].close()
+                connection = None
+        if connection is not None:
+            connection[1].close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pct = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000 if latencies else float('nan')
+    return len(latencies) / elapsed, pct(0.5), pct(0.95), pct(0.99), failures[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare concurrent-connection capacity of WSGI and ASGI modes")
+    parser.add_argument("--modes", default="wsgi,asgi")
+    parser.add_argument("--concurrency", default="10,50,200,500", help="open client connections per level")
+    parser.add_argument("--seconds", type=float, default=10, help="duration of each level")
+    parser.add_argument("--upstream-delay", type=float, default=0.5, help="seconds the fake Google API takes")
+    parser.add_argument("--workers", type=int, default=1, help="server processes")
+    parser.add_argument("--threads", type=int, default=10, help="request threads per process")
+    parser.add_argument("--timeout", type=float, default=30, help="client timeout per request")
+    args = parser.parse_args()
+
+    os.environ.setdefault("ENCRYPTION_KEY", "MDEyMzQ1Njc4OWFiY2RlZjAxMjM0NTY3ODlhYmNkZWY=")
+    upstream_port = free_port()
+    upstream = start_upstream(upstream_port, args.upstream_delay)
+    upstream_url = f"http://127.0.0.1:{upstream_port}/oauth2/v1/userinfo"
+
+    print(f"{os.cpu_count()} CPUs, {args.workers} worker(s) x {args.threads} threads, upstream delay "
+          f"{args.upstream_delay * 1000:.0f} ms, {args.seconds:.0f} s per level")
+    print(f"WSGI ceiling: {args.workers * args.threads / args.upstream_delay:.0f} req/s "
+          f"({args.workers * args.threads} requests in flight)\n")
+    print(f"{'mode':>5} {'conns':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>7}")
+
+    for mode in args.modes.split(","):
+        port = free_port()
+        process = start_server(mode, port, args.workers, args.threads, upstream_url)
+        try:
+            for concurrency in [int(c) for c in args.concurrency.split(",")]:
+                rate, p50, p95, p99, failed = asyncio.run(
+                    run_level(port, concurrency, args.seconds, args.timeout)
+                )
+                print(f"{mode:>5} {concurrency:>6} {rate:>8.1f} {p50:>8.0f} {p95:>8.0f} {p99:>8.0f} {failed:>7}")
+        finally:
+            process.terminate()
+            process.wait()
+    upstream.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# query_plans.py
+#
+# Query plan regression check. Creates (or reuses) a scratch MySQL database, applies the
+# migrations, seeds it with users, entries, preferences and revoked tokens, then calls the hot
+# db_utils and password_reset lookups and the token revocation refresh with the connection pool
+# wrapped so every SELECT/UPDATE/DELETE they issue is EXPLAINed first on the same connection. The
+# SQL checked is exactly what the application runs. Fails (exit 1) if any of those statements does
+# a full table scan (type ALL).
+#
+# Connection settings come from the usual MYSQL_* variables; the scratch database must differ from
+# MYSQL_DB and is only written to by this script.
+#
+# Usage: python benchmarks/query_plans.py [--database moneymap_query_plans] [--users 2000] [--reseed]
+#
+
+import argparse
+import os
+import secrets
+import sys
+from datetime import datetime, timedelta
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+import mysql.connector
+
+import db_utils
+import migrate
+import password_reset
+import token_revocation
+
+ENTRY_TABLES = ("incomes", "expenses", "savings")
+SCANNED_STATEMENTS = ("SELECT", "UPDATE", "DELETE")
+
+
+class ExplainingCursor:
+    """Cursor proxy that records the EXPLAIN output of each statement before running it."""
+
+    def __init__(self, raw_conn, cursor, recorder):
+        self._raw_conn = raw_conn
+        self._cursor = cursor
+        self._recorder = recorder
+
+    def execute(self, sql, params=None):
+        if sql.lstrip().split(None, 1)[0].upper() in SCANNED_STATEMENTS:
+            explain = self._raw_conn.cursor(dictionary=True, buffered=True)
+            try:
+                explain.execute("EXPLAIN " + sql, params)
+                self._recorder.record(sql, explain.fetchall())
+            finally:
+                explain.close()
+        return self._cursor.execute(sql, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+        return False
+
+
+class ExplainingConnection:
+    def __init__(self, conn, recorder):
+        self._conn = conn
+        self._recorder = recorder
+
+    def cursor(self, *args, **kwargs):
+        return ExplainingCursor(self._conn, self._conn.cursor(*args, **kwargs), self._recorder)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._conn.close()
+        return False
+
+
+class PlanRecorder:
+    def __init__(self):
+        self.label = None
+        self.plans = []  # (label, sql, explain rows)
+
+    def record(self, sql, rows):
+        self.plans.append((self.label, " ".join(sql.split()), rows))
+
+
+def prepare_database(name):
+    if name == os.getenv("MYSQL_DB", os.getenv("DB_NAME", "moneymap")):
+        raise SystemExit(f"Refusing to use the application database {name!r}; pass a scratch --database")
+    settings = {k: v for k, v in db_utils.db_config.items() if k != "database"}
+    conn = mysql.connector.connect(**settings)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE DATABASE IF NOT EXISTS `{name}`")
+    finally:
+        conn.close()
+    # Point the pool at the scratch database before its first connection is made
+    db_utils.db_config["database"] = name
+
+
+def seed(users, entries_per_user, reseed, log=print):
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor() as cur:
+            if reseed:
+                cur.execute("DELETE FROM users")
+            cur.execute("SELECT COUNT(*) FROM users")
+            existing = cur.fetchone()[0]
+            if existing >= users:
+                log(f"Using {existing} existing users")
+                return
+            log(f"Seeding {users - existing} users with {entries_per_user} entries per table")
+            now = datetime.now()
+            rows = []
+            for i in range(existing, users):
+                token = secrets.token_urlsafe(32) if i % 10 == 0 else None
+                rows.append((f"user{i}", "x" * 60, f"user{i}@example.com", "moderate", token,
+                             now + timedelta(hours=1) if token else None))
+            cur.executemany("""
+                INSERT INTO users (username, password_hash, email, risk_tolerance, reset_token, reset_token_expires)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, rows)
+            conn.commit()
+
+            cur.execute("SELECT id FROM users ORDER BY id")
+            user_ids = [row[0] for row in cur.fetchall()][existing:]
+            amounts = db_utils.encrypt_many([100.0] * entries_per_user)
+            for table_name in ENTRY_TABLES:
+                cur.executemany(
+                    f"INSERT INTO {table_name} (user_id, amount_encrypted, created_at) VALUES (%s, %s, %s)",
+                    [(user_id, amount, now - timedelta(days=30 * k))
+                     for user_id in user_ids for k, amount in enumerate(amounts)],
+                )
+            cur.executemany(
+                "INSERT INTO user_preferences (user_id, emergency_fund_target) VALUES (%s, %s)",
+                [(user_id, 10000) for user_id in user_ids],
+            )
+            cur.executemany(
+                "INSERT INTO revoked_tokens (jti, user_id, expires_at, revoked_at) VALUES (%s, %s, %s, %s)",
+                [(secrets.token_hex(16), user_id, now + timedelta(days=1), now - timedelta(hours=k % 24))
+                 for k, user_id in enumerate(user_ids)],
+            )
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def analyze():
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SHOW TABLES")
+            for (table,) in cur.fetchall():
+                cur.execute(f"ANALYZE TABLE `{table}`")
+                cur.fetchall()
+    finally:
+        conn.close()
+
+
+def sample_user():
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute("SELECT id, username, email FROM users WHERE reset_token IS NULL ORDER BY id DESC LIMIT 1")
+            return cur.fetchone()
+    finally:
+        conn.close()
+
+
+def scenarios(user):
+    """(label, call) for each hot lookup, run against one seeded user."""
+    token = secrets.token_urlsafe(32)
+    calls = [
+        ("verify_user", lambda: db_utils.verify_user(user["username"], "not-the-password")),
+        ("get_user_single", lambda: db_utils.get_user_single(user["username"])),
+        ("get_user_by_email", lambda: db_utils.get_user_by_email(user["email"])),
+        ("user_exists_by_email", lambda: db_utils.user_exists_by_email(user["email"])),
+        ("user_exists_by_username", lambda: db_utils.user_exists_by_username(user["username"])),
+        ("get_user_by_id", lambda: db_utils.get_user_by_id(user["id"])),
+        ("get_user_preferences", lambda: db_utils.get_user_preferences(user["id"])),
+        ("get_precomputed_recommendations", lambda: db_utils.get_precomputed_recommendations(user["id"])),
+        ("get_dashboard_data", lambda: db_utils.get_dashboard_data(user["id"])),
+        ("get_monthly_summary", lambda: db_utils.get_monthly_summary(user["id"], "incomes")),
+        ("save_reset_token", lambda: password_reset.save_reset_token(user["email"], token)),
+        ("verify_reset_token", lambda: password_reset.verify_reset_token(token)),
+        ("clear_reset_token", lambda: password_reset.clear_reset_token(token)),
+        # Incremental read; main() builds the filter first so this doesn't rebuild it
+        ("revocation_refresh", lambda: token_revocation._cache.refresh(force=True)),
+    ]
+    for table_name in ENTRY_TABLES:
+        calls.append((f"get_entries_page({table_name})",
+                      lambda t=table_name: db_utils.get_entries_page(user["id"], t, limit=50)))
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN the hot db_utils queries and fail on full table scans")
+    parser.add_argument("--database", default=os.getenv("QUERY_PLAN_DB", "moneymap_query_plans"))
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--entries-per-user", type=int, default=5)
+    parser.add_argument("--reseed", action="store_true", help="delete and re-create the seeded rows")
+    args = parser.parse_args()
+
+    prepare_database(args.database)
+    migrate.migrate()
+    seed(args.users, args.entries_per_user, args.reseed)
+    analyze()
+    user = sample_user()
+    token_revocation._cache.refresh(force=True)
+
+    recorder = PlanRecorder()
+    # Wrap at the pool, so both db_utils.get_connection() and the db_utils.connection() context
+    # manager (which checks out through pool.get_connection) hand out explaining connections
+    pool = db_utils.get_pool()
+    get_connection = pool.get_connection
+    pool.get_connection = lambda: ExplainingConnection(get_connection(), recorder)
+    try:
+        for label, call in scenarios(user):
+            recorder.label = label
+            call()
+    finally:
+        del pool.get_connection
+
+    failures = 0
+    print(f"\n{'call':<34} {'table':<26} {'type':<8} {'key':<24} {'rows':>7}")
+    for label, sql, rows in recorder.plans:
+        for row in rows:
+            scan = row.get("type") == "ALL"
+            failures += scan
+            print(f"{label:<34} {str(row.get('table')):<26} {str(row.get('type')):<8} "
+                  f"{str(row.get('key')):<24} {str(row.get('rows')):>7}{'  FULL SCAN' if scan else ''}")
+            if scan:
+                print(f"    {sql}")
+
+    print(f"\n{len(recorder.plans)} statements checked, {failures} full table scan(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# verify_rolling_stats.py
+#
+# Checks the incremental RollingStats tracker against a full recompute. A synthetic universe (with
+# randomly missing bars) is fed one day at a time; at sampled days the tracker's volatility, beta
+# and moving averages are compared with the cumulative-sum functions in ml_models.analytics and a
+# direct mean over the closes. Also reports the per-day update cost next to recomputing the whole window.
+#
+# Finally checks the production path end to end on a copy of the fixture store: a bar appended to
+# the store must be ingested incrementally by the shared tracker and change the beta, volatility
+# and risk score that get_stock_details serves once the snapshot notices the new data. A bar
+# appended for a day the tracker already ingested (the benchmark's bar landed first) must end up
+# in the served metrics too: the shared tracker has to match a fresh one and compute_metrics.
+#
+# Usage: python benchmarks/verify_rolling_stats.py [--tickers 2000] [--days 1500] [--window 252]
+#
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from ml_models import market_data, rolling_stats, stock_predictor
+from ml_models.analytics import compute_metrics, log_returns, rolling_beta, rolling_volatility
+
+
+def synthetic_prices(tickers, days, missing, seed=5):
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0.0003, 0.01, days)
+    betas = rng.uniform(0.3, 2.2, tickers)
+    prices = 100 * np.exp(np.cumsum(market[:, None] * betas + rng.normal(0, 0.015, (days, tickers)), axis=0))
+    prices[rng.random((days, tickers)) < missing] = np.nan
+    return prices, 400 * np.exp(np.cumsum(market))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental rolling stats vs full recompute")
+    parser.add_argument("--tickers", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=1500)
+    parser.add_argument("--window", type=int, default=252)
+    parser.add_argument("--missing", type=float, default=0.01, help="fraction of bars dropped")
+    parser.add_argument("--resync-every", type=int, default=10 ** 9,
+                        help="disable periodic resync so drift would show up")
+    args = parser.parse_args()
+
+    rolling_stats.RESYNC_EVERY = args.resync_every
+    prices, benchmark = synthetic_prices(args.tickers, args.days, args.missing)
+    days = np.arange(args.days)
+    returns = log_returns(prices)
+    benchmark_returns = log_returns(benchmark.reshape(-1, 1))[:, 0]
+    # min_periods=2 so windows with missing bars are compared too, as the tracker reports them
+    expected = {
+        "volatility": rolling_volatility(returns, args.window, min_periods=2),
+        "beta": rolling_beta(returns, benchmark_returns, args.window, min_periods=2),
+    }
+    tracker = rolling_stats.RollingStats([f"T{j}" for j in range(args.tickers)], args.window)
+
+    checkpoints = set(np.linspace(args.window + 1, args.days - 1, 8).astype(int))
+    worst = {"volatility": 0.0, "beta": 0.0, "sma": 0.0}
+    update_s = 0.0
+    for t in days:
+        start = time.perf_counter()
+        tracker.update(t, prices[t], benchmark[t])
+        update_s += time.perf_counter() - start
+        if t not in checkpoints:
+            continue
+        for name, got in (("volatility", tracker.volatility()), ("beta", tracker.beta())):
+            # The full recompute only reports complete windows; the tracker also covers partial ones
+            want = expected[name][t - 1]
+            assert np.isfinite(got[np.isfinite(want)]).all(), f"{name} missing on day {t}"
+            got = np.where(np.isfinite(want), got, np.nan)
+            worst[name] = max(worst[name], float(np.nanmax(np.abs(got - want) / np.abs(want), initial=0.0)))
+        for k in tracker.sma_windows:
+            recent = prices[t - k + 1:t + 1]
+            want = np.where(np.isfinite(recent).all(axis=0), np.nanmean(recent, axis=0), np.nan)
+            got = tracker.moving_average(k)
+            assert np.array_equal(np.isnan(got), np.isnan(want)), f"sma_{k} NaN mismatch on day {t}"
+            worst["sma"] = max(worst["sma"], float(np.nanmax(np.abs(got - want) / want, initial=0.0)))
+
+    for name, error in worst.items():
+        assert error < 1e-8, f"{name} drifted: relative error {error:.2e}"
+        print(f"{name:<11} max relative error {error:.2e}")
+
+    start = time.perf_counter()
+    rolling_volatility(returns[-args.window:], args.window)
+    rolling_beta(returns[-args.window:], benchmark_returns[-args.window:], args.window)
+    recompute_s = time.perf_counter() - start
+    per_day = update_s / args.days
+    print(f"incremental update {per_day * 1000:.3f} ms/day for {args.tickers} tickers; "
+          f"full-window recompute {recompute_s * 1000:.3f} ms ({recompute_s / per_day:.1f}x)")
+    check_served_metrics()
+    check_late_append()
+    print("OK")
+
+
+def check_served_metrics(ticker="AAPL"):
+    root = tempfile.mkdtemp(prefix="market-")
+    try:
+        store = market_data.MarketDataStore(root)
+        store.import_csv_dir(market_data.FIXTURE_DIR)
+        market_data._store = store
+        stock_predictor.SNAPSHOT_CHECK_SECONDS = 0
+        before = stock_predictor.get_stock_details(ticker)
+        updates = rolling_stats.get_tracker().updates
+
+        history = store.history(ticker)
+        benchmark = store.history(market_data.BENCHMARK_TICKER)
+        day = str(history.dates[-1] + np.timedelta64(1, "D"))
+        store.append(ticker, [(day, 1, 1, 1, float(history.closes[-1]) * 1.25, 0)])
+        store.append(market_data.BENCHMARK_TICKER, [(day, 1, 1, 1, float(benchmark.closes[-1]) * 1.05, 0)])
+
+        after = stock_predictor.get_stock_details(ticker)
+        tracker = rolling_stats.get_tracker()
+        assert tracker.updates == updates + 1, "appended bar was not ingested incrementally"
+        for field in ("beta", "volatility", "risk_score"):
+            assert after[field] != before[field], f"{field} unchanged after appending a bar"
+        print(f"served {ticker}: beta {before['beta']} -> {after['beta']}, "
+              f"volatility {before['volatility']} -> {after['volatility']}, "
+              f"risk score {before['risk_score']} -> {after['risk_score']}")
+    finally:
+        market_data._store = None
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def check_late_append(ticker="TSLA"):
+    root = tempfile.mkdtemp(prefix="market-")
+    try:
+        store = market_data.MarketDataStore(root)
+        store.import_csv_dir(market_data.FIXTURE_DIR)
+        market_data._store = store
+        rolling_stats.get_tracker()
+
+        # Same order as the per-ticker append CLI: the benchmark's bar for the day lands first and a
+        # refresh ingests the day before the ticker's bar for it arrives
+        history = store.history(ticker)
+        benchmark = store.history(market_data.BENCHMARK_TICKER)
+        day = str(benchmark.dates[-1] + np.timedelta64(1, "D"))
+        store.append(market_data.BENCHMARK_TICKER, [(day, 1, 1, 1, float(benchmark.closes[-1]) * 0.97, 0)])
+        rolling_stats.get_tracker()
+        store.append(ticker, [(day, 1, 1, 1, float(history.closes[-1]) * 0.9, 0)])
+
+        served = rolling_stats.get_tracker().metrics()[ticker]
+        fresh = rolling_stats.RollingStats(store.tickers())
+        fresh.sync(store)
+        expected = fresh.metrics()[ticker]
+        full = compute_metrics([ticker], store=store)[ticker]
+        for field in ("volatility", "beta", "observations"):
+            for name, want in (("fresh tracker", expected[field]), ("full recompute", full[field])):
+                assert abs(served[field] - want) <= 1e-9 * max(abs(want), 1), \
+                    f"late {ticker} bar: served {field} {served[field]} != {name} {want}"
+        print(f"late {ticker} bar: volatility {served['volatility']:.4f}, beta {served['beta']:.4f} "
+              f"from {served['observations']} returns, matching a full recompute")
+    finally:
+        market_data._store = None
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# make_market_fixtures.py
+#
+# Generates the offline OHLCV CSV fixtures in data/market_fixtures/ used to seed the local market
+# data store. Prices are synthetic: a seeded random walk per ticker whose beta against SPY and
+# annual volatility match STOCK_DATA, scaled so the last close equals the listed current price.
+#
+# Usage (from server/): python data/make_market_fixtures.py [--days 504]
+#
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_models.stock_predictor import STOCK_DATA, RISK_BUCKETS
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "market_fixtures")
+BENCHMARK = ("SPY", 0.16, 0.07, 571.50)  # ticker, annual volatility, annual drift, last close
+END_DATE = np.datetime64("2025-09-30")
+
+
+def business_days(count):
+    days = np.arange(END_DATE - np.timedelta64(count * 2, "D"), END_DATE + np.timedelta64(1, "D"))
+    days = days[np.is_busday(days)]
+    return days[-count:]
+
+
+def write_csv(path, dates, closes, rng):
+    # Intraday range and volume are cosmetic; only closes feed the analytics
+    opens = closes * (1 + rng.normal(0, 0.003, closes.size))
+    highs = np.maximum(opens, closes) * (1 + np.abs(rng.normal(0, 0.006, closes.size)))
+    lows = np.minimum(opens, closes) * (1 - np.abs(rng.normal(0, 0.006, closes.size)))
+    volumes = rng.integers(1_000_000, 50_000_000, closes.size)
+    with open(path, "w") as handle:
+        handle.write("Date,Open,High,Low,Close,Volume\n")
+        for row in zip(dates, opens, highs, lows, closes, volumes):
+            handle.write(f"{row[0]},{row[1]:.2f},{row[2]:.2f},{row[3]:.2f},{row[4]:.2f},{row[5]}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic OHLCV fixtures")
+    parser.add_argument("--days", type=int, default=504)
+    parser.add_argument("--seed", type=int, default=20250930)
+    args = parser.parse_args()
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    rng = np.random.default_rng(args.seed)
+    dates = business_days(args.days)
+
+    ticker, market_vol, market_drift, market_last = BENCHMARK
+    market_returns = rng.normal(market_drift / 252, market_vol / np.sqrt(252), dates.size)
+    closes = np.exp(np.cumsum(market_returns))
+    write_csv(os.path.join(FIXTURE_DIR, f"{ticker}.csv"), dates, closes * market_last / closes[-1], rng)
+
+    for bucket in RISK_BUCKETS:
+        for stock in STOCK_DATA[bucket]:
+            beta, vol = stock["beta"], stock["volatility"]
+            idio_vol = np.sqrt(max(vol ** 2 - (beta * market_vol) ** 2, 0.05 ** 2))
+            returns = beta * market_returns + rng.normal(0.0, idio_vol / np.sqrt(252), dates.size)
+            closes = np.exp(np.cumsum(returns))
+            write_csv(os.path.join(FIXTURE_DIR, f"{stock['ticker']}.csv"), dates,
+                      closes * stock["current_price"] / closes[-1], rng)
+
+
+if __name__ == "__main__":
+    main()
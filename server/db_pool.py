@@ -0,0 +1,310 @@
+# db_pool.py
+#
+# Pooled MySQL connection manager used behind db_utils.get_connection(). Keeps a bounded set of
+# live connections per process, validates them on checkout, evicts idle or over-aged connections,
+# and records wait/utilization metrics.
+#
+# A checked-out connection that is garbage-collected without close() (a call site that raised before
+# reaching it) has its socket closed and its slot given back, so leaks can't exhaust the pool.
+#
+
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+
+
+LEAK_CHECK_INTERVAL = 1.0
+
+
+class PoolTimeoutError(mysql.connector.Error):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class PooledConnection:
+    """
+    Thin proxy around a mysql.connector connection. close() hands the connection back to the
+    pool instead of tearing down the socket, so existing conn.close() call sites keep working.
+    """
+
+    def __init__(self, pool, raw):
+        self._state = [False]  # checked out; shared with the finalizer, which must not reference self
+        self._pool = pool
+        self._raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        weakref.finalize(self, _reclaim_leaked, pool._leaked, raw, self._state)
+
+    @property
+    def _checked_out(self):
+        return self._state[0]
+
+    @_checked_out.setter
+    def _checked_out(self, value):
+        self._state[0] = value
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self._checked_out:
+            self._checked_out = False
+            self._pool._release(self)
+
+    def invalidate(self):
+        """
+        Close the underlying socket instead of returning it to the pool, e.g. after abandoning an
+        unbuffered result set part-way through.
+        """
+        if self._checked_out:
+            self._checked_out = False
+            self._pool._discard(self)
+
+    def _disconnect(self):
+        try:
+            self._raw.close()
+        except Exception:
+            pass
+
+
+def _reclaim_leaked(leaked, raw, state):
+    # Runs from the garbage collector, possibly while this thread holds the pool lock, so it only
+    # queues the slot; the pool takes it back on the next checkout or stats call
+    if state[0]:
+        state[0] = False
+        try:
+            raw.close()
+        except Exception:
+            pass
+        leaked.append(1)
+
+
+class ConnectionPool:
+    """
+    Thread-safe connection pool.
+
+    size          maximum number of open connections held by this process
+    timeout       seconds to wait for a free connection before raising PoolTimeoutError
+    pre_ping      ping connections on checkout and replace dead ones transparently
+    idle_timeout  seconds a connection may sit unused before it is closed
+    max_lifetime  seconds after which a connection is recycled regardless of use
+    """
+
+    def __init__(self, connect_kwargs, size=10, timeout=30.0, pre_ping=True,
+                 idle_timeout=300.0, max_lifetime=3600.0):
+        self._connect_kwargs = dict(connect_kwargs)
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+
+        self._idle = []  # LIFO so the warmest connections are reused first
+        self._open = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._leaked = deque()  # slots of connections collected while checked out
+
+        # Metrics
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._failed_pings = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._peak_in_use = 0
+        self._leaks = 0
+
+    # ---- checkout / release -------------------------------------------------
+
+    def get_connection(self):
+        started = time.monotonic()
+        deadline = started + self.timeout if self.timeout is not None else None
+
+        while True:
+            conn = None
+            with self._cond:
+                self._collect_leaked()
+                while not self._idle and self._open >= self.size:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            msg=f"Timed out after {self.timeout}s waiting for a database connection"
+                        )
+                    # Wake up now and then: a leaked slot comes back without a notify
+                    self._cond.wait(LEAK_CHECK_INTERVAL if remaining is None else min(remaining, LEAK_CHECK_INTERVAL))
+                    self._collect_leaked()
+
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    # Reserve a slot; the socket itself is opened outside the lock.
+                    self._open += 1
+
+            if conn is not None and not self._is_usable(conn):
+                self._discard(conn)
+                continue
+
+            if conn is None:
+                try:
+                    conn = self._new_connection()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+                in_use = self._open - len(self._idle)
+                self._peak_in_use = max(self._peak_in_use, in_use)
+
+            conn._checked_out = True
+            return conn
+
+    def _release(self, conn):
+        conn.last_used = time.monotonic()
+
+        try:
+            # Never hand out a connection with a half-finished transaction.
+            if conn._raw.in_transaction:
+                conn._raw.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+
+        if self._expired(conn, conn.last_used):
+            self._discard(conn, recycled=True)
+            return
+
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection and always return it, even if the block raises."""
+        conn = self.get_connection()
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn._raw.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            conn.close()
+
+    # ---- housekeeping -------------------------------------------------------
+
+    def _collect_leaked(self):
+        # Caller holds self._cond
+        while self._leaked:
+            self._leaked.popleft()
+            self._open -= 1
+            self._leaks += 1
+
+    def _new_connection(self):
+        raw = mysql.connector.connect(**self._connect_kwargs)
+        with self._cond:
+            self._created += 1
+        return PooledConnection(self, raw)
+
+    def _expired(self, conn, now):
+        if self.max_lifetime and now - conn.created_at >= self.max_lifetime:
+            return True
+        return False
+
+    def _is_usable(self, conn):
+        now = time.monotonic()
+        if self._expired(conn, now) or (self.idle_timeout and now - conn.last_used >= self.idle_timeout):
+            with self._cond:
+                self._recycled += 1
+            return False
+
+        if self.pre_ping:
+            try:
+                conn._raw.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._failed_pings += 1
+                return False
+        return True
+
+    def _discard(self, conn, recycled=False):
+        conn._disconnect()
+        with self._cond:
+            self._open -= 1
+            if recycled:
+                self._recycled += 1
+            self._cond.notify()
+
+    def evict_idle(self):
+        """Close idle connections that have outlived idle_timeout or max_lifetime."""
+        now = time.monotonic()
+        stale = []
+        with self._cond:
+            keep = []
+            for conn in self._idle:
+                if self._expired(conn, now) or (self.idle_timeout and now - conn.last_used >= self.idle_timeout):
+                    stale.append(conn)
+                else:
+                    keep.append(conn)
+            self._idle = keep
+        for conn in stale:
+            self._discard(conn, recycled=True)
+        return len(stale)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            self._collect_leaked()
+            in_use = self._open - len(self._idle)
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": in_use,
+                "utilization": round(in_use / self.size, 3),
+                "peak_in_use": self._peak_in_use,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "recycled": self._recycled,
+                "failed_pings": self._failed_pings,
+                "leaked": self._leaks,
+                "wait_avg_ms": round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+def pool_settings_from_env():
+    """Read pool tuning knobs from the environment."""
+    return {
+        "size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() not in ("0", "false", "no"),
+        "idle_timeout": float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+        "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "3600")),
+    }
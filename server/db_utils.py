@@ -3,36 +3,74 @@
 # JJ Feeney III Virginia Tech August 22, 2025
 #
 # Database utility functions for user management, encryption/decryption of sensitive financial data,
-# user preferences, and database initialization with table creation and migration support.
+# user preferences, and the startup schema check (migrations live in migrate.py and migrations/).
 #
 # helper methods for accessing the db just call get user or add user or whatever
 # inally made by jj added og config  and user functions
 
 
 import os
-import bcrypt
+import base64
+import json
+import threading
+from datetime import datetime
 import mysql.connector
 from mysql.connector import Error
 from dotenv import load_dotenv
 from cryptography.fernet import Fernet
 
+import entry_aggregates
+import fernet_batch
+import password_hashing
+import user_cache
+from db_pool import ConnectionPool, pool_settings_from_env
+
 load_dotenv()
 
 #Database configuration
+# MYSQL_* is canonical; the DB_* names password_reset.py used to read are still honoured as fallbacks
 db_config = {
-    "host": os.getenv("MYSQL_HOST", "localhost"),
-    "user": os.getenv("MYSQL_USER", "root"),
-    "password": os.getenv("MYSQL_PASSWORD", ""),
-    "database": os.getenv("MYSQL_DB", "moneymap"),
+    "host": os.getenv("MYSQL_HOST", os.getenv("DB_HOST", "localhost")),
+    "user": os.getenv("MYSQL_USER", os.getenv("DB_USER", "root")),
+    "password": os.getenv("MYSQL_PASSWORD", os.getenv("DB_PASSWORD", "")),
+    "database": os.getenv("MYSQL_DB", os.getenv("DB_NAME", "moneymap")),
 }
 
 #Encryption setup
 ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY").encode()  # Must be 32-byte base64
 cipher = Fernet(ENCRYPTION_KEY)
 
+#DB connection pool (one per process so forked workers never share sockets)
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool(db_config, **pool_settings_from_env())
+                _pool_pid = pid
+    return _pool
+
 #DB connection helper
 def get_connection():
-    return mysql.connector.connect(**db_config)
+    """
+    Check out a pooled connection. Calling close() on it returns it to the pool.
+    """
+    return get_pool().get_connection()
+
+def connection():
+    """
+    Context manager form of get_connection(); the connection is returned to the pool
+    (after a rollback) even if the block raises.
+    """
+    return get_pool().connection()
+
+def pool_stats():
+    return get_pool().stats()
 
 
 #Encryption / Decryption helpers
@@ -46,6 +84,13 @@ def decrypt_value(encrypted_value):
         # If decryption fails (e.g., due to key change), return None
         return None
 
+def decrypt_many(encrypted_values, as_float=False):
+    """
+    Decrypt a batch of values in one call, fanning out across a worker pool for large batches.
+    Undecryptable values come back as None, matching decrypt_value.
+    """
+    return fernet_batch.decrypt_many(cipher, encrypted_values, as_float=as_float, key=ENCRYPTION_KEY)
+
 
 #User helpers
 def add_user(username, password, email, full_name=None, phone=None, age=None, 
@@ -54,7 +99,7 @@ def add_user(username, password, email, full_name=None, phone=None, age=None,
     Add a new user with comprehensive profile information
     """
     # Hash the password
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    hashed = password_hashing.hash_password(password)
     
     # Encrypt sensitive financial data
     annual_income_encrypted = encrypt_value(annual_income) if annual_income else None
@@ -161,8 +206,12 @@ def user_exists_by_username(username: str):
 
 def get_user_by_id(user_id: int):
     """
-    Get user information by ID, including all profile data
+    Get user information by ID, including all profile data (served from user_cache when possible)
     """
+    return user_cache.get("profile", int(user_id), _load_user_by_id)
+
+
+def _load_user_by_id(user_id):
     conn = get_connection()
     try:
         with conn.cursor(dictionary=True) as cur:
@@ -186,71 +235,389 @@ def get_user_by_id(user_id: int):
 
 
 def verify_user(username, password):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT password_hash FROM users WHERE username=%s",
-        (username,)
-    )
-    result = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT password_hash FROM users WHERE username=%s",
+                (username,)
+            )
+            result = cursor.fetchone()
 
     if not result:
         return False
 
     stored_hash = result[0]
-    return bcrypt.checkpw(password.encode(), stored_hash.encode())
+    return password_hashing.verify_password(password, stored_hash)
 
 
-def get_users():
+def update_password_hash(user_id, password_hash):
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, username FROM users")
-    users = [{"id": row[0], "username": row[1]} for row in cursor.fetchall()]
-    cursor.close()
-    conn.close()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE users SET password_hash=%s WHERE id=%s", (password_hash, user_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get_users():
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id, username FROM users")
+            users = [{"id": row[0], "username": row[1]} for row in cursor.fetchall()]
     return users
 
 
 #Generic financial data helpers
+FINANCIAL_TABLES = ("incomes", "expenses", "savings")
+
+def check_financial_table(table_name):
+    # table names are interpolated into SQL, so only ever accept the known ones
+    if table_name not in FINANCIAL_TABLES:
+        raise ValueError(f"Unknown financial table: {table_name}")
+
+
 def add_entry(user_id, amount, table_name):
+    check_financial_table(table_name)
     encrypted_amount = encrypt_value(amount)
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute(
-        f"INSERT INTO {table_name} (user_id, amount_encrypted) VALUES (%s, %s)",
-        (user_id, encrypted_amount)
-    )
-    conn.commit()
-    cursor.close()
-    conn.close()
+    try:
+        cursor.execute(
+            f"INSERT INTO {table_name} (user_id, amount_encrypted) VALUES (%s, %s)",
+            (user_id, encrypted_amount)
+        )
+        cursor.execute(f"SELECT created_at FROM {table_name} WHERE id=%s", (cursor.lastrowid,))
+        created_at = cursor.fetchone()[0]
+        entry_aggregates.apply_changes(cursor, user_id, table_name, created_at, added=[amount])
+        conn.commit()
+    except mysql.connector.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+        conn.close()
 
 
 def get_entries(user_id, table_name):
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id, amount_encrypted FROM {table_name} WHERE user_id=%s",
+                (user_id,)
+            )
+            rows = cursor.fetchall()
+
+    amounts = decrypt_many([row[1] for row in rows], as_float=True)
+    return [{"id": row[0], "amount": amount} for row, amount in zip(rows, amounts)]
+
+def _encode_page_cursor(created_at, entry_id):
+    raw = f"{created_at.isoformat()}|{entry_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_page_cursor(token):
+    padded = token + "=" * (-len(token) % 4)
+    created_at, entry_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+    return datetime.fromisoformat(created_at), int(entry_id)
+
+def _entry_range_filter(user_id, start, end, after):
+    clauses = ["user_id=%s"]
+    params = [user_id]
+    if start is not None:
+        clauses.append("created_at >= %s")
+        params.append(start)
+    if end is not None:
+        clauses.append("created_at < %s")
+        params.append(end)
+    if after is not None:
+        # (created_at, id) > (after_created_at, after_id), spelled out so it stays a range scan
+        # on idx_user_created
+        after_created_at, after_id = after
+        clauses.append("created_at >= %s AND (created_at > %s OR id > %s)")
+        params.extend([after_created_at, after_created_at, after_id])
+    return " AND ".join(clauses), params
+
+
+def get_entries_page(user_id, table_name, cursor=None, limit=100, start=None, end=None):
+    """
+    Keyset-paginated entries ordered by (created_at, id). `cursor` is the opaque next_cursor
+    from a previous page; start/end bound created_at (end exclusive).
+    Returns {"entries": [...], "next_cursor": str or None}.
+    """
+    check_financial_table(table_name)
+    limit = max(1, min(int(limit), 1000))
+    after = _decode_page_cursor(cursor) if cursor else None
+    where, params = _entry_range_filter(user_id, start, end, after)
+
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        f"SELECT id, amount_encrypted FROM {table_name} WHERE user_id=%s",
-        (user_id,)
-    )
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"SELECT id, created_at, amount_encrypted FROM {table_name} "
+                f"WHERE {where} ORDER BY created_at, id LIMIT %s",
+                params + [limit + 1]
+            )
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    amounts = decrypt_many([row[2] for row in rows], as_float=True)
+    entries = [
+        {"id": row[0], "created_at": row[1].isoformat(), "amount": amount}
+        for row, amount in zip(rows, amounts)
+    ]
+    next_cursor = _encode_page_cursor(rows[-1][1], rows[-1][0]) if has_more else None
+    return {"entries": entries, "next_cursor": next_cursor}
+
+
+def iter_entries(user_id, table_name, start=None, end=None, batch_size=1000):
+    """
+    Stream every entry in (created_at, id) order from an unbuffered server-side cursor,
+    decrypting one batch at a time so memory stays flat regardless of history length.
+    """
+    check_financial_table(table_name)
+    where, params = _entry_range_filter(user_id, start, end, None)
+
+    conn = get_connection()
+    cur = conn.cursor(buffered=False)
+    exhausted = False
+    try:
+        cur.execute(
+            f"SELECT id, created_at, amount_encrypted FROM {table_name} "
+            f"WHERE {where} ORDER BY created_at, id",
+            params
+        )
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                exhausted = True
+                break
+            amounts = decrypt_many([row[2] for row in rows], as_float=True)
+            for row, amount in zip(rows, amounts):
+                yield {"id": row[0], "created_at": row[1].isoformat(), "amount": amount}
+    finally:
+        if exhausted:
+            cur.close()
+            conn.close()
+        else:
+            # Abandoned mid-stream: draining the rest could mean reading the whole table,
+            # so drop the connection instead of returning it with unread rows.
+            conn.invalidate()
 
-    return [{"id": row[0], "amount": float(decrypt_value(row[1]))} for row in rows]
 
 def update_entry(entry_id, new_amount, table_name):
+    check_financial_table(table_name)
     encrypted_amount = encrypt_value(new_amount)
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute(
-        f"UPDATE {table_name} SET amount_encrypted=%s WHERE id=%s",
-        (encrypted_amount, entry_id)
-    )
-    conn.commit()
-    cursor.close()
-    conn.close()
+    try:
+        cursor.execute(
+            f"SELECT user_id, created_at, amount_encrypted FROM {table_name} WHERE id=%s FOR UPDATE",
+            (entry_id,)
+        )
+        existing = cursor.fetchone()
+        if not existing:
+            conn.rollback()
+            return False
+
+        cursor.execute(
+            f"UPDATE {table_name} SET amount_encrypted=%s WHERE id=%s",
+            (encrypted_amount, entry_id)
+        )
+        user_id, created_at, old_encrypted = existing
+        entry_aggregates.apply_changes(
+            cursor, user_id, table_name, created_at,
+            added=[new_amount], removed=[decrypt_value(old_encrypted)]
+        )
+        conn.commit()
+        return True
+    except mysql.connector.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+        conn.close()
+
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+_autoinc_consecutive = None
+
+def encrypt_many(values):
+    """
+    Encrypt a batch of values in one call; the counterpart of decrypt_many.
+    """
+    return fernet_batch.encrypt_many(cipher, values, key=ENCRYPTION_KEY)
+
+
+def _multi_row_ids_are_consecutive(cursor):
+    # InnoDB hands a multi-row INSERT a consecutive id block in lock modes 0 and 1, but not in
+    # mode 2 ("interleaved", the MySQL 8 default). Checked once per process.
+    global _autoinc_consecutive
+    if _autoinc_consecutive is None:
+        try:
+            cursor.execute("SELECT @@innodb_autoinc_lock_mode")
+            _autoinc_consecutive = int(cursor.fetchone()[0]) in (0, 1)
+        except mysql.connector.Error:
+            _autoinc_consecutive = False
+    return _autoinc_consecutive
+
+
+def _normalize_bulk_entries(entries):
+    """Accept bare amounts or {"amount": ..., "created_at": ...} dicts."""
+    normalized = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            amount = entry.get("amount")
+            created_at = entry.get("created_at")
+        else:
+            amount, created_at = entry, None
+        if amount is None:
+            raise ValueError("Every entry needs an amount")
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at)
+        normalized.append((float(amount), created_at))
+    return normalized
+
+
+def _group_by_month(pairs):
+    months = {}
+    for when, amount in pairs:
+        months.setdefault(entry_aggregates.month_start(when), []).append(amount)
+    return months
+
+
+def insert_entries(cursor, user_id, entries, table_name):
+    """
+    Insert many entries on an open cursor without committing: batch-encrypts the amounts,
+    writes them with chunked multi-row INSERTs and folds them into the monthly aggregates.
+    Returns the generated ids in input order. Used by add_entries_bulk and the statement importer.
+    """
+    check_financial_table(table_name)
+    entries = _normalize_bulk_entries(entries)
+    if not entries:
+        return []
+
+    if any(created_at is None for _, created_at in entries):
+        # One timestamp for the whole batch, exactly what DEFAULT CURRENT_TIMESTAMP would give
+        cursor.execute("SELECT NOW()")
+        now = cursor.fetchone()[0]
+        entries = [(amount, created_at or now) for amount, created_at in entries]
+
+    encrypted = encrypt_many([amount for amount, _ in entries])
+    consecutive = _multi_row_ids_are_consecutive(cursor)
+
+    ids = []
+    for i in range(0, len(entries), BULK_CHUNK_SIZE):
+        chunk = entries[i:i + BULK_CHUNK_SIZE]
+        # executemany rewrites a plain INSERT ... VALUES into a single multi-row statement
+        cursor.executemany(
+            f"INSERT INTO {table_name} (user_id, amount_encrypted, created_at) VALUES (%s, %s, %s)",
+            [(user_id, token, created_at)
+             for token, (_, created_at) in zip(encrypted[i:i + BULK_CHUNK_SIZE], chunk)]
+        )
+        first_id = cursor.lastrowid
+        if consecutive:
+            ids.extend(range(first_id, first_id + len(chunk)))
+        else:
+            cursor.execute(
+                f"SELECT id FROM {table_name} WHERE user_id=%s AND id >= %s ORDER BY id LIMIT %s",
+                (user_id, first_id, len(chunk))
+            )
+            ids.extend(row[0] for row in cursor.fetchall())
+
+    for month, amounts in _group_by_month((created_at, amount) for amount, created_at in entries).items():
+        entry_aggregates.apply_changes(cursor, user_id, table_name, month, added=amounts)
+    return ids
+
+
+def add_entries_bulk(user_id, entries, table_name):
+    """
+    Insert many incomes/expenses/savings in a single transaction. `entries` holds amounts or
+    {"amount", "created_at"} dicts. Returns the new ids in input order.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        ids = insert_entries(cursor, user_id, entries, table_name)
+        conn.commit()
+        return ids
+    except mysql.connector.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def update_entries_bulk(user_id, updates, table_name):
+    """
+    Update many of a user's entries in a single transaction. `updates` is an iterable of
+    (entry_id, new_amount) pairs; ids that don't belong to the user are skipped.
+    Returns the ids that were updated.
+    """
+    check_financial_table(table_name)
+    updates = {int(entry_id): float(amount) for entry_id, amount in updates}
+    if not updates:
+        return []
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        entry_ids = list(updates)
+        existing = []
+        for i in range(0, len(entry_ids), BULK_CHUNK_SIZE):
+            chunk = entry_ids[i:i + BULK_CHUNK_SIZE]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(
+                f"SELECT id, created_at, amount_encrypted FROM {table_name} "
+                f"WHERE user_id=%s AND id IN ({placeholders}) FOR UPDATE",
+                [user_id] + chunk
+            )
+            existing.extend(cursor.fetchall())
+
+        found_ids = [row[0] for row in existing]
+        encrypted = dict(zip(found_ids, encrypt_many([updates[entry_id] for entry_id in found_ids])))
+
+        for i in range(0, len(found_ids), BULK_CHUNK_SIZE):
+            chunk = found_ids[i:i + BULK_CHUNK_SIZE]
+            cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+            placeholders = ", ".join(["%s"] * len(chunk))
+            params = []
+            for entry_id in chunk:
+                params.extend([entry_id, encrypted[entry_id]])
+            cursor.execute(
+                f"UPDATE {table_name} SET amount_encrypted = CASE id {cases} END "
+                f"WHERE user_id=%s AND id IN ({placeholders})",
+                params + [user_id] + chunk
+            )
+
+        old_amounts = decrypt_many([row[2] for row in existing], as_float=True)
+        months = {}
+        for (entry_id, created_at, _), old_amount in zip(existing, old_amounts):
+            added, removed = months.setdefault(entry_aggregates.month_start(created_at), ([], []))
+            added.append(updates[entry_id])
+            removed.append(old_amount)
+        for month, (added, removed) in months.items():
+            entry_aggregates.apply_changes(cursor, user_id, table_name, month, added=added, removed=removed)
+
+        conn.commit()
+        return found_ids
+    except mysql.connector.Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_monthly_summary(user_id, table_name, start=None, end=None):
+    """
+    Monthly totals/counts/min/max for a user's incomes, expenses or savings, served from the
+    aggregate store without reading the raw encrypted rows. start/end are dates or 'YYYY-MM'.
+    """
+    return entry_aggregates.get_monthly_summary(user_id, table_name, start, end)
 
 
 #Specific financial data helpers
@@ -282,191 +649,130 @@ def update_expense(expense_id, new_amount):
     update_entry(expense_id, new_amount, "expenses")
 
 
-#ensures all requried tables exist
+#ensures the schema is current; tables and columns are created by the versioned files in migrations/
 def initialize_database():
-    conn = None
+    import migrate
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        # Create users table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(255) NOT NULL UNIQUE,
-                password_hash VARCHAR(255) NOT NULL,
-                email VARCHAR(255) NOT NULL,
-                full_name VARCHAR(255),
-                phone VARCHAR(20),
-                age INT,
-                occupation VARCHAR(255),
-                annual_income_encrypted TEXT,
-                financial_goal VARCHAR(255),
-                risk_tolerance VARCHAR(50),
-                reset_token VARCHAR(255),
-                reset_token_expires TIMESTAMP NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create incomes table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS incomes (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                amount_encrypted TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """)
+        migrate.ensure_schema()
+    except (Error, migrate.MigrationError) as e:
+        print(f"Error initializing database: {e}")
 
-        # Create expenses table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS expenses (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                amount_encrypted TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """)
 
-        # Create savings table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS savings (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                amount_encrypted TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """)
-
-        # Create user_preferences table for emergency fund and other preferences
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_preferences (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL UNIQUE,
-                current_savings DECIMAL(15,2),
-                monthly_expenses DECIMAL(15,2),
-                emergency_fund_target DECIMAL(15,2),
-                monthly_contribution DECIMAL(15,2),
-                emergency_goal VARCHAR(255),
-                budget_housing_percent DECIMAL(5,2),
-                budget_food_percent DECIMAL(5,2),
-                budget_transportation_percent DECIMAL(5,2),
-                budget_utilities_percent DECIMAL(5,2),
-                budget_entertainment_percent DECIMAL(5,2),
-                budget_other_percent DECIMAL(5,2),
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """)
+# Precomputed recommendation helpers
+def get_precomputed_recommendations(user_id):
+    """
+    The user's row from user_recommendations (risk_profile, recommendations_json, snapshot_hash),
+    or None if the batch job hasn't covered them, the row was invalidated, or it was ranked for a
+    risk tolerance the user has since changed (the job may write a row computed from a profile
+    read just before the change invalidated it)
+    """
+    conn = get_connection()
+    try:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute("""
+                SELECT r.risk_profile, r.recommendations_json, r.snapshot_hash
+                FROM user_recommendations r
+                JOIN users u ON u.id = r.user_id AND r.risk_profile <=> u.risk_tolerance
+                WHERE r.user_id=%s
+            """, (user_id,))
+            return cur.fetchone()
+    finally:
+        conn.close()
 
-        # Create stock_watchlist table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS stock_watchlist (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                stock_ticker VARCHAR(10) NOT NULL,
-                stock_name VARCHAR(255),
-                current_price DECIMAL(15,2),
-                notes TEXT,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                UNIQUE KEY unique_user_ticker (user_id, stock_ticker)
-            )
-        """)
-        
-        # Check if existing user_preferences table needs migration
-        cursor.execute("SHOW TABLES LIKE 'user_preferences'")
-        table_exists = cursor.fetchone()
-        
-        if table_exists:
-            # Check if current_savings column exists
-            cursor.execute("SHOW COLUMNS FROM user_preferences LIKE 'current_savings'")
-            has_current_savings = cursor.fetchone()
-            
-            if not has_current_savings:
-                try:
-                    cursor.execute("ALTER TABLE user_preferences ADD COLUMN current_savings DECIMAL(15,2)")
-                    print("Added current_savings column to user_preferences table")
-                except mysql.connector.Error as e:
-                    if e.errno != 1060:  # Duplicate column name error
-                        print(f"Error adding current_savings column: {e}")
-            
-            # Check if monthly_expenses column exists
-            cursor.execute("SHOW COLUMNS FROM user_preferences LIKE 'monthly_expenses'")
-            has_monthly_expenses = cursor.fetchone()
-            
-            if not has_monthly_expenses:
-                try:
-                    cursor.execute("ALTER TABLE user_preferences ADD COLUMN monthly_expenses DECIMAL(15,2)")
-                    print("Added monthly_expenses column to user_preferences table")
-                except mysql.connector.Error as e:
-                    if e.errno != 1060:  # Duplicate column name error
-                        print(f"Error adding monthly_expenses column: {e}")
-            
-            # Check if budget breakdown columns exist
-            budget_columns = [
-                'budget_housing_percent', 'budget_food_percent', 
-                'budget_transportation_percent', 'budget_utilities_percent',
-                'budget_entertainment_percent', 'budget_other_percent'
-            ]
-            
-            for col in budget_columns:
-                cursor.execute(f"SHOW COLUMNS FROM user_preferences LIKE '{col}'")
-                has_col = cursor.fetchone()
-                
-                if not has_col:
-                    try:
-                        cursor.execute(f"ALTER TABLE user_preferences ADD COLUMN {col} DECIMAL(5,2)")
-                        print(f"Added {col} column to user_preferences table")
-                    except mysql.connector.Error as e:
-                        if e.errno != 1060:  # Duplicate column name error
-                            print(f"Error adding {col} column: {e}")
-            
-            # Check if stock_watchlist table exists
-            cursor.execute("SHOW TABLES LIKE 'stock_watchlist'")
-            has_watchlist = cursor.fetchone()
-            
-            if not has_watchlist:
-                try:
-                    cursor.execute("""
-                        CREATE TABLE stock_watchlist (
-                            id INT AUTO_INCREMENT PRIMARY KEY,
-                            user_id INT NOT NULL,
-                            stock_ticker VARCHAR(10) NOT NULL,
-                            stock_name VARCHAR(255),
-                            current_price DECIMAL(15,2),
-                            notes TEXT,
-                            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                            UNIQUE KEY unique_user_ticker (user_id, stock_ticker)
-                        )
-                    """)
-                    print("Added stock_watchlist table")
-                except mysql.connector.Error as e:
-                    if e.errno != 1050:  # Table exists error
-                        print(f"Error creating stock_watchlist table: {e}")
 
+def invalidate_recommendations(user_id, cursor=None):
+    """
+    Drop the user's precomputed recommendations after a change that affects them (risk
+    tolerance, watchlist). Pass a cursor to do it inside the caller's transaction.
+    """
+    if cursor is not None:
+        cursor.execute("DELETE FROM user_recommendations WHERE user_id=%s", (user_id,))
+        return
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM user_recommendations WHERE user_id=%s", (user_id,))
         conn.commit()
-        print("Database tables verified or created successfully.")
+    finally:
+        conn.close()
 
-    except Error as e:
-        print(f"Error initializing database: {e}")
+
+# Dashboard helper
+def get_dashboard_data(user_id):
+    """
+    Profile, preferences, precomputed recommendations and watchlist for one user in a single
+    statement on one pooled connection. Returns None if the user doesn't exist; otherwise a dict
+    with 'profile' (as get_user_by_id), 'preferences' (None if the user has none yet),
+    'recommendations' (as get_precomputed_recommendations, or None) and 'watchlist' (newest first).
+    """
+    conn = get_connection()
+    try:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute("""
+                SELECT u.id, u.username, u.email, u.full_name, u.phone, u.age,
+                       u.occupation, u.annual_income_encrypted, u.financial_goal, u.risk_tolerance,
+                       p.user_id AS preferences_user_id,
+                       p.current_savings, p.monthly_expenses, p.emergency_fund_target,
+                       p.monthly_contribution, p.emergency_goal,
+                       p.budget_housing_percent, p.budget_food_percent,
+                       p.budget_transportation_percent, p.budget_utilities_percent,
+                       p.budget_entertainment_percent, p.budget_other_percent,
+                       r.risk_profile, r.recommendations_json, r.snapshot_hash,
+                       (SELECT JSON_ARRAYAGG(JSON_OBJECT(
+                                   'id', w.id, 'stock_ticker', w.stock_ticker, 'stock_name', w.stock_name,
+                                   'current_price', w.current_price, 'notes', w.notes,
+                                   'added_at', CAST(w.added_at AS CHAR)))
+                        FROM stock_watchlist w WHERE w.user_id = u.id) AS watchlist_json
+                FROM users u
+                LEFT JOIN user_preferences p ON p.user_id = u.id
+                LEFT JOIN user_recommendations r
+                       ON r.user_id = u.id AND r.risk_profile <=> u.risk_tolerance
+                WHERE u.id=%s LIMIT 1
+            """, (user_id,))
+            row = cur.fetchone()
     finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+        conn.close()
+    
+    if not row:
+        return None
+    
+    profile = {key: row[key] for key in ('id', 'username', 'email', 'full_name', 'phone', 'age',
+                                         'occupation', 'financial_goal', 'risk_tolerance')}
+    if row['annual_income_encrypted']:
+        decrypted_value = decrypt_value(row['annual_income_encrypted'])
+        if decrypted_value:
+            profile['annual_income'] = float(decrypted_value)
+    
+    preferences = None
+    if row['preferences_user_id'] is not None:
+        preferences = {key: row[key] for key in ('current_savings', 'monthly_expenses', 'emergency_fund_target',
+                                                 'monthly_contribution', 'emergency_goal',
+                                                 'budget_housing_percent', 'budget_food_percent',
+                                                 'budget_transportation_percent', 'budget_utilities_percent',
+                                                 'budget_entertainment_percent', 'budget_other_percent')}
+    
+    recommendations = None
+    if row['recommendations_json'] is not None:
+        recommendations = {key: row[key] for key in ('risk_profile', 'recommendations_json', 'snapshot_hash')}
+    
+    watchlist = json.loads(row['watchlist_json']) if row['watchlist_json'] else []
+    for item in watchlist:
+        item['added_at'] = datetime.fromisoformat(item['added_at']) if item['added_at'] else None
+    watchlist.sort(key=lambda item: item['added_at'] or datetime.min, reverse=True)
+    
+    return {"profile": profile, "preferences": preferences, "recommendations": recommendations,
+            "watchlist": watchlist}
 
 
 # User preferences helpers
 def get_user_preferences(user_id):
     """
-    Get user preferences for emergency fund and other settings
+    Get user preferences for emergency fund and other settings (served from user_cache when possible)
     """
+    return user_cache.get("preferences", int(user_id), _load_user_preferences)
+
+
+def _load_user_preferences(user_id):
     conn = get_connection()
     try:
         with conn.cursor(dictionary=True) as cur:
@@ -497,6 +803,7 @@ def create_user_preferences(user_id, current_savings=None, monthly_expenses=None
         """, (user_id, current_savings, monthly_expenses))
         
         conn.commit()
+        user_cache.invalidate(int(user_id))
         return True
     except mysql.connector.IntegrityError:
         # Preferences already exist, just return True
@@ -593,6 +900,7 @@ def update_user_preferences(user_id, emergency_fund_target=None, monthly_contrib
                  budget_utilities_percent, budget_entertainment_percent, budget_other_percent))
         
         conn.commit()
+        user_cache.invalidate(int(user_id))
         return True
     except mysql.connector.Error as e:
         conn.rollback()
@@ -650,7 +958,10 @@ def update_user_profile(user_id, full_name=None, phone=None, age=None,
                 f"UPDATE users SET {', '.join(updates)} WHERE id=%s",
                 values
             )
+            if risk_tolerance is not None:
+                invalidate_recommendations(user_id, cursor)
             conn.commit()
+            user_cache.invalidate(int(user_id))
             return True
         return False
     except mysql.connector.Error as e:
@@ -0,0 +1,264 @@
+# entry_aggregates.py
+#
+# Per-user, per-month summaries (total, count, min, max) for the incomes/expenses/savings tables.
+# Summaries are kept up to date incrementally by db_utils.add_entry/update_entry so dashboards can
+# read one small row per month instead of decrypting every raw entry. The summary payload is
+# Fernet-encrypted just like the amounts it is derived from.
+#
+# Rebuild from the raw tables (streams rows in keyset batches):
+#   python entry_aggregates.py rebuild [--user-id 42] [--table incomes] [--batch-size 5000]
+#
+
+import argparse
+import json
+from datetime import date
+from decimal import Decimal
+
+import db_utils
+
+
+def month_start(value):
+    """Normalise a date, datetime or 'YYYY-MM[-DD]' string to the first day of its month."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        parts = value.split("-")
+        return date(int(parts[0]), int(parts[1]), 1)
+    return date(value.year, value.month, 1)
+
+
+def _empty_summary():
+    return {"total": Decimal("0"), "count": 0, "min": None, "max": None}
+
+
+def _encode(summary):
+    payload = {
+        "total": str(summary["total"]),
+        "count": summary["count"],
+        "min": None if summary["min"] is None else str(summary["min"]),
+        "max": None if summary["max"] is None else str(summary["max"]),
+    }
+    return db_utils.encrypt_value(json.dumps(payload, separators=(",", ":")))
+
+
+def _decode(raw):
+    if raw is None:
+        return None
+    return {
+        "total": Decimal(raw["total"]),
+        "count": int(raw["count"]),
+        "min": None if raw["min"] is None else Decimal(raw["min"]),
+        "max": None if raw["max"] is None else Decimal(raw["max"]),
+    }
+
+
+def _decode_many(encrypted):
+    return [_decode(json.loads(value)) if value is not None else None
+            for value in db_utils.decrypt_many(encrypted)]
+
+
+def _add_values(summary, values):
+    for value in values:
+        summary["total"] += value
+        summary["count"] += 1
+        if summary["min"] is None or value < summary["min"]:
+            summary["min"] = value
+        if summary["max"] is None or value > summary["max"]:
+            summary["max"] = value
+    return summary
+
+
+def _to_decimal(value):
+    return Decimal(str(value))
+
+
+def _recompute_month(cursor, user_id, table_name, month):
+    """Rebuild a single month's summary from the raw rows (used when an extremum is removed)."""
+    next_month = date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+    cursor.execute(
+        f"SELECT amount_encrypted FROM {table_name} "
+        f"WHERE user_id=%s AND created_at >= %s AND created_at < %s",
+        (user_id, month, next_month)
+    )
+    amounts = db_utils.decrypt_many([row[0] for row in cursor.fetchall()])
+    return _add_values(_empty_summary(), [_to_decimal(a) for a in amounts if a is not None])
+
+
+def apply_changes(cursor, user_id, table_name, when, added=(), removed=()):
+    """
+    Fold added/removed amounts into the month containing `when`. Must run inside the same
+    transaction as the write to the raw table; the aggregate row is locked with FOR UPDATE so
+    concurrent writers for the same user-month serialise.
+    """
+    db_utils.check_financial_table(table_name)
+    month = month_start(when)
+    added = [_to_decimal(v) for v in added]
+    removed = [None if v is None else _to_decimal(v) for v in removed]
+
+    # Make sure a row exists so FOR UPDATE has something to lock, then read it.
+    cursor.execute(
+        "INSERT IGNORE INTO entry_monthly_aggregates (user_id, table_name, month, summary_encrypted) "
+        "VALUES (%s, %s, %s, %s)",
+        (user_id, table_name, month, _encode(_empty_summary()))
+    )
+    cursor.execute(
+        "SELECT summary_encrypted FROM entry_monthly_aggregates "
+        "WHERE user_id=%s AND table_name=%s AND month=%s FOR UPDATE",
+        (user_id, table_name, month)
+    )
+    row = cursor.fetchone()
+    summary = _decode_many([row[0]])[0] if row else None
+
+    needs_recompute = summary is None
+    if not needs_recompute:
+        for value in removed:
+            # Removing the current min or max (or a value we cannot decrypt) means the
+            # extremum can't be derived incrementally; fall back to the raw rows for this month.
+            if value is None or summary["count"] == 0 or value <= summary["min"] or value >= summary["max"]:
+                needs_recompute = True
+                break
+            summary["total"] -= value
+            summary["count"] -= 1
+
+    if needs_recompute:
+        # The raw table already reflects this transaction's writes
+        summary = _recompute_month(cursor, user_id, table_name, month)
+    else:
+        _add_values(summary, added)
+
+    if summary["count"] <= 0:
+        cursor.execute(
+            "DELETE FROM entry_monthly_aggregates WHERE user_id=%s AND table_name=%s AND month=%s",
+            (user_id, table_name, month)
+        )
+    else:
+        cursor.execute(
+            "UPDATE entry_monthly_aggregates SET summary_encrypted=%s "
+            "WHERE user_id=%s AND table_name=%s AND month=%s",
+            (_encode(summary), user_id, table_name, month)
+        )
+
+
+def get_monthly_summary(user_id, table_name, start=None, end=None):
+    """
+    Return [{"month": "YYYY-MM", "total", "count", "min", "max"}, ...] for months in [start, end],
+    read from the aggregate store only.
+    """
+    db_utils.check_financial_table(table_name)
+    query = ("SELECT month, summary_encrypted FROM entry_monthly_aggregates "
+             "WHERE user_id=%s AND table_name=%s")
+    params = [user_id, table_name]
+    if start is not None:
+        query += " AND month >= %s"
+        params.append(month_start(start))
+    if end is not None:
+        query += " AND month <= %s"
+        params.append(month_start(end))
+    query += " ORDER BY month"
+
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    result = []
+    for (month, _), summary in zip(rows, _decode_many([row[1] for row in rows])):
+        if summary is None:
+            continue
+        result.append({
+            "month": month.strftime("%Y-%m"),
+            "total": float(summary["total"]),
+            "count": summary["count"],
+            "min": float(summary["min"]) if summary["min"] is not None else None,
+            "max": float(summary["max"]) if summary["max"] is not None else None,
+        })
+    return result
+
+
+def rebuild(user_id=None, table_names=None, batch_size=5000, log=print):
+    """
+    Recompute aggregates from the raw tables. Rows are streamed in keyset batches by id, so
+    memory is bounded by the number of user-months rather than the number of entries.
+    Run it while writes are quiet; entries added during a rebuild of the same scope are only
+    picked up by the next incremental write to that month.
+    """
+    table_names = list(table_names or db_utils.FINANCIAL_TABLES)
+    for table_name in table_names:
+        db_utils.check_financial_table(table_name)
+        summaries = {}
+        last_id = 0
+        scanned = 0
+
+        conn = db_utils.get_connection()
+        try:
+            with conn.cursor() as cur:
+                while True:
+                    query = (f"SELECT id, user_id, created_at, amount_encrypted FROM {table_name} "
+                             f"WHERE id > %s")
+                    params = [last_id]
+                    if user_id is not None:
+                        query += " AND user_id=%s"
+                        params.append(user_id)
+                    query += " ORDER BY id LIMIT %s"
+                    params.append(batch_size)
+
+                    cur.execute(query, params)
+                    rows = cur.fetchall()
+                    if not rows:
+                        break
+
+                    amounts = db_utils.decrypt_many([row[3] for row in rows])
+                    for (_, row_user, created_at, _), amount in zip(rows, amounts):
+                        if amount is None:
+                            continue
+                        key = (row_user, month_start(created_at))
+                        summary = summaries.get(key)
+                        if summary is None:
+                            summary = summaries[key] = _empty_summary()
+                        _add_values(summary, [_to_decimal(amount)])
+
+                    last_id = rows[-1][0]
+                    scanned += len(rows)
+                    log(f"{table_name}: scanned {scanned} rows")
+
+                if user_id is None:
+                    cur.execute("DELETE FROM entry_monthly_aggregates WHERE table_name=%s", (table_name,))
+                else:
+                    cur.execute("DELETE FROM entry_monthly_aggregates WHERE table_name=%s AND user_id=%s",
+                                (table_name, user_id))
+
+                items = list(summaries.items())
+                for i in range(0, len(items), batch_size):
+                    cur.executemany(
+                        "INSERT INTO entry_monthly_aggregates (user_id, table_name, month, summary_encrypted) "
+                        "VALUES (%s, %s, %s, %s)",
+                        [(uid, table_name, month, _encode(summary)) for (uid, month), summary in items[i:i + batch_size]]
+                    )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        log(f"{table_name}: wrote {len(summaries)} monthly summaries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain monthly income/expense/savings aggregates")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_cmd = sub.add_parser("rebuild", help="recompute aggregates from the raw tables")
+    rebuild_cmd.add_argument("--user-id", type=int)
+    rebuild_cmd.add_argument("--table", choices=db_utils.FINANCIAL_TABLES, action="append")
+    rebuild_cmd.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        rebuild(user_id=args.user_id, table_names=args.table, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
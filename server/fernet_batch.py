@@ -0,0 +1,143 @@
+# fernet_batch.py
+#
+# Batch encryption/decryption for Fernet-encrypted columns. Small result sets are handled inline;
+# large ones are split into chunks and fanned out across a thread pool (the OpenSSL primitives
+# behind Fernet run without the GIL) or, optionally, a process pool.
+#
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from cryptography.fernet import Fernet, InvalidToken
+
+# Below this many values the executor overhead outweighs any parallel speedup
+INLINE_THRESHOLD = int(os.getenv("DECRYPT_INLINE_THRESHOLD", "2000"))
+CHUNK_SIZE = int(os.getenv("DECRYPT_CHUNK_SIZE", "1000"))
+DEFAULT_WORKERS = int(os.getenv("DECRYPT_WORKERS", str(min(8, os.cpu_count() or 1))))
+DEFAULT_EXECUTOR = os.getenv("DECRYPT_EXECUTOR", "thread")  # "thread" or "process"
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+# Per-process cipher for process-pool workers (set by _init_worker)
+_worker_cipher = None
+
+
+def _decrypt_chunk(cipher, tokens, as_float):
+    decrypt = cipher.decrypt
+    out = []
+    append = out.append
+    for token in tokens:
+        if token is None:
+            append(None)
+            continue
+        if isinstance(token, str):
+            token = token.encode()
+        try:
+            value = decrypt(token).decode()
+        except (InvalidToken, TypeError, ValueError):
+            # Same contract as db_utils.decrypt_value: undecryptable values come back as None
+            append(None)
+            continue
+        if as_float:
+            try:
+                value = float(value)
+            except ValueError:
+                value = None
+        append(value)
+    return out
+
+
+def _encrypt_chunk(cipher, values):
+    encrypt = cipher.encrypt
+    return [encrypt(str(value).encode()) for value in values]
+
+
+def _init_worker(key):
+    global _worker_cipher
+    _worker_cipher = Fernet(key)
+
+
+def _decrypt_chunk_in_worker(tokens, as_float):
+    return _decrypt_chunk(_worker_cipher, tokens, as_float)
+
+
+def _encrypt_chunk_in_worker(values):
+    return _encrypt_chunk(_worker_cipher, values)
+
+
+def _get_executor(kind, workers, key):
+    cache_key = (kind, workers, key if kind == "process" else None, os.getpid())
+    executor = _executors.get(cache_key)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(cache_key)
+            if executor is None:
+                if kind == "process":
+                    executor = ProcessPoolExecutor(
+                        max_workers=workers, initializer=_init_worker, initargs=(key,)
+                    )
+                else:
+                    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fernet")
+                _executors[cache_key] = executor
+    return executor
+
+
+def _chunks(values, size):
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def decrypt_many(cipher, tokens, as_float=False, workers=None, executor=None, key=None):
+    """
+    Decrypt a sequence of Fernet tokens, preserving order. Values that fail to decrypt
+    (or convert, when as_float=True) are returned as None.
+
+    executor="process" needs the raw key so worker processes can build their own cipher.
+    """
+    tokens = list(tokens)
+    workers = DEFAULT_WORKERS if workers is None else workers
+    kind = executor or DEFAULT_EXECUTOR
+
+    if len(tokens) < INLINE_THRESHOLD or workers <= 1:
+        return _decrypt_chunk(cipher, tokens, as_float)
+
+    if kind == "process":
+        if key is None:
+            raise ValueError("decrypt_many with executor='process' requires the Fernet key")
+        pool = _get_executor("process", workers, key)
+        futures = [pool.submit(_decrypt_chunk_in_worker, chunk, as_float) for chunk in _chunks(tokens, CHUNK_SIZE)]
+    else:
+        pool = _get_executor("thread", workers, None)
+        futures = [pool.submit(_decrypt_chunk, cipher, chunk, as_float) for chunk in _chunks(tokens, CHUNK_SIZE)]
+
+    out = []
+    for future in futures:
+        out.extend(future.result())
+    return out
+
+
+def encrypt_many(cipher, values, workers=None, executor=None, key=None):
+    """
+    Encrypt a sequence of values (str()-ed first, like db_utils.encrypt_value), preserving order.
+    """
+    values = list(values)
+    workers = DEFAULT_WORKERS if workers is None else workers
+    kind = executor or DEFAULT_EXECUTOR
+
+    if len(values) < INLINE_THRESHOLD or workers <= 1:
+        return _encrypt_chunk(cipher, values)
+
+    if kind == "process":
+        if key is None:
+            raise ValueError("encrypt_many with executor='process' requires the Fernet key")
+        pool = _get_executor("process", workers, key)
+        futures = [pool.submit(_encrypt_chunk_in_worker, chunk) for chunk in _chunks(values, CHUNK_SIZE)]
+    else:
+        pool = _get_executor("thread", workers, None)
+        futures = [pool.submit(_encrypt_chunk, cipher, chunk) for chunk in _chunks(values, CHUNK_SIZE)]
+
+    out = []
+    for future in futures:
+        out.extend(future.result())
+    return out
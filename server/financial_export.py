@@ -0,0 +1,197 @@
+# financial_export.py
+#
+# Streaming export of a user's incomes, expenses and savings as CSV, NDJSON or Parquet.
+# Rows come from db_utils.iter_entries (an unbuffered server-side cursor, decrypted per batch) and
+# are emitted as byte chunks, so memory use is constant no matter how long the history is.
+#
+# Offline backup of every user, in parallel:
+#   python financial_export.py --out-dir backups [--format ndjson] [--workers 4]
+#
+
+import argparse
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import db_utils
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+EXPORT_FIELDS = ("table", "id", "created_at", "amount")
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+class ExportFormatUnavailable(RuntimeError):
+    """Raised when the optional dependency for an export format isn't installed."""
+
+
+def iter_batches(user_id, tables=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of export rows, one table after another."""
+    for table_name in tables or db_utils.FINANCIAL_TABLES:
+        batch = []
+        for entry in db_utils.iter_entries(user_id, table_name, batch_size=batch_size):
+            entry["table"] = table_name
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def stream_csv(user_id, tables=None):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for batch in iter_batches(user_id, tables):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    tail = buffer.getvalue()
+    if tail:
+        yield tail.encode()
+
+
+def stream_ndjson(user_id, tables=None):
+    for batch in iter_batches(user_id, tables):
+        yield "".join(
+            json.dumps({field: row[field] for field in EXPORT_FIELDS}, separators=(",", ":")) + "\n"
+            for row in batch
+        ).encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that collects Parquet output so it can be yielded per row group."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(user_id, tables=None):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportFormatUnavailable("Parquet export requires pyarrow")
+
+    schema = pa.schema([
+        ("table", pa.string()),
+        ("id", pa.int64()),
+        ("created_at", pa.string()),
+        ("amount", pa.float64()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for batch in iter_batches(user_id, tables):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_export(user_id, fmt, tables=None):
+    """Return a generator of byte chunks for the requested format."""
+    if fmt == "csv":
+        return stream_csv(user_id, tables)
+    if fmt == "ndjson":
+        return stream_ndjson(user_id, tables)
+    if fmt == "parquet":
+        # Fail before the response starts if pyarrow is missing
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ExportFormatUnavailable("Parquet export requires pyarrow")
+        return stream_parquet(user_id, tables)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+# ---- offline backup -----------------------------------------------------------
+
+def iter_user_ids(batch_size=1000):
+    last_id = 0
+    while True:
+        conn = db_utils.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id FROM users WHERE id > %s ORDER BY id LIMIT %s", (last_id, batch_size))
+                ids = [row[0] for row in cur.fetchall()]
+        finally:
+            conn.close()
+        if not ids:
+            return
+        yield from ids
+        last_id = ids[-1]
+
+
+def export_user_to_file(user_id, fmt, out_dir):
+    """Write one user's export to out_dir/user_<id>.<ext> atomically; returns the path."""
+    extension = FORMATS[fmt][1]
+    path = os.path.join(out_dir, f"user_{user_id}.{extension}")
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as handle:
+        for chunk in stream_export(user_id, fmt):
+            handle.write(chunk)
+    os.replace(tmp_path, path)
+    return path
+
+
+def export_all_users(out_dir, fmt="ndjson", workers=4, log=print):
+    os.makedirs(out_dir, exist_ok=True)
+    exported = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for user_id in iter_user_ids():
+            pending.add(pool.submit(export_user_to_file, user_id, fmt, out_dir))
+            # Keep the queue bounded so huge user tables don't pile up futures
+            if len(pending) >= workers * 4:
+                done = next(as_completed(pending))
+                pending.remove(done)
+                log(f"wrote {done.result()}")
+                exported += 1
+        for done in as_completed(pending):
+            log(f"wrote {done.result()}")
+            exported += 1
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export every user's financial history")
+    parser.add_argument("--out-dir", required=True)
+    parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    count = export_all_users(args.out_dir, fmt=args.format, workers=args.workers)
+    print(f"Exported {count} users to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
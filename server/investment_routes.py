@@ -0,0 +1,471 @@
+# investment_routes.py
+#
+# Investment blueprint: stock recommendations and search, watchlist, portfolio allocation, risk
+# tolerance and market data endpoints. Everything under ml_models (NumPy, and scikit-learn when the
+# trained return model is enabled) is imported inside the handlers, so importing this module, and
+# therefore starting an API worker, doesn't load the ML stack. The first investment request in a
+# worker pays for the imports; set PRELOAD_INVESTMENT=true to load them at startup instead (e.g.
+# before a preforking server forks, so workers share the pages).
+#
+
+from flask import request, jsonify, Blueprint, Response, current_app
+from flask_jwt_extended import jwt_required
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import mysql.connector
+import os
+
+import db_utils
+import user_cache
+from auth_system import preferences_payload, profile_payload
+
+# blueprint for investment endpoints
+investment_bp = Blueprint('investment', __name__)
+
+MAX_PORTFOLIO_TICKERS = int(os.environ.get('MAX_PORTFOLIO_TICKERS', 500))
+
+# /dashboard loads the recommendation snapshot here while the request thread queries the database
+_dashboard_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('DASHBOARD_WORKERS', 4)),
+                                         thread_name_prefix='dashboard')
+
+
+def preload():
+    """Import the ML modules and build the recommendation snapshot now rather than on first use."""
+    from ml_models.stock_predictor import get_snapshot
+    import ml_models.analytics
+    import ml_models.portfolio
+    get_snapshot()
+
+
+@investment_bp.route('/stock-recommendations', methods=['GET'])
+@jwt_required()
+def get_stock_recommendations():
+    """Get personalized stock recommendations based on user's risk tolerance"""
+    from flask_jwt_extended import get_jwt_identity
+    from ml_models.stock_predictor import get_snapshot, profile_risk_tolerance, risk_bucket
+    
+    identity = get_jwt_identity()
+    user_id = int(identity) if identity else None
+    
+    if not user_id:
+        return jsonify({"msg": "Invalid token"}), 401
+    
+    # Precomputed by recommendation_job.py: one primary-key read, already serialized
+    precomputed = db_utils.get_precomputed_recommendations(user_id)
+    try:
+        snapshot = get_snapshot()
+    except Exception as e:
+        if not precomputed:
+            return jsonify({"msg": f"Error getting recommendations: {str(e)}"}), 500
+        snapshot = None
+    
+    if precomputed and (snapshot is None or precomputed['snapshot_hash'] == snapshot.fingerprint):
+        risk_tolerance_str = precomputed['risk_profile']
+        body = b'{"user_risk_tolerance":%d,"user_risk_profile":%s,"recommendations":%s}' % (
+            profile_risk_tolerance(risk_tolerance_str), json.dumps(risk_tolerance_str).encode(),
+            precomputed['recommendations_json'].encode()
+        )
+        return Response(body, status=200, mimetype='application/json')
+    
+    # Not precomputed (new user, or invalidated by a profile/watchlist change), or ranked from
+    # market data the current snapshot has since replaced: rank from the snapshot
+    user = db_utils.get_user_by_id(user_id)
+    if not user:
+        return jsonify({"msg": "User not found"}), 404
+    
+    risk_tolerance_str = user.get('risk_tolerance', 'moderate')
+    risk_tolerance = profile_risk_tolerance(risk_tolerance_str)
+    
+    try:
+        # Serve the pre-ranked, pre-serialized recommendations from the current snapshot
+        recommendations_json = snapshot.recommendations_json(risk_bucket(risk_tolerance))
+        body = b'{"user_risk_tolerance":%d,"user_risk_profile":%s,"recommendations":%s}' % (
+            risk_tolerance, json.dumps(risk_tolerance_str).encode(), recommendations_json
+        )
+        return Response(body, status=200, mimetype='application/json')
+    except Exception as e:
+        return jsonify({"msg": f"Error getting recommendations: {str(e)}"}), 500
+
+
+@investment_bp.route('/dashboard', methods=['GET'])
+@jwt_required()
+def get_dashboard():
+    """
+    Profile, preferences, watchlist and recommendations in one response, read with a single query.
+    Carries an ETag of the body, so a client revalidating with If-None-Match gets a 304 when
+    nothing has changed.
+    """
+    from flask_jwt_extended import get_jwt_identity
+    
+    identity = get_jwt_identity()
+    user_id = int(identity) if identity else None
+    
+    if not user_id:
+        return jsonify({"msg": "Invalid token"}), 401
+    
+    # The snapshot (and, on a worker's first investment request, the ML imports) doesn't depend on
+    # the user, so load it alongside the database read; when it's already built this is a lookup
+    snapshot_future = _dashboard_executor.submit(_load_snapshot)
+    
+    data = db_utils.get_dashboard_data(user_id)
+    if not data:
+        return jsonify({"msg": "User not found"}), 404
+    
+    recommendations = _dashboard_recommendations(data, snapshot_future)
+    
+    # Sorted keys, so the same data always gives the same bytes and ETag
+    body = current_app.json.dumps({
+        "profile": profile_payload(data['profile']),
+        "preferences": preferences_payload(data['preferences']),
+        "watchlist": data['watchlist']
+    }).encode()
+    body = body[:-1] + b',"recommendations":%s}' % recommendations
+    
+    response = Response(body, status=200, mimetype='application/json')
+    response.set_etag(hashlib.sha256(body).hexdigest()[:16])
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
+def _load_snapshot():
+    from ml_models.stock_predictor import get_snapshot
+    return get_snapshot()
+
+
+def _dashboard_recommendations(data, snapshot_future):
+    """
+    Serialized recommendations block for /dashboard: precomputed if present and ranked from the
+    current snapshot's data, else from the snapshot.
+    """
+    from ml_models.stock_predictor import profile_risk_tolerance, risk_bucket
+    
+    precomputed = data['recommendations']
+    try:
+        snapshot = snapshot_future.result()
+    except Exception as e:
+        snapshot = None
+        if not precomputed:
+            # The rest of the dashboard is still worth serving
+            print(f"Error getting dashboard recommendations: {e}")
+            return b'null'
+    
+    if precomputed and (snapshot is None or precomputed['snapshot_hash'] == snapshot.fingerprint):
+        risk_tolerance_str = precomputed['risk_profile']
+        risk_tolerance = profile_risk_tolerance(risk_tolerance_str)
+        recommendations_json = precomputed['recommendations_json'].encode()
+    else:
+        risk_tolerance_str = data['profile'].get('risk_tolerance', 'moderate')
+        risk_tolerance = profile_risk_tolerance(risk_tolerance_str)
+        recommendations_json = snapshot.recommendations_json(risk_bucket(risk_tolerance))
+    
+    return b'{"user_risk_tolerance":%d,"user_risk_profile":%s,"recommendations":%s}' % (
+        risk_tolerance, json.dumps(risk_tolerance_str).encode(), recommendations_json
+    )
+
+
+@investment_bp.route('/stock-search', methods=['GET'])
+@jwt_required()
+def stock_search():
+    """Type-ahead search by ticker or company name (?q=app&limit=10)"""
+    from ml_models.stock_predictor import search_stocks
+    
+    query = request.args.get('q', '')
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except ValueError:
+        return jsonify({"msg": "limit must be an integer"}), 400
+    
+    return jsonify({"results": search_stocks(query, limit)}), 200
+
+
+@investment_bp.route('/watchlist', methods=['GET'])
+@jwt_required()
+def get_watchlist():
+    """Get user's stock watchlist"""
+    from flask_jwt_extended import get_jwt_identity
+    
+    identity = get_jwt_identity()
+    user_id = int(identity) if identity else None
+    
+    if not user_id:
+        return jsonify({"msg": "Invalid token"}), 401
+    
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute("""
+                SELECT id, stock_ticker, stock_name, current_price, notes, added_at
+                FROM stock_watchlist WHERE user_id=%s
+                ORDER BY added_at DESC
+            """, (user_id,))
+            watchlist = cur.fetchall()
+            
+            # Convert Decimal to float for JSON
+            for item in watchlist:
+                if item.get('current_price'):
+                    item['current_price'] = float(item['current_price'])
+            
+            return jsonify({"watchlist": watchlist}), 200
+    finally:
+        conn.close()
+
+
+@investment_bp.route('/watchlist', methods=['POST'])
+@jwt_required()
+def add_to_watchlist():
+    """Add stock to user's watchlist"""
+    from flask_jwt_extended import get_jwt_identity
+    from ml_models.stock_predictor import get_stock_details
+    
+    identity = get_jwt_identity()
+    user_id = int(identity) if identity else None
+    
+    if not user_id:
+        return jsonify({"msg": "Invalid token"}), 401
+    
+    data = request.get_json(silent=True) or {}
+    ticker = data.get('ticker')
+    stock_name = data.get('stock_name')
+    current_price = data.get('current_price')
+    notes = data.get('notes')
+    
+    if not ticker:
+        return jsonify({"msg": "Stock ticker is required"}), 400
+    
+    # Get stock details
+    stock_details = get_stock_details(ticker)
+    if not stock_details:
+        return jsonify({"msg": "Stock not found"}), 404
+    
+    conn = db_utils.get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            INSERT INTO stock_watchlist (user_id, stock_ticker, stock_name, current_price, notes)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                stock_name = VALUES(stock_name),
+                current_price = VALUES(current_price),
+                notes = VALUES(notes)
+        """, (user_id, ticker, stock_name or stock_details['name'], 
+              current_price or stock_details['current_price'], notes))
+        db_utils.invalidate_recommendations(user_id, cursor)
+        
+        conn.commit()
+        return jsonify({"msg": "Stock added to watchlist"}), 200
+    except mysql.connector.Error as e:
+        conn.rollback()
+        return jsonify({"msg": f"Error adding to watchlist: {str(e)}"}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@investment_bp.route('/watchlist/<int:watchlist_id>', methods=['DELETE'])
+@jwt_required()
+def remove_from_watchlist(watchlist_id):
+    """Remove stock from user's watchlist"""
+    from flask_jwt_extended import get_jwt_identity
+    
+    identity = get_jwt_identity()
+    user_id = int(identity) if identity else None
+    
+    if not user_id:
+        return jsonify({"msg": "Invalid token"}), 401
+    
+    conn = db_utils.get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            DELETE FROM stock_watchlist WHERE id=%s AND user_id=%s
+        """, (watchlist_id, user_id))
+        db_utils.invalidate_recommendations(user_id, cursor)
+        
+        conn.commit()
+        
+        if cursor.rowcount == 0:
+            return jsonify({"msg": "Watchlist item not found"}), 404
+        
+        return jsonify({"msg": "Stock removed from watchlist"}), 200
+    except mysql.connector.Error as e:
+        conn.rollback()
+        return jsonify({"msg": f"Error removing from watchlist: {str(e)}"}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@investment_bp.route('/portfolio', methods=['GET'])
+@jwt_required()
+def portfolio_allocation():
+    """
+    Suggested allocation across the user's watchlist (or ?tickers=AAPL,MSFT).
+    ?method=mean_variance|risk_parity, ?risk_tolerance=1-10 overrides the profile setting.
+    """
+    from flask_jwt_extended import get_jwt_identity
+    from ml_models.portfolio import METHODS as PORTFOLIO_METHODS, build_portfolio
+    from ml_models.stock_predictor import profile_risk_tolerance
+    
+    identity = get_jwt_identity()
+    user_id = int(identity) if identity else None
+    
+    if not user_id:
+        return jsonify({"msg": "Invalid token"}), 401
+    
+    method = request.args.get('method', 'mean_variance')
+    if method not in PORTFOLIO_METHODS:
+        return jsonify({"msg": f"method must be one of {', '.join(PORTFOLIO_METHODS)}"}), 400
+    
+    user = db_utils.get_user_by_id(user_id)
+    if not user:
+        return jsonify({"msg": "User not found"}), 404
+    
+    try:
+        risk_tolerance = int(request.args.get('risk_tolerance') or profile_risk_tolerance(user.get('risk_tolerance')))
+    except ValueError:
+        return jsonify({"msg": "risk_tolerance must be an integer"}), 400
+    
+    tickers = [t.strip() for t in request.args.get('tickers', '').split(',') if t.strip()]
+    if not tickers:
+        conn = db_utils.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT stock_ticker FROM stock_watchlist WHERE user_id=%s", (user_id,))
+                tickers = [row[0] for row in cur.fetchall()]
+        finally:
+            conn.close()
+    
+    if len(tickers) < 2:
+        return jsonify({"msg": "Need at least two tickers (add stocks to your watchlist)"}), 400
+    if len(tickers) > MAX_PORTFOLIO_TICKERS:
+        return jsonify({"msg": f"At most {MAX_PORTFOLIO_TICKERS} tickers"}), 413
+    
+    try:
+        return jsonify(build_portfolio(tickers, risk_tolerance, method)), 200
+    except LookupError as e:
+        return jsonify({"msg": str(e)}), 503
+
+
+@investment_bp.route('/update-risk-tolerance', methods=['POST'])
+@jwt_required()
+def update_risk_tolerance():
+    """Update user's risk tolerance"""
+    from flask_jwt_extended import get_jwt_identity
+    
+    identity = get_jwt_identity()
+    user_id = int(identity) if identity else None
+    
+    if not user_id:
+        return jsonify({"msg": "Invalid token"}), 401
+    
+    try:
+        data = request.get_json()
+        risk_tolerance = data.get('risk_tolerance')
+        
+        if risk_tolerance is None or not (1 <= risk_tolerance <= 10):
+            return jsonify({"msg": "Risk tolerance must be between 1 and 10"}), 400
+        
+        with db_utils.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE users SET risk_tolerance=%s WHERE id=%s
+                """, (risk_tolerance, user_id))
+                db_utils.invalidate_recommendations(user_id, cursor)
+            conn.commit()
+        user_cache.invalidate(user_id)
+        
+        return jsonify({"msg": "Risk tolerance updated successfully", "risk_tolerance": risk_tolerance}), 200
+    except Exception as e:
+        return jsonify({"msg": f"Error updating risk tolerance: {str(e)}"}), 500
+
+@investment_bp.route('/update-stock-prices', methods=['GET'])
+@jwt_required()
+def update_stock_prices():
+    """Latest stock prices for the user's recommendations, from the market data store"""
+    from flask_jwt_extended import get_jwt_identity
+    from ml_models.market_data import get_store
+    from ml_models.stock_predictor import get_recommendations, profile_risk_tolerance
+    
+    identity = get_jwt_identity()
+    user_id = int(identity) if identity else None
+    
+    if not user_id:
+        return jsonify({"msg": "Invalid token"}), 401
+    
+    try:
+        # Get user's risk tolerance to fetch recommendations
+        user = db_utils.get_user_by_id(user_id)
+        risk_tolerance = profile_risk_tolerance(user.get('risk_tolerance') if user else None)
+        
+        # Get current recommendations
+        recommendations = get_recommendations(risk_tolerance)
+        
+        # Latest two daily closes from the local market data store
+        store = get_store()
+        updated_prices = []
+        for stock in recommendations:
+            bars = store.latest(stock['ticker'], 2)
+            if bars is None or len(bars) == 0:
+                continue
+            closes = bars.closes
+            updated_prices.append({
+                'ticker': stock['ticker'],
+                'current_price': round(float(closes[-1]), 2),
+                'previous_price': round(float(closes[0]), 2),
+                'as_of': str(bars.dates[-1])
+            })
+        
+        return jsonify({"prices": updated_prices}), 200
+    except Exception as e:
+        return jsonify({"msg": f"Error updating prices: {str(e)}"}), 500
+
+@investment_bp.route('/stock-details/<ticker>', methods=['GET'])
+@jwt_required()
+def get_stock_details_endpoint(ticker):
+    """Get detailed stock information including price history"""
+    from ml_models.analytics import compute_metrics
+    from ml_models.market_data import get_store
+    from ml_models.stock_predictor import get_stock_details
+    
+    try:
+        stock_details = get_stock_details(ticker.upper())
+        
+        if not stock_details:
+            return jsonify({"msg": "Stock not found"}), 404
+        
+        # Last 31 daily closes for risk calculation
+        bars = get_store().latest(ticker, 31)
+        if bars is not None:
+            stock_details['price_history'] = [round(float(c), 2) for c in bars.closes]
+            stock_details['price_history_dates'] = [str(d) for d in bars.dates]
+        
+        metrics = compute_metrics([ticker]).get(ticker.upper())
+        if metrics:
+            # Volatility and beta as the recommendations rank them (rolling_stats via the snapshot),
+            # so they match the top-level figures; drawdown, Sharpe and return are computed here
+            stock_details['analytics'] = dict(metrics, volatility=stock_details['volatility'],
+                                              beta=stock_details['beta'])
+        
+        return jsonify(stock_details), 200
+    except Exception as e:
+        return jsonify({"msg": f"Error fetching stock details: {str(e)}"}), 500
+
+@investment_bp.route('/price-history/<ticker>', methods=['GET'])
+@jwt_required()
+def price_history(ticker):
+    """Daily OHLCV bars for a ticker (?start=YYYY-MM-DD&end=YYYY-MM-DD, both optional)"""
+    from ml_models.market_data import get_store
+    
+    try:
+        bars = get_store().range(ticker, request.args.get('start') or None, request.args.get('end') or None)
+    except ValueError:
+        return jsonify({"msg": "start and end must be YYYY-MM-DD dates"}), 400
+    
+    if bars is None:
+        return jsonify({"msg": "No price history for this ticker"}), 404
+    
+    return jsonify({"ticker": bars.ticker, "bars": bars.to_records()}), 200
@@ -0,0 +1,215 @@
+# migrate.py
+#
+# Versioned schema migrations. Each file in migrations/ is named NNNN_description.py and defines
+# upgrade(cursor); the highest version applied is recorded in schema_version. MySQL commits DDL
+# implicitly, so migrations are written to be safe to re-run (IF NOT EXISTS, or the add_column /
+# add_index helpers below) and a version is recorded as soon as its migration finishes.
+#
+# Startup calls ensure_schema(): one SELECT when the schema is current. When migrations are
+# pending they run under a MySQL named lock (GET_LOCK), so workers booting together apply them
+# once: the first takes the lock and migrates, the rest wait for it and then find nothing to do.
+# Set DB_AUTO_MIGRATE=false to only warn at startup and apply migrations out-of-band with this CLI.
+#
+# Usage: python migrate.py [status | up [--to VERSION]]
+#
+
+import argparse
+import importlib
+import os
+import re
+import time
+
+import mysql.connector
+
+import db_utils
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.py$')
+LOCK_TIMEOUT = int(os.getenv('MIGRATION_LOCK_TIMEOUT', '120'))
+AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', 'true').lower() != 'false'
+
+CREATE_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        duration_ms INT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+class MigrationError(Exception):
+    """Raised when migrations can't be discovered or applied."""
+
+
+def discover():
+    """[(version, name)] for every migration file, in order."""
+    migrations = []
+    for file_name in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = MIGRATION_FILE.match(file_name)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2)))
+    versions = [version for version, _ in migrations]
+    if versions != list(range(1, len(versions) + 1)):
+        raise MigrationError(f"Migration versions must be 1..N without gaps or duplicates, found {versions}")
+    return migrations
+
+
+def latest_version():
+    migrations = discover()
+    return migrations[-1][0] if migrations else 0
+
+
+def current_version(cursor):
+    """Highest applied version, or 0 for a database that predates schema_version."""
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+    except mysql.connector.Error as e:
+        if e.errno == 1146:  # Table doesn't exist
+            return 0
+        raise
+    row = cursor.fetchone()
+    return row[0] or 0
+
+
+# helpers for migration files
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1
+    """, (table, index))
+    return cursor.fetchone() is not None
+
+
+def add_column(cursor, table, column, definition):
+    if not column_exists(cursor, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        print(f"Added {column} column to {table} table")
+
+
+def add_index(cursor, table, index, columns):
+    if not index_exists(cursor, table, index):
+        cursor.execute(f"ALTER TABLE {table} ADD INDEX {index} ({columns})")
+        print(f"Added {index} index to {table} table")
+
+
+def _lock_name():
+    # Named locks are server-wide, so scope the name to this database
+    return f"{db_utils.db_config['database']}.schema_migrations"[:64]
+
+
+def migrate(target=None, log=print):
+    """
+    Apply every pending migration up to `target` (default: the latest) while holding the
+    migration lock. Returns the number applied.
+    """
+    migrations = discover()
+    if target is None:
+        target = migrations[-1][0] if migrations else 0
+    conn = db_utils.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (_lock_name(), LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise MigrationError(f"Timed out after {LOCK_TIMEOUT}s waiting for the migration lock")
+        try:
+            cursor.execute(CREATE_VERSION_TABLE)
+            # Another process may have migrated while we waited for the lock
+            version = current_version(cursor)
+            applied = 0
+            for number, name in migrations:
+                if number <= version or number > target:
+                    continue
+                log(f"Applying migration {number:04d}_{name}")
+                started = time.perf_counter()
+                module = importlib.import_module(f"migrations.{number:04d}_{name}")
+                module.upgrade(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, name, duration_ms) VALUES (%s, %s, %s)",
+                    (number, name, int((time.perf_counter() - started) * 1000)),
+                )
+                conn.commit()
+                applied += 1
+            return applied
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (_lock_name(),))
+            cursor.fetchone()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def ensure_schema(auto_migrate=AUTO_MIGRATE, log=print):
+    """
+    Startup check: returns immediately when the schema is current, otherwise migrates (or only
+    warns when auto_migrate is off). Returns the schema version afterwards.
+    """
+    latest = latest_version()
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            version = current_version(cursor)
+    finally:
+        conn.close()
+
+    if version >= latest:
+        if version > latest:
+            log(f"Database schema is at version {version}, newer than this code ({latest})")
+        return version
+    if not auto_migrate:
+        log(f"Database schema is at version {version}, {latest - version} migration(s) pending; "
+            f"run `python migrate.py up`")
+        return version
+    applied = migrate(log=log)
+    log(f"Database schema migrated to version {latest} ({applied} applied)")
+    return latest
+
+
+def status(log=print):
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            version = current_version(cursor)
+            applied = {}
+            if version:
+                cursor.execute("SELECT version, applied_at, duration_ms FROM schema_version")
+                applied = {row[0]: row[1:] for row in cursor.fetchall()}
+    finally:
+        conn.close()
+    for number, name in discover():
+        if number in applied:
+            applied_at, duration_ms = applied[number]
+            log(f"  {number:04d}_{name:<40} applied {applied_at} ({duration_ms} ms)")
+        else:
+            log(f"  {number:04d}_{name:<40} pending")
+    log(f"Schema version {version}, latest {latest_version()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or inspect database schema migrations")
+    sub = parser.add_subparsers(dest='command')
+    sub.add_parser('status', help='list migrations and whether they have been applied')
+    up = sub.add_parser('up', help='apply pending migrations')
+    up.add_argument('--to', type=int, help='stop after this version')
+    args = parser.parse_args()
+
+    if args.command == 'up':
+        applied = migrate(target=args.to)
+        print(f"{applied} migration(s) applied")
+    else:
+        status()
+
+
+if __name__ == '__main__':
+    main()
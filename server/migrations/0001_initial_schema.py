@@ -0,0 +1,73 @@
+# 0001_initial_schema.py
+#
+# Core tables: users, the encrypted incomes/expenses/savings entries, user_preferences and
+# stock_watchlist. IF NOT EXISTS keeps this a no-op on databases created before migrations.
+#
+
+
+def upgrade(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(255) NOT NULL UNIQUE,
+            password_hash VARCHAR(255) NOT NULL,
+            email VARCHAR(255) NOT NULL,
+            full_name VARCHAR(255),
+            phone VARCHAR(20),
+            age INT,
+            occupation VARCHAR(255),
+            annual_income_encrypted TEXT,
+            financial_goal VARCHAR(255),
+            risk_tolerance VARCHAR(50),
+            reset_token VARCHAR(255),
+            reset_token_expires TIMESTAMP NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+
+    for table_name in ("incomes", "expenses", "savings"):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                user_id INT NOT NULL,
+                amount_encrypted TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_user_created (user_id, created_at, id),
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_preferences (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL UNIQUE,
+            current_savings DECIMAL(15,2),
+            monthly_expenses DECIMAL(15,2),
+            emergency_fund_target DECIMAL(15,2),
+            monthly_contribution DECIMAL(15,2),
+            emergency_goal VARCHAR(255),
+            budget_housing_percent DECIMAL(5,2),
+            budget_food_percent DECIMAL(5,2),
+            budget_transportation_percent DECIMAL(5,2),
+            budget_utilities_percent DECIMAL(5,2),
+            budget_entertainment_percent DECIMAL(5,2),
+            budget_other_percent DECIMAL(5,2),
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_watchlist (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            stock_ticker VARCHAR(10) NOT NULL,
+            stock_name VARCHAR(255),
+            current_price DECIMAL(15,2),
+            notes TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            UNIQUE KEY unique_user_ticker (user_id, stock_ticker)
+        )
+    """)
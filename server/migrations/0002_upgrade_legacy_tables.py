@@ -0,0 +1,28 @@
+# 0002_upgrade_legacy_tables.py
+#
+# Brings tables created by builds that predate these columns and indexes up to the 0001 layout
+# (this used to be the SHOW COLUMNS probing in db_utils.initialize_database). No-op on a fresh
+# database.
+#
+
+from migrate import add_column, add_index
+
+PREFERENCE_COLUMNS = (
+    ("current_savings", "DECIMAL(15,2)"),
+    ("monthly_expenses", "DECIMAL(15,2)"),
+    ("budget_housing_percent", "DECIMAL(5,2)"),
+    ("budget_food_percent", "DECIMAL(5,2)"),
+    ("budget_transportation_percent", "DECIMAL(5,2)"),
+    ("budget_utilities_percent", "DECIMAL(5,2)"),
+    ("budget_entertainment_percent", "DECIMAL(5,2)"),
+    ("budget_other_percent", "DECIMAL(5,2)"),
+)
+
+
+def upgrade(cursor):
+    for column, definition in PREFERENCE_COLUMNS:
+        add_column(cursor, "user_preferences", column, definition)
+
+    # Keyset pagination index on the entry tables
+    for table_name in ("incomes", "expenses", "savings"):
+        add_index(cursor, table_name, "idx_user_created", "user_id, created_at, id")
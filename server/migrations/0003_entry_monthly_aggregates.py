@@ -0,0 +1,18 @@
+# 0003_entry_monthly_aggregates.py
+#
+# Per-user, per-month encrypted summaries of the entry tables (see entry_aggregates.py).
+#
+
+
+def upgrade(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS entry_monthly_aggregates (
+            user_id INT NOT NULL,
+            table_name VARCHAR(16) NOT NULL,
+            month DATE NOT NULL,
+            summary_encrypted TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, table_name, month),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
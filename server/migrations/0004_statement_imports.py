@@ -0,0 +1,36 @@
+# 0004_statement_imports.py
+#
+# Statement import bookkeeping (see statement_import.py): content hashes of imported rows for
+# dedup, and per-file checkpoints so interrupted imports resume.
+#
+
+
+def upgrade(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS import_row_hashes (
+            user_id INT NOT NULL,
+            row_hash CHAR(64) NOT NULL,
+            imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, row_hash),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS statement_imports (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            source_key CHAR(64) NOT NULL,
+            file_name VARCHAR(255),
+            file_size BIGINT NOT NULL,
+            byte_offset BIGINT NOT NULL DEFAULT 0,
+            rows_imported INT NOT NULL DEFAULT 0,
+            rows_duplicate INT NOT NULL DEFAULT 0,
+            rows_rejected INT NOT NULL DEFAULT 0,
+            state_json TEXT,
+            status VARCHAR(16) NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            UNIQUE KEY unique_user_source (user_id, source_key),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
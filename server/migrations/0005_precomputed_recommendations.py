@@ -0,0 +1,28 @@
+# 0005_precomputed_recommendations.py
+#
+# Per-user recommendations written by recommendation_job.py, and the job's resume checkpoint.
+#
+
+
+def upgrade(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_recommendations (
+            user_id INT PRIMARY KEY,
+            risk_profile VARCHAR(50),
+            recommendations_json MEDIUMTEXT NOT NULL,
+            snapshot_hash CHAR(16) NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS recommendation_job_state (
+            job_name VARCHAR(64) PRIMARY KEY,
+            snapshot_hash CHAR(16) NOT NULL,
+            last_user_id INT NOT NULL DEFAULT 0,
+            users_done INT NOT NULL DEFAULT 0,
+            status VARCHAR(16) NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
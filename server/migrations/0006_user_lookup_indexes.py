@@ -0,0 +1,13 @@
+# 0006_user_lookup_indexes.py
+#
+# Indexes for the user lookups that filtered on unindexed columns: email (login by email, signup
+# duplicate check, forgot-password) and reset_token (verify/clear during password reset). Email is
+# not made UNIQUE because older databases may already hold duplicates.
+#
+
+from migrate import add_index
+
+
+def upgrade(cursor):
+    add_index(cursor, "users", "idx_users_email", "email")
+    add_index(cursor, "users", "idx_users_reset_token", "reset_token")
@@ -0,0 +1,19 @@
+# 0007_revoked_tokens.py
+#
+# Revoked JWTs shared by every worker (see token_revocation.py). Rows are read incrementally by
+# id and purged once the token they revoke has expired.
+#
+
+
+def upgrade(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            jti VARCHAR(64) NOT NULL,
+            user_id INT,
+            expires_at DATETIME NULL,
+            revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE KEY unique_jti (jti),
+            INDEX idx_expires (expires_at)
+        )
+    """)
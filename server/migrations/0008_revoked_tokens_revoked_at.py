@@ -0,0 +1,12 @@
+# 0008_revoked_tokens_revoked_at.py
+#
+# Index on revoked_tokens.revoked_at. Each revocation refresh reads rows past the last id it has
+# seen or revoked in the last few seconds (to catch late commits); with this index MySQL answers
+# both halves of that OR from indexes instead of scanning the table.
+#
+
+from migrate import add_index
+
+
+def upgrade(cursor):
+    add_index(cursor, "revoked_tokens", "idx_revoked_at", "revoked_at")
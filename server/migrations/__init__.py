@@ -0,0 +1,5 @@
+# __init__.py
+#
+# Schema migrations, applied in order by migrate.py. Add a new NNNN_description.py with the next
+# number and an upgrade(cursor) function; never edit a migration once it has shipped.
+#
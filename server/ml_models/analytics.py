@@ -0,0 +1,238 @@
+# analytics.py
+#
+# Risk analytics computed from stored price history: rolling annualized volatility, beta against a
+# benchmark series, maximum drawdown and Sharpe ratio. Every metric works on a (days x tickers)
+# price matrix at once; rolling windows are differences of cumulative sums, so the cost is linear
+# in the number of observations regardless of the window length. Latest-window results are cached
+# per (ticker, window, as-of date, store version).
+#
+# Recommendations get volatility and beta from ml_models.rolling_stats instead (same window and
+# math, kept up to date incrementally, rounded in the snapshot). /stock-details reports those for
+# both figures so the page agrees with the rankings; only the other metrics come from here.
+#
+
+"""
+Vectorized rolling risk metrics over the local market data store
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+import numpy as np
+
+from ml_models.market_data import BENCHMARK_TICKER, get_store, to_day
+
+TRADING_DAYS = 252
+DEFAULT_WINDOW = int(os.environ.get('ANALYTICS_WINDOW', str(TRADING_DAYS)))
+RISK_FREE_RATE = float(os.environ.get('RISK_FREE_RATE', '0.04'))
+CACHE_SIZE = int(os.environ.get('ANALYTICS_CACHE_SIZE', '50000'))
+
+METRIC_FIELDS = ('volatility', 'beta', 'max_drawdown', 'sharpe_ratio', 'annual_return', 'observations')
+
+
+def log_returns(prices: np.ndarray) -> np.ndarray:
+    """Daily log returns of a (days x tickers) price matrix; NaN wherever either price is missing."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.diff(np.log(prices), axis=0)
+
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum over each trailing window of rows: row k covers values[k : k + window]."""
+    totals = np.cumsum(values, axis=0, dtype=np.float64)
+    out = totals[window - 1:].copy()
+    out[1:] -= totals[:-window]
+    return out
+
+
+def _pad(rolled: np.ndarray, window: int) -> np.ndarray:
+    """Left-pad a rolled result with NaN rows so it lines up with its input."""
+    pad = np.full((window - 1,) + rolled.shape[1:], np.nan)
+    return np.concatenate([pad, rolled])
+
+
+def rolling_moments(returns: np.ndarray, window: int, min_periods: int = None):
+    """Rolling count, mean and sample variance of daily returns, ignoring missing days."""
+    min_periods = min_periods or window
+    valid = np.isfinite(returns)
+    clean = np.where(valid, returns, 0.0)
+    count = _rolling_sum(valid.astype(np.float64), window)
+    total = _rolling_sum(clean, window)
+    total_sq = _rolling_sum(clean * clean, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        variance = np.maximum(total_sq - total * mean, 0.0) / (count - 1)
+    enough = count >= max(min_periods, 2)
+    return count, np.where(enough, mean, np.nan), np.where(enough, variance, np.nan)
+
+
+def rolling_volatility(returns: np.ndarray, window: int = DEFAULT_WINDOW, min_periods: int = None) -> np.ndarray:
+    """Annualized rolling standard deviation of daily returns."""
+    _, _, variance = rolling_moments(returns, window, min_periods)
+    return _pad(np.sqrt(variance * TRADING_DAYS), window)
+
+
+def rolling_beta(returns: np.ndarray, benchmark: np.ndarray, window: int = DEFAULT_WINDOW,
+                 min_periods: int = None) -> np.ndarray:
+    """Rolling beta of each column against the benchmark return series (cov / var over shared days)."""
+    min_periods = min_periods or window
+    benchmark = benchmark.reshape(-1, 1)
+    valid = np.isfinite(returns) & np.isfinite(benchmark)
+    r = np.where(valid, returns, 0.0)
+    b = np.where(valid, benchmark, 0.0)
+    count = _rolling_sum(valid.astype(np.float64), window)
+    sum_r = _rolling_sum(r, window)
+    sum_b = _rolling_sum(b, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = _rolling_sum(r * b, window) - sum_r * sum_b / count
+        benchmark_var = _rolling_sum(b * b, window) - sum_b * sum_b / count
+        beta = covariance / benchmark_var
+    return _pad(np.where(count >= max(min_periods, 2), beta, np.nan), window)
+
+
+def rolling_sharpe(returns: np.ndarray, window: int = DEFAULT_WINDOW, risk_free: float = RISK_FREE_RATE,
+                   min_periods: int = None) -> np.ndarray:
+    """Annualized rolling Sharpe ratio: (mean excess return) / volatility."""
+    _, mean, variance = rolling_moments(returns, window, min_periods)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = (mean * TRADING_DAYS - risk_free) / np.sqrt(variance * TRADING_DAYS)
+    return _pad(sharpe, window)
+
+
+def drawdowns(prices: np.ndarray) -> np.ndarray:
+    """Fractional distance of each price below its running peak (0 at a new high, negative below)."""
+    peaks = np.fmax.accumulate(prices, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return prices / peaks - 1.0
+
+
+def max_drawdown(prices: np.ndarray) -> np.ndarray:
+    """Worst peak-to-trough decline per column over the given rows."""
+    with np.errstate(invalid='ignore'):
+        return np.nanmin(drawdowns(prices), axis=0, initial=0.0)
+
+
+def rolling_metrics(prices: np.ndarray, benchmark_prices: np.ndarray, window: int = DEFAULT_WINDOW,
+                    risk_free: float = RISK_FREE_RATE) -> Dict[str, np.ndarray]:
+    """
+    Full rolling series for a (days x tickers) price matrix aligned with a benchmark price vector.
+    Return-based rows line up with prices[1:]; drawdown is measured from the running all-time peak.
+    """
+    returns = log_returns(prices)
+    benchmark_returns = log_returns(benchmark_prices.reshape(-1, 1))[:, 0]
+    return {
+        'volatility': rolling_volatility(returns, window),
+        'beta': rolling_beta(returns, benchmark_returns, window),
+        'sharpe_ratio': rolling_sharpe(returns, window, risk_free),
+        'drawdown': drawdowns(prices)[1:],
+    }
+
+
+def window_metrics(prices: np.ndarray, benchmark_prices: np.ndarray,
+                   risk_free: float = RISK_FREE_RATE) -> Dict[str, np.ndarray]:
+    """Metrics over exactly the given rows (one trailing window), one value per column."""
+    returns = log_returns(prices)
+    window = len(returns)
+    benchmark_returns = log_returns(benchmark_prices.reshape(-1, 1))[:, 0]
+    count, mean, variance = rolling_moments(returns, window, min_periods=2)
+    return {
+        'volatility': np.sqrt(variance[-1] * TRADING_DAYS),
+        'beta': rolling_beta(returns, benchmark_returns, window, min_periods=2)[-1],
+        'max_drawdown': max_drawdown(prices),
+        'sharpe_ratio': rolling_sharpe(returns, window, risk_free, min_periods=2)[-1],
+        'annual_return': mean[-1] * TRADING_DAYS,
+        'observations': count[-1],
+    }
+
+
+def aligned_closes(tickers: Iterable[str], start=None, end=None, store=None):
+    """
+    Close prices for the tickers on the benchmark's trading calendar between start and end.
+    Returns (calendar days, benchmark closes, days x tickers matrix with NaN for missing bars).
+    """
+    store = store or get_store()
+    calendar = store.range(BENCHMARK_TICKER, start, end)
+    if calendar is None:
+        raise LookupError(f"Benchmark {BENCHMARK_TICKER} has no price history")
+    days = np.asarray(calendar.days)
+    tickers = list(tickers)
+    matrix = np.full((len(days), len(tickers)), np.nan)
+    for j, ticker in enumerate(tickers):
+        history = store.range(ticker, start, end)
+        if history is None or len(history) == 0:
+            continue
+        positions = np.searchsorted(days, history.days)
+        inside = positions < len(days)
+        matched = inside.copy()
+        matched[inside] = days[positions[inside]] == history.days[inside]
+        matrix[positions[matched], j] = history.closes[matched]
+    return days, np.asarray(calendar.closes, dtype=np.float64), matrix
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def compute_metrics(tickers: Iterable[str], window: int = DEFAULT_WINDOW, as_of=None,
+                    store=None) -> Dict[str, Dict]:
+    """
+    Trailing-window metrics for each ticker as of a date (default: latest benchmark bar).
+    Tickers without enough history are left out. Results are cached per (ticker, window, as-of day)
+    and store version, so appended or replaced bars are never served from a stale entry.
+    """
+    store = store or get_store()
+    tickers = [t.upper() for t in tickers]
+    version = store.version()
+    if as_of is None:
+        latest = store.latest(BENCHMARK_TICKER)
+        if latest is None or len(latest) == 0:
+            return {}
+        as_of_day = int(latest.days[-1])
+    else:
+        as_of_day = to_day(as_of)
+
+    results, missing = {}, []
+    with _cache_lock:
+        for ticker in tickers:
+            key = (ticker, window, as_of_day, version)
+            if key in _cache:
+                _cache.move_to_end(key)
+                if _cache[key] is not None:
+                    results[ticker] = _cache[key]
+            else:
+                missing.append(ticker)
+    if not missing:
+        return results
+
+    as_of_date = np.datetime64(as_of_day, 'D')
+    days, benchmark, matrix = aligned_closes(missing, None, as_of_date, store)
+    # window returns need window + 1 prices
+    rows = slice(max(len(days) - window - 1, 0), len(days))
+    metrics = window_metrics(matrix[rows], benchmark[rows])
+
+    computed = {}
+    for j, ticker in enumerate(missing):
+        values = {field: float(metrics[field][j]) for field in METRIC_FIELDS}
+        values['observations'] = int(values['observations'])
+        # Demand most of the window so a handful of bars can't masquerade as a volatility estimate
+        if values['observations'] < window * 0.8 or not np.isfinite(values['volatility']):
+            computed[ticker] = None
+        else:
+            values['window'] = window
+            values['as_of'] = str(as_of_date)
+            computed[ticker] = values
+
+    with _cache_lock:
+        for ticker, values in computed.items():
+            _cache[(ticker, window, as_of_day, version)] = values
+            if values is not None:
+                results[ticker] = values
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return results
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,219 @@
+# goal_projection.py
+#
+# Monte Carlo projection of a savings goal (e.g. the emergency fund target in user_preferences).
+# Each path starts from current savings, grows by a lognormal monthly return and receives the
+# monthly contribution at month end; the engine records the first month each path reaches the
+# target. All paths of a chunk advance together as NumPy vectors, one month per step.
+#
+# Paths are simulated in fixed-size chunks whose RNG streams are spawned from one SeedSequence,
+# so a given seed gives identical results whether chunks run inline or across a process pool.
+# Results are cached per parameter set.
+#
+
+"""
+Vectorized Monte Carlo savings-goal projection
+"""
+
+import copy
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+
+DEFAULT_ANNUAL_RETURN = float(os.environ.get('GOAL_ANNUAL_RETURN', '0.04'))
+DEFAULT_ANNUAL_VOLATILITY = float(os.environ.get('GOAL_ANNUAL_VOLATILITY', '0.08'))
+DEFAULT_PATHS = int(os.environ.get('GOAL_PATHS', '20000'))
+DEFAULT_WORKERS = int(os.environ.get('GOAL_PROJECTION_WORKERS', '1'))
+CHUNK_PATHS = 25000
+MAX_MONTHS = 600
+MAX_PATHS = 200000
+CACHE_SIZE = int(os.environ.get('GOAL_PROJECTION_CACHE_SIZE', '1024'))
+
+CHECKPOINT_MONTHS = (6, 12, 24, 36, 60, 120, 240, 360)
+NOT_REACHED = -1
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def simulate_chunk(current_savings: float, monthly_contribution: float, target: float,
+                   annual_return: float, annual_volatility: float, months: int, paths: int,
+                   seed_sequence: np.random.SeedSequence):
+    """
+    Simulate `paths` paths for up to `months` months. Returns (first month each path reached the
+    target, NOT_REACHED if it never did; final balance of each path).
+    """
+    rng = np.random.default_rng(seed_sequence)
+    sigma = annual_volatility / np.sqrt(12)
+    # Drift chosen so the expected growth over a year is exactly 1 + annual_return
+    mu = np.log1p(annual_return) / 12 - 0.5 * sigma * sigma
+
+    balance = np.full(paths, float(current_savings))
+    first_hit = np.full(paths, NOT_REACHED, dtype=np.int16)
+    first_hit[balance >= target] = 0
+    growth = np.empty(paths)
+    for month in range(1, months + 1):
+        rng.standard_normal(paths, out=growth)
+        growth *= sigma
+        growth += mu
+        np.exp(growth, out=growth)
+        balance *= growth
+        balance += monthly_contribution
+        newly = (balance >= target) & (first_hit == NOT_REACHED)
+        first_hit[newly] = month
+    return first_hit, balance
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    key = (workers, os.getpid())
+    executor = _executors.get(key)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(key)
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=workers)
+                _executors[key] = executor
+    return executor
+
+
+def default_seed(*params) -> int:
+    """Stable seed derived from the inputs, so identical requests get identical projections."""
+    digest = hashlib.sha256(repr(params).encode()).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+
+def _percentile_months(first_hit: np.ndarray, quantile: float) -> Optional[int]:
+    """Month by which `quantile` of the paths reached the target, or None if fewer ever did."""
+    reached = np.sort(first_hit[first_hit != NOT_REACHED])
+    needed = int(np.ceil(quantile * len(first_hit)))
+    if needed == 0:
+        return 0
+    if len(reached) < needed:
+        return None
+    return int(reached[needed - 1])
+
+
+def deterministic_months(current_savings: float, monthly_contribution: float, target: float,
+                         annual_return: float, months: int) -> Optional[int]:
+    """Months to the target at a constant return (no volatility), or None if not within `months`."""
+    rate = (1 + annual_return) ** (1 / 12)
+    balance = current_savings
+    if balance >= target:
+        return 0
+    for month in range(1, months + 1):
+        balance = balance * rate + monthly_contribution
+        if balance >= target:
+            return month
+    return None
+
+
+def _run_projection(current_savings, monthly_contribution, target, annual_return, annual_volatility,
+                    months, paths, seed, workers):
+    chunks = [min(CHUNK_PATHS, paths - start) for start in range(0, paths, CHUNK_PATHS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    args = [(current_savings, monthly_contribution, target, annual_return, annual_volatility, months,
+             size, chunk_seed) for size, chunk_seed in zip(chunks, seeds)]
+
+    if workers > 1 and len(chunks) > 1:
+        executor = _get_executor(workers)
+        results = list(executor.map(simulate_chunk, *zip(*args)))
+    else:
+        results = [simulate_chunk(*chunk_args) for chunk_args in args]
+    first_hit = np.concatenate([r[0] for r in results])
+    final_balance = np.concatenate([r[1] for r in results])
+
+    reached = first_hit != NOT_REACHED
+    checkpoints = {
+        str(m): round(float(np.mean(reached & (first_hit <= m))), 4) for m in CHECKPOINT_MONTHS if m <= months
+    }
+    checkpoints[str(months)] = round(float(reached.mean()), 4)
+    return {
+        'inputs': {
+            'current_savings': current_savings,
+            'monthly_contribution': monthly_contribution,
+            'target': target,
+            'annual_return': annual_return,
+            'annual_volatility': annual_volatility,
+            'months': months,
+            'paths': paths,
+            'seed': seed,
+        },
+        'probability_reached': round(float(reached.mean()), 4),
+        'probability_by_month': checkpoints,
+        'months_to_target': {
+            'p10': _percentile_months(first_hit, 0.10),
+            'p50': _percentile_months(first_hit, 0.50),
+            'p90': _percentile_months(first_hit, 0.90),
+            'expected_without_volatility': deterministic_months(
+                current_savings, monthly_contribution, target, annual_return, months
+            ),
+        },
+        'final_balance': {
+            f'p{q}': round(float(v), 2)
+            for q, v in zip((10, 50, 90), np.percentile(final_balance, (10, 50, 90)))
+        },
+    }
+
+
+def project_goal(current_savings: float, monthly_contribution: float, target: float,
+                 annual_return: float = DEFAULT_ANNUAL_RETURN,
+                 annual_volatility: float = DEFAULT_ANNUAL_VOLATILITY,
+                 months: int = 360, paths: int = DEFAULT_PATHS, seed: int = None,
+                 workers: int = DEFAULT_WORKERS) -> Dict:
+    """
+    Probability of reaching `target` within `months` and the distribution of time to target.
+    Raises ValueError for out-of-range inputs.
+    """
+    if not all(math.isfinite(v) for v in (current_savings, monthly_contribution, target,
+                                          annual_return, annual_volatility)):
+        raise ValueError("projection inputs must be finite numbers")
+    if target <= 0:
+        raise ValueError("target must be positive")
+    if current_savings < 0 or monthly_contribution < 0:
+        raise ValueError("current_savings and monthly_contribution can't be negative")
+    if not 1 <= months <= MAX_MONTHS:
+        raise ValueError(f"months must be between 1 and {MAX_MONTHS}")
+    if not 1 <= paths <= MAX_PATHS:
+        raise ValueError(f"paths must be between 1 and {MAX_PATHS}")
+    if annual_return <= -1 or annual_volatility < 0:
+        raise ValueError("annual_return must be above -100% and annual_volatility non-negative")
+
+    # Money inputs to the cent and rates to basis points so equivalent requests share a cache entry
+    params = (round(float(current_savings), 2), round(float(monthly_contribution), 2), round(float(target), 2),
+              round(float(annual_return), 4), round(float(annual_volatility), 4), int(months), int(paths))
+    if seed is None:
+        seed = default_seed(*params)
+    # Worker count doesn't change results (chunk seeds are fixed), so it isn't part of the key
+    key = params + (int(seed),)
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+            _cache_stats['hits'] += 1
+    if result is None:
+        result = _run_projection(*key, max(int(workers), 1))
+        with _cache_lock:
+            _cache_stats['misses'] += 1
+            _cache[key] = result
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return copy.deepcopy(result)
+
+
+def cache_stats() -> Dict:
+    with _cache_lock:
+        return dict(_cache_stats, size=len(_cache))
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,383 @@
+# market_data.py
+#
+# Local on-disk market data store. Each ticker keeps two flat binary columns under
+# <MARKET_DATA_DIR>/<TICKER>/: dates.i8 (int64 days since 1970-01-01, ascending) and ohlcv.f8
+# (float64 rows of open, high, low, close, volume). Reads memory-map the files, so range queries
+# return zero-copy views; daily bars are appended in place. The store seeds itself from the CSV
+# fixtures in data/market_fixtures/ so it works offline.
+#
+# Writers in different processes (server workers, the CLI) serialize on an flock of <root>/.lock.
+# Every write bumps the counters in <root>/VERSION, which readers poll to notice new data; a
+# replaced history is written to a temporary directory and renamed into place, so readers see
+# either the old bars or the new ones. The old directory is moved aside just before the new one
+# takes its name, so a reader that finds no directory waits on a shared flock for the writer to
+# finish and looks again. Readers open both columns through one directory handle, so they never
+# pair the dates of one history with the prices of another. Seeding is done once, by whichever process gets the lock.
+#
+# Usage: python -m ml_models.market_data import data/market_fixtures
+#        python -m ml_models.market_data append AAPL new_bars.csv
+#
+
+"""
+Memory-mapped OHLCV history store
+"""
+
+import argparse
+import csv
+import fcntl
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_ROOT = os.environ.get('MARKET_DATA_DIR', os.path.join(SERVER_DIR, 'data', 'market'))
+FIXTURE_DIR = os.environ.get('MARKET_FIXTURE_DIR', os.path.join(SERVER_DIR, 'data', 'market_fixtures'))
+BENCHMARK_TICKER = os.environ.get('MARKET_BENCHMARK', 'SPY')
+
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(5)
+FIELDS = 5
+DATE_BYTES = 8
+ROW_BYTES = FIELDS * 8
+
+
+def to_day(value) -> int:
+    """Days since the epoch for a date, datetime, numpy datetime64 or 'YYYY-MM-DD' string"""
+    return int(np.datetime64(str(value)[:10], 'D').astype(np.int64))
+
+
+class PriceHistory:
+    """
+    Zero-copy view over one ticker's bars. dates is datetime64[D]; ohlcv is an (n, 5) float64 array.
+    """
+
+    __slots__ = ('ticker', 'days', 'ohlcv', 'file_id')
+
+    def __init__(self, ticker: str, days: np.ndarray, ohlcv: np.ndarray, file_id=None):
+        self.ticker = ticker
+        self.days = days
+        self.ohlcv = ohlcv
+        self.file_id = file_id
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self.days.view('datetime64[D]')
+
+    @property
+    def closes(self) -> np.ndarray:
+        return self.ohlcv[:, CLOSE]
+
+    def to_records(self) -> List[Dict]:
+        return [
+            {'date': str(d), 'open': float(o), 'high': float(h), 'low': float(l),
+             'close': float(c), 'volume': float(v)}
+            for d, (o, h, l, c, v) in zip(self.dates, self.ohlcv)
+        ]
+
+
+class MarketDataStore:
+    """
+    Columnar per-ticker OHLCV store backed by memory-mapped files.
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT):
+        self.root = root
+        self._maps = {}
+        self._lock = threading.Lock()
+        self._writer = threading.local()
+        os.makedirs(root, exist_ok=True)
+
+    def _paths(self, ticker: str, directory: str = None) -> Tuple[str, str]:
+        directory = directory or os.path.join(self.root, ticker.upper())
+        return os.path.join(directory, 'dates.i8'), os.path.join(directory, 'ohlcv.f8')
+
+    @contextmanager
+    def write_lock(self):
+        """Exclusive across threads and processes writing to this root"""
+        with self._lock:
+            with open(os.path.join(self.root, '.lock'), 'a') as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                self._writer.active = True
+                try:
+                    yield
+                finally:
+                    self._writer.active = False
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _read_lock(self):
+        """Shared flock of <root>/.lock: waits for any write in progress, blocks none of the readers"""
+        with open(os.path.join(self.root, '.lock'), 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def version_info(self) -> Dict[str, int]:
+        """{'version': writes so far, 'rewrites': how many of them replaced history}; zeros if never written"""
+        try:
+            with open(os.path.join(self.root, 'VERSION')) as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {'version': 0, 'rewrites': 0}
+
+    def version(self) -> int:
+        return self.version_info()['version']
+
+    def _bump_version(self, rewrite: bool):
+        # Caller holds write_lock
+        info = self.version_info()
+        info['version'] += 1
+        info['rewrites'] += int(rewrite)
+        path = os.path.join(self.root, 'VERSION')
+        with open(path + '.tmp', 'w') as handle:
+            json.dump(info, handle)
+        os.replace(path + '.tmp', path)
+
+    def tickers(self) -> List[str]:
+        return sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith('.') and os.path.isfile(os.path.join(self.root, name, 'dates.i8'))
+        )
+
+    def has(self, ticker: str) -> bool:
+        return os.path.isfile(self._paths(ticker)[0])
+
+    def _open_columns(self, ticker: str):
+        """
+        (dates, ohlcv) file objects opened through one handle on the ticker's directory, so both
+        come from the same history even if a replace renames a new one into place meanwhile;
+        None if there is no such directory or file
+        """
+        try:
+            dir_fd = os.open(os.path.join(self.root, ticker), os.O_RDONLY | os.O_DIRECTORY)
+        except OSError:
+            return None
+        files = []
+        try:
+            for name in ('dates.i8', 'ohlcv.f8'):
+                files.append(open(os.open(name, os.O_RDONLY, dir_fd=dir_fd), 'rb'))
+            return files
+        except OSError:
+            for handle in files:
+                handle.close()
+            return None
+        finally:
+            os.close(dir_fd)
+
+    def history(self, ticker: str) -> Optional[PriceHistory]:
+        """Full history for a ticker as memory-mapped arrays, or None if the ticker is unknown"""
+        ticker = ticker.upper()
+        cached = self._maps.get(ticker)
+        if cached is not None:
+            # Both files still the ones mapped, with the same row count: nothing to reopen
+            try:
+                dates_stat, ohlcv_stat = (os.stat(path) for path in self._paths(ticker))
+                if (cached.file_id == (dates_stat.st_ino, ohlcv_stat.st_ino)
+                        and len(cached) == self._rows(dates_stat, ohlcv_stat)):
+                    return cached
+            except OSError:
+                pass
+
+        files = self._open_columns(ticker)
+        if files is None:
+            # Unknown ticker, or a replace is between its two renames: once no write is in
+            # progress the directory is back (the writer itself already knows it isn't)
+            if getattr(self._writer, 'active', False):
+                return None
+            with self._read_lock():
+                files = self._open_columns(ticker)
+            if files is None:
+                return None
+
+        dates_file, ohlcv_file = files
+        with dates_file, ohlcv_file:
+            dates_stat, ohlcv_stat = os.fstat(dates_file.fileno()), os.fstat(ohlcv_file.fileno())
+            rows = self._rows(dates_stat, ohlcv_stat)
+            # A replaced history has new files, which a row count alone wouldn't notice
+            file_id = (dates_stat.st_ino, ohlcv_stat.st_ino)
+            if rows == 0:
+                return PriceHistory(ticker, np.empty(0, np.int64), np.empty((0, FIELDS)))
+            # The maps stay valid after the files are closed (and after a replace unlinks them)
+            days = np.memmap(dates_file, dtype=np.int64, mode='r', shape=(rows,))
+            ohlcv = np.memmap(ohlcv_file, dtype=np.float64, mode='r', shape=(rows, FIELDS))
+        cached = PriceHistory(ticker, days, ohlcv, file_id)
+        self._maps[ticker] = cached
+        return cached
+
+    @staticmethod
+    def _rows(dates_stat, ohlcv_stat) -> int:
+        # Appends write ohlcv before dates, so the row count readers trust is the smaller one
+        return min(dates_stat.st_size // DATE_BYTES, ohlcv_stat.st_size // ROW_BYTES)
+
+    def range(self, ticker: str, start=None, end=None) -> Optional[PriceHistory]:
+        """Bars with start <= date <= end (either bound optional), as a zero-copy slice"""
+        history = self.history(ticker)
+        if history is None:
+            return None
+        lo = 0 if start is None else int(np.searchsorted(history.days, to_day(start), side='left'))
+        hi = len(history) if end is None else int(np.searchsorted(history.days, to_day(end), side='right'))
+        return PriceHistory(history.ticker, history.days[lo:hi], history.ohlcv[lo:hi])
+
+    def latest(self, ticker: str, count: int = 1) -> Optional[PriceHistory]:
+        history = self.history(ticker)
+        if history is None:
+            return None
+        return PriceHistory(history.ticker, history.days[-count:], history.ohlcv[-count:])
+
+    def latest_closes(self, tickers: Iterable[str]) -> Dict[str, float]:
+        closes = {}
+        for ticker in tickers:
+            history = self.history(ticker)
+            if history is not None and len(history):
+                closes[ticker.upper()] = float(history.closes[-1])
+        return closes
+
+    @staticmethod
+    def _columns(ticker: str, bars: Iterable[Tuple]) -> Tuple[np.ndarray, np.ndarray]:
+        bars = sorted(bars, key=lambda bar: to_day(bar[0]))
+        days = np.array([to_day(bar[0]) for bar in bars], dtype=np.int64)
+        ohlcv = np.array([bar[1:6] for bar in bars], dtype=np.float64).reshape(-1, FIELDS)
+        if np.any(np.diff(days) <= 0):
+            raise ValueError(f"Duplicate dates in bars for {ticker}")
+        return days, ohlcv
+
+    def append(self, ticker: str, bars: Iterable[Tuple]) -> int:
+        """
+        Append (date, open, high, low, close, volume) bars. Dates must be strictly after the
+        last stored bar. Returns the number of bars written.
+        """
+        ticker = ticker.upper()
+        days, ohlcv = self._columns(ticker, bars)
+        if not len(days):
+            return 0
+
+        with self.write_lock():
+            history = self.history(ticker)
+            if history is not None and len(history) and days[0] <= history.days[-1]:
+                raise ValueError(f"{ticker} bars must be newer than {history.dates[-1]}")
+            dates_path, ohlcv_path = self._paths(ticker)
+            os.makedirs(os.path.dirname(dates_path), exist_ok=True)
+            with open(ohlcv_path, 'ab') as handle:
+                handle.write(ohlcv.tobytes())
+            with open(dates_path, 'ab') as handle:
+                handle.write(days.tobytes())
+            self._maps.pop(ticker, None)
+            self._bump_version(rewrite=False)
+        return len(days)
+
+    def replace(self, ticker: str, bars: Iterable[Tuple]) -> int:
+        """Swap the ticker's stored history for the given bars"""
+        ticker = ticker.upper()
+        days, ohlcv = self._columns(ticker, bars)
+        with self.write_lock():
+            self._replace_locked(ticker, days, ohlcv)
+            self._bump_version(rewrite=True)
+        return len(days)
+
+    def _replace_locked(self, ticker: str, days: np.ndarray, ohlcv: np.ndarray):
+        directory = os.path.join(self.root, ticker)
+        staging = os.path.join(self.root, f'.{ticker}.new-{os.getpid()}')
+        retired = os.path.join(self.root, f'.{ticker}.old-{os.getpid()}')
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        dates_path, ohlcv_path = self._paths(ticker, staging)
+        with open(ohlcv_path, 'wb') as handle:
+            handle.write(ohlcv.tobytes())
+        with open(dates_path, 'wb') as handle:
+            handle.write(days.tobytes())
+        # Readers that already mapped the old files keep them until they let go
+        if os.path.isdir(directory):
+            os.rename(directory, retired)
+        os.rename(staging, directory)
+        shutil.rmtree(retired, ignore_errors=True)
+        self._maps.pop(ticker, None)
+
+    def load_csv(self, path: str, ticker: str = None, append: bool = False) -> int:
+        """Load a Date,Open,High,Low,Close,Volume CSV (ticker defaults to the file name)"""
+        ticker = ticker or os.path.splitext(os.path.basename(path))[0]
+        bars = read_csv_bars(path)
+        if append:
+            history = self.history(ticker)
+            if history is not None and len(history):
+                last = history.days[-1]
+                bars = [bar for bar in bars if to_day(bar[0]) > last]
+            return self.append(ticker, bars)
+        return self.replace(ticker, bars)
+
+    def import_csv_dir(self, directory: str = FIXTURE_DIR, only_if_empty: bool = False) -> int:
+        """
+        (Re)load every CSV in the directory as one write. With only_if_empty, do nothing if the
+        store has ever been written, so concurrent first users seed it exactly once.
+        """
+        loaded = 0
+        with self.write_lock():
+            if only_if_empty and (self.version() or self.tickers()):
+                return 0
+            for name in sorted(os.listdir(directory)):
+                if name.lower().endswith('.csv'):
+                    ticker = os.path.splitext(name)[0].upper()
+                    days, ohlcv = self._columns(ticker, read_csv_bars(os.path.join(directory, name)))
+                    self._replace_locked(ticker, days, ohlcv)
+                    loaded += 1
+            self._bump_version(rewrite=True)
+        return loaded
+
+
+def read_csv_bars(path: str) -> List[Tuple]:
+    bars = []
+    with open(path, newline='') as handle:
+        for row in csv.DictReader(handle):
+            bars.append((
+                row['Date'], float(row['Open']), float(row['High']), float(row['Low']),
+                float(row['Close']), float(row.get('Volume') or 0),
+            ))
+    return bars
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> MarketDataStore:
+    """Process-wide store, seeded from the CSV fixtures if nothing has ever been written to it"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = MarketDataStore()
+                # Another worker may be seeding right now: version stays 0 until it finishes, and
+                # import_csv_dir waits for its lock and then finds nothing left to do
+                if store.version() == 0 and os.path.isdir(FIXTURE_DIR):
+                    store.import_csv_dir(FIXTURE_DIR, only_if_empty=True)
+                _store = store
+    return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local market data store")
+    sub = parser.add_subparsers(dest='command', required=True)
+    import_cmd = sub.add_parser('import', help='(re)load every CSV in a directory')
+    import_cmd.add_argument('directory', nargs='?', default=FIXTURE_DIR)
+    append_cmd = sub.add_parser('append', help='append new daily bars from a CSV')
+    append_cmd.add_argument('ticker')
+    append_cmd.add_argument('path')
+    args = parser.parse_args()
+
+    store = MarketDataStore()
+    if args.command == 'import':
+        print(f"Imported {store.import_csv_dir(args.directory)} tickers into {store.root}")
+    else:
+        print(f"Appended {store.load_csv(args.path, args.ticker, append=True)} bars to {args.ticker.upper()}")
+
+
+if __name__ == '__main__':
+    main()
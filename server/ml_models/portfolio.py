@@ -0,0 +1,323 @@
+# portfolio.py
+#
+# Portfolio construction for a set of tickers (typically a user's watchlist). Builds an annualized
+# covariance matrix from stored daily closes, shrunk toward a scaled identity (Ledoit-Wolf) so it
+# stays well conditioned when there are more assets than days, then solves either
+#   - long-only mean-variance weights (projected-gradient warm start, then an exact active-set
+#     solve), with risk aversion and the per-asset cap set by the user's risk tolerance, or
+#   - risk-parity weights (Newton's method on the convex log-barrier formulation),
+# using matrix-vector products and one linear solve per active-set or Newton step.
+#
+
+"""
+Mean-variance and risk-parity portfolio weights from price history
+"""
+
+import os
+from typing import Dict, Sequence
+
+import numpy as np
+
+from ml_models.analytics import DEFAULT_WINDOW, RISK_FREE_RATE, TRADING_DAYS, aligned_closes, log_returns
+from ml_models.market_data import BENCHMARK_TICKER, get_store
+
+METHODS = ('mean_variance', 'risk_parity')
+MARKET_PREMIUM = float(os.environ.get('MARKET_PREMIUM', '0.05'))
+RISK_AVERSION_RANGE = (12.0, 1.0)  # risk tolerance 1 -> 12, risk tolerance 10 -> 1
+MAX_WEIGHT_RANGE = (0.25, 0.60)
+MIN_OBSERVATIONS = 60
+
+
+def returns_matrix(prices: np.ndarray) -> np.ndarray:
+    """Daily log returns with each column demeaned over its own valid days; missing days are 0."""
+    returns = log_returns(prices)
+    valid = np.isfinite(returns)
+    counts = np.maximum(valid.sum(axis=0), 1)
+    means = np.where(valid, returns, 0.0).sum(axis=0) / counts
+    return np.where(valid, returns - means, 0.0), valid
+
+
+def shrunk_covariance(centered: np.ndarray, valid: np.ndarray = None):
+    """
+    Annualized Ledoit-Wolf covariance: the pairwise-complete sample covariance pulled toward
+    mu * I by the estimated optimal intensity. Returns (covariance, shrinkage intensity).
+    """
+    if valid is None:
+        valid = np.ones(centered.shape, dtype=bool)
+    v = valid.astype(np.float64)
+    pairs = np.maximum(v.T @ v, 2.0)
+    sample = (centered.T @ centered) / (pairs - 1)
+    n = centered.shape[1]
+    target_scale = np.trace(sample) / n
+
+    # Ledoit-Wolf (2004) intensity, computed on the zero-filled returns
+    t = max(centered.shape[0], 2)
+    squared = centered * centered
+    pi_hat = ((squared.T @ squared) / t - (centered.T @ centered / t) ** 2).sum()
+    gamma_hat = ((sample - target_scale * np.eye(n)) ** 2).sum()
+    intensity = 1.0 if gamma_hat <= 0 else float(np.clip(pi_hat / t / gamma_hat, 0.0, 1.0))
+
+    covariance = (1 - intensity) * sample
+    covariance[np.diag_indices(n)] += intensity * target_scale
+    return covariance * TRADING_DAYS, intensity
+
+
+def project_capped_simplex(values: np.ndarray, cap: float) -> np.ndarray:
+    """
+    Euclidean projection onto {w : sum(w) = 1, 0 <= w <= cap}: find the shift t with
+    sum(clip(values - t, 0, cap)) = 1. That sum is piecewise linear in t with breakpoints at
+    values and values - cap, so it is evaluated at every breakpoint at once with prefix sums and
+    the crossing segment is interpolated exactly.
+    """
+    ordered = np.sort(values)
+    prefix = np.concatenate(([0.0], np.cumsum(ordered)))
+    n = len(ordered)
+
+    def clipped_sum(shift):
+        top = np.searchsorted(ordered, shift + cap, side='right')
+        bottom = np.searchsorted(ordered, shift, side='right')
+        return cap * (n - top) + prefix[top] - prefix[bottom] - shift * (top - bottom)
+
+    breakpoints = np.sort(np.concatenate((ordered, ordered - cap)))
+    sums = clipped_sum(breakpoints)
+    # sums is non-increasing; find the last breakpoint still at or above 1
+    j = min(int(np.searchsorted(-sums, -1.0, side='right')) - 1, len(breakpoints) - 2)
+    j = max(j, 0)
+    left, right = breakpoints[j], breakpoints[j + 1]
+    drop = sums[j] - sums[j + 1]
+    shift = left if drop <= 0 else left + (sums[j] - 1.0) / drop * (right - left)
+    return np.clip(values - shift, 0.0, cap)
+
+
+def _largest_eigenvalue(matrix: np.ndarray, iterations: int = 50) -> float:
+    vector = np.full(len(matrix), 1.0 / np.sqrt(len(matrix)))
+    value = 0.0
+    for _ in range(iterations):
+        product = matrix @ vector
+        value = float(np.linalg.norm(product))
+        if value == 0:
+            return 0.0
+        vector = product / value
+    return value
+
+
+def _projected_gradient(expected, covariance, risk_aversion, max_weight, iterations, tol=1e-9):
+    """FISTA (accelerated projected gradient) iterations; every iterate is feasible."""
+    n = len(expected)
+    # Power iteration overshoots by at most a few percent; pad the step accordingly
+    step = 1.0 / (risk_aversion * _largest_eigenvalue(covariance) * 1.05 + 1e-12)
+    weights = np.full(n, 1.0 / n)
+    momentum, t = weights.copy(), 1.0
+    for _ in range(iterations):
+        gradient = risk_aversion * (covariance @ momentum) - expected
+        updated = project_capped_simplex(momentum - step * gradient, max_weight)
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        momentum = updated + ((t - 1) / t_next) * (updated - weights)
+        converged = np.abs(updated - weights).max() < tol
+        weights, t = updated, t_next
+        if converged:
+            break
+    return weights
+
+
+def _active_set(weights, expected, covariance, risk_aversion, max_weight, bound_tol=1e-9, max_iter=None):
+    """
+    Primal active-set refinement from a feasible starting point: solve the equality-constrained
+    problem on the free assets (one KKT linear system), step until a bound blocks, and release the
+    bound with the largest violated multiplier once the free solution is feasible.
+    """
+    n = len(weights)
+    weights = weights.copy()
+    lower = weights <= bound_tol
+    upper = weights >= max_weight - bound_tol
+    weights[lower], weights[upper] = 0.0, max_weight
+    for _ in range(max_iter or 4 * n):
+        free = np.flatnonzero(~(lower | upper))
+        fixed = np.flatnonzero(upper)
+        if free.size == 0:
+            # All assets at a bound: only optimal if multipliers agree; otherwise free the best one
+            gradient = expected - risk_aversion * covariance @ weights
+            candidates = np.flatnonzero(lower)
+            if candidates.size == 0:
+                return weights
+            release = candidates[np.argmax(gradient[candidates])]
+            lower[release] = False
+            continue
+
+        k = free.size
+        system = np.empty((k + 1, k + 1))
+        system[:k, :k] = risk_aversion * covariance[np.ix_(free, free)]
+        system[:k, k] = -1.0
+        system[k, :k] = 1.0
+        system[k, k] = 0.0
+        rhs = np.empty(k + 1)
+        rhs[:k] = expected[free] - risk_aversion * covariance[np.ix_(free, fixed)] @ weights[fixed]
+        rhs[k] = 1.0 - weights[fixed].sum()
+        solution = np.linalg.solve(system, rhs)
+        # The multiplier is the common value of (C w * risk_aversion - expected) on free assets
+        target, level = solution[:k], -solution[k]
+
+        direction = target - weights[free]
+        ratios = np.full(k, np.inf)
+        down, up = direction < 0, direction > 0
+        ratios[down] = weights[free][down] / -direction[down]
+        ratios[up] = (max_weight - weights[free][up]) / direction[up]
+        blocking = int(np.argmin(ratios))
+        if ratios[blocking] < 1.0:
+            weights[free] += ratios[blocking] * direction
+            index = free[blocking]
+            if direction[blocking] < 0:
+                weights[index], lower[index] = 0.0, True
+            else:
+                weights[index], upper[index] = max_weight, True
+            continue
+
+        weights[free] = target
+        gradient = expected - risk_aversion * covariance @ weights
+        violation = np.zeros(n)
+        violation[lower] = gradient[lower] - level
+        violation[upper] = level - gradient[upper]
+        worst = int(np.argmax(violation))
+        if violation[worst] <= 1e-12 * max(1.0, np.abs(gradient).max()):
+            return weights
+        lower[worst] = upper[worst] = False
+    return weights
+
+
+def mean_variance_weights(expected: np.ndarray, covariance: np.ndarray, risk_aversion: float,
+                          max_weight: float = 1.0, warm_start_iterations: int = 200) -> np.ndarray:
+    """
+    Long-only, fully invested weights maximizing expected'w - risk_aversion / 2 * w'Cw, with each
+    weight at most max_weight. A short projected-gradient run finds roughly which assets are held;
+    an active-set method then solves the KKT system exactly.
+    """
+    max_weight = max(max_weight, 1.0 / len(expected))
+    weights = _projected_gradient(expected, covariance, risk_aversion, max_weight, warm_start_iterations)
+    return _active_set(weights, expected, covariance, risk_aversion, max_weight)
+
+
+def risk_parity_weights(covariance: np.ndarray, budgets: np.ndarray = None, tol: float = 1e-14,
+                        max_iter: int = 100) -> np.ndarray:
+    """
+    Long-only weights whose risk contributions w_i (Cw)_i are proportional to budgets (equal by
+    default). Newton's method on min 1/2 y'Cy - sum(b log y), then w = y / sum(y).
+    """
+    n = len(covariance)
+    budgets = np.full(n, 1.0 / n) if budgets is None else np.asarray(budgets, dtype=np.float64) / np.sum(budgets)
+    y = 1.0 / np.sqrt(np.diag(covariance))
+    y *= np.sqrt(1.0 / (y @ covariance @ y))
+
+    def objective(point):
+        return 0.5 * point @ covariance @ point - budgets @ np.log(point)
+
+    for _ in range(max_iter):
+        gradient = covariance @ y - budgets / y
+        hessian = covariance + np.diag(budgets / (y * y))
+        direction = np.linalg.solve(hessian, gradient)
+        decrement = float(gradient @ direction)
+        if decrement / 2 < tol:
+            break
+        # Backtrack to stay in the positive orthant and keep decreasing
+        step = 1.0
+        negative = direction > 0
+        if negative.any():
+            step = min(1.0, 0.99 * float(np.min(y[negative] / direction[negative])))
+        current = objective(y)
+        while objective(y - step * direction) > current - 0.25 * step * decrement and step > 1e-10:
+            step /= 2
+        y = y - step * direction
+    return y / y.sum()
+
+
+def risk_contributions(weights: np.ndarray, covariance: np.ndarray) -> np.ndarray:
+    """Fraction of portfolio variance contributed by each asset."""
+    marginal = covariance @ weights
+    total = weights @ marginal
+    return weights * marginal / total if total > 0 else np.zeros_like(weights)
+
+
+def risk_preferences(risk_tolerance: int):
+    """(risk aversion, max weight per asset) for a 1-10 risk tolerance."""
+    position = (min(max(risk_tolerance, 1), 10) - 1) / 9
+    high, low = RISK_AVERSION_RANGE
+    risk_aversion = high * (low / high) ** position
+    max_weight = MAX_WEIGHT_RANGE[0] + (MAX_WEIGHT_RANGE[1] - MAX_WEIGHT_RANGE[0]) * position
+    return risk_aversion, max_weight
+
+
+def expected_returns(tickers: Sequence[str], betas: np.ndarray) -> np.ndarray:
+    """
+    Annual expected returns: the recommender's predicted return where it covers the ticker,
+    otherwise CAPM (risk-free rate + beta * market premium) from the measured beta.
+    """
+    from ml_models.stock_predictor import get_snapshot
+
+    snapshot = get_snapshot()
+    expected = RISK_FREE_RATE + np.nan_to_num(betas, nan=1.0) * MARKET_PREMIUM
+    for j, ticker in enumerate(tickers):
+        row = snapshot.index.lookup(ticker)
+        if row is not None:
+            expected[j] = snapshot.universe.predicted_return_1yr[row] / 100
+    return expected
+
+
+def build_portfolio(tickers: Sequence[str], risk_tolerance: int = 5, method: str = 'mean_variance',
+                    window: int = DEFAULT_WINDOW, store=None) -> Dict:
+    """
+    Weights for the given tickers from the trailing `window` days of closes. Tickers without
+    enough history are reported under 'skipped'.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method: {method}")
+    store = store or get_store()
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+
+    latest = store.latest(BENCHMARK_TICKER, window + 1)
+    if latest is None or len(latest) == 0:
+        raise LookupError("No benchmark price history")
+    days, benchmark, prices = aligned_closes(tickers, latest.dates[0], latest.dates[-1], store)
+
+    centered, valid = returns_matrix(prices)
+    enough = valid.sum(axis=0) >= min(MIN_OBSERVATIONS, max(len(days) - 1, 2))
+    skipped = [t for t, ok in zip(tickers, enough) if not ok]
+    kept = [t for t, ok in zip(tickers, enough) if ok]
+    result = {'method': method, 'risk_tolerance': risk_tolerance, 'as_of': str(latest.dates[-1]),
+              'weights': [], 'skipped': skipped}
+    if not kept:
+        return result
+
+    centered, valid = centered[:, enough], valid[:, enough]
+    covariance, intensity = shrunk_covariance(centered, valid)
+
+    bench_centered, _ = returns_matrix(benchmark.reshape(-1, 1))
+    bench_var = float(bench_centered[:, 0] @ bench_centered[:, 0])
+    betas = (centered.T @ bench_centered[:, 0]) / bench_var if bench_var > 0 else np.ones(len(kept))
+    expected = expected_returns(kept, betas)
+
+    risk_aversion, max_weight = risk_preferences(risk_tolerance)
+    if method == 'risk_parity':
+        weights = risk_parity_weights(covariance)
+    else:
+        weights = mean_variance_weights(expected, covariance, risk_aversion, max_weight)
+
+    volatility = float(np.sqrt(weights @ covariance @ weights))
+    portfolio_return = float(weights @ expected)
+    contributions = risk_contributions(weights, covariance)
+    order = np.argsort(-weights, kind='stable')
+    result.update({
+        'weights': [
+            {'ticker': kept[j], 'weight': round(float(weights[j]), 6),
+             'expected_return': round(float(expected[j]), 4),
+             'risk_contribution': round(float(contributions[j]), 6)}
+            for j in order
+        ],
+        'expected_return': round(portfolio_return, 4),
+        'volatility': round(volatility, 4),
+        'sharpe_ratio': round((portfolio_return - RISK_FREE_RATE) / volatility, 4) if volatility > 0 else None,
+        'shrinkage': round(intensity, 4),
+        'observations': int(len(days) - 1),
+    })
+    if method == 'mean_variance':
+        result['risk_aversion'] = round(risk_aversion, 4)
+        result['max_weight'] = round(max(max_weight, 1.0 / len(kept)), 4)
+    return result
@@ -0,0 +1,254 @@
+# return_model.py
+#
+# Trained return-prediction model. Features are computed from stored price history for every
+# ticker at once (rolling volatility and beta, momentum over several horizons, distance from the
+# moving average); the target is the forward return over the next `horizon` trading days,
+# annualized. Training fits a standardized ridge regression with scikit-learn and persists it as
+# a versioned artifact directory:
+#
+#   <RETURN_MODEL_DIR>/<version>/coef.npy, intercept.npy, feature_mean.npy, feature_scale.npy
+#   <RETURN_MODEL_DIR>/<version>/metadata.json
+#   <RETURN_MODEL_DIR>/LATEST                     (name of the current version)
+#
+# Serving needs only NumPy: the arrays are memory-mapped on first use and a whole universe is
+# scored with one matrix-vector product.
+#
+# Usage: python -m ml_models.return_model train [--horizon 63] [--step 5]
+#        python -m ml_models.return_model predict
+#
+
+"""
+Ridge return model trained on price-history features, with memory-mapped artifacts
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from ml_models.analytics import TRADING_DAYS, aligned_closes, log_returns, rolling_beta, rolling_volatility
+from ml_models.market_data import get_store
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.environ.get('RETURN_MODEL_DIR', os.path.join(SERVER_DIR, 'ml_models', 'artifacts', 'return_model'))
+FEATURE_WINDOW = 126
+DEFAULT_HORIZON = 63
+PREDICTION_BOUNDS = (-40.0, 40.0)  # percent per year, same scale as predicted_return_1yr
+
+FEATURES = (
+    'volatility_126', 'beta_126', 'momentum_21', 'momentum_63', 'momentum_126', 'sma_gap_126',
+)
+ARRAYS = ('coef', 'intercept', 'feature_mean', 'feature_scale')
+
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over complete windows only (NaN if any value in the window is missing)."""
+    valid = np.isfinite(values)
+    totals = np.cumsum(np.where(valid, values, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    sums = np.full(values.shape, np.nan)
+    complete = np.zeros(values.shape, dtype=bool)
+    sums[window - 1] = totals[window - 1]
+    complete[window - 1] = counts[window - 1] == window
+    sums[window:] = totals[window:] - totals[:-window]
+    complete[window:] = (counts[window:] - counts[:-window]) == window
+    return np.where(complete, sums / window, np.nan)
+
+
+def feature_matrix(prices: np.ndarray, benchmark: np.ndarray) -> np.ndarray:
+    """
+    (days x tickers x features) array aligned with the price rows; rows without a full feature
+    window are NaN.
+    """
+    returns = log_returns(prices)
+    benchmark_returns = log_returns(benchmark.reshape(-1, 1))[:, 0]
+    pad = np.full((1, prices.shape[1]), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_prices = np.log(prices)
+        features = [
+            np.vstack([pad, rolling_volatility(returns, FEATURE_WINDOW)]),
+            np.vstack([pad, rolling_beta(returns, benchmark_returns, FEATURE_WINDOW)]),
+        ]
+        for lag in (21, 63, 126):
+            momentum = np.full(prices.shape, np.nan)
+            momentum[lag:] = log_prices[lag:] - log_prices[:-lag]
+            features.append(momentum)
+        features.append(log_prices - np.log(_rolling_mean(prices, FEATURE_WINDOW)))
+    return np.stack(features, axis=-1)
+
+
+def forward_returns(prices: np.ndarray, horizon: int) -> np.ndarray:
+    """Annualized log return over the next `horizon` rows (NaN where the future isn't known)."""
+    target = np.full(prices.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        target[:-horizon] = np.log(prices[horizon:] / prices[:-horizon]) * (TRADING_DAYS / horizon)
+    return target
+
+
+def training_set(tickers: Sequence[str] = None, horizon: int = DEFAULT_HORIZON, step: int = 5, store=None):
+    """Feature rows and targets sampled every `step` days for every ticker with complete data."""
+    store = store or get_store()
+    tickers = list(tickers or store.tickers())
+    days, benchmark, prices = aligned_closes(tickers, store=store)
+    features = feature_matrix(prices, benchmark)[::step]
+    target = forward_returns(prices, horizon)[::step]
+    x = features.reshape(-1, len(FEATURES))
+    y = target.reshape(-1)
+    keep = np.isfinite(x).all(axis=1) & np.isfinite(y)
+    return x[keep], y[keep], str(days.view('datetime64[D]')[-1])
+
+
+def train(horizon: int = DEFAULT_HORIZON, step: int = 5, alphas=(0.1, 1.0, 10.0, 100.0), store=None,
+          model_dir: str = MODEL_DIR, log=print) -> str:
+    """Fit the model on stored price history and write a new artifact version; returns its path."""
+    from sklearn.linear_model import RidgeCV
+    from sklearn.model_selection import cross_val_score
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    x, y, as_of = training_set(horizon=horizon, step=step, store=store)
+    if len(y) < 10 * len(FEATURES):
+        raise ValueError(f"Only {len(y)} training rows; need more price history")
+
+    pipeline = make_pipeline(StandardScaler(), RidgeCV(alphas=list(alphas)))
+    cv_r2 = cross_val_score(pipeline, x, y, cv=5, scoring='r2')
+    pipeline.fit(x, y)
+    scaler, ridge = pipeline[0], pipeline[1]
+
+    version = datetime.utcnow().strftime('v%Y%m%dT%H%M%S')
+    path = os.path.join(model_dir, version)
+    os.makedirs(path, exist_ok=False)
+    arrays = {
+        'coef': np.asarray(ridge.coef_, dtype=np.float64),
+        'intercept': np.asarray([ridge.intercept_], dtype=np.float64),
+        'feature_mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'feature_scale': np.asarray(scaler.scale_, dtype=np.float64),
+    }
+    for name, values in arrays.items():
+        np.save(os.path.join(path, f'{name}.npy'), values)
+
+    import sklearn
+    metadata = {
+        'version': version,
+        'features': list(FEATURES),
+        'feature_window': FEATURE_WINDOW,
+        'horizon_days': horizon,
+        'sample_step_days': step,
+        'trained_through': as_of,
+        'rows': int(len(y)),
+        'alpha': float(ridge.alpha_),
+        'cv_r2_mean': float(cv_r2.mean()),
+        'train_r2': float(pipeline.score(x, y)),
+        'sklearn_version': sklearn.__version__,
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+    }
+    with open(os.path.join(path, 'metadata.json'), 'w') as handle:
+        json.dump(metadata, handle, indent=2)
+
+    # Publish by swapping the pointer file last, so readers never see a half-written version
+    pointer = os.path.join(model_dir, 'LATEST')
+    with open(pointer + '.tmp', 'w') as handle:
+        handle.write(version)
+    os.replace(pointer + '.tmp', pointer)
+    log(f"Trained {version} on {len(y)} rows (alpha {ridge.alpha_}, CV R^2 {cv_r2.mean():.3f}) -> {path}")
+    return path
+
+
+class ReturnModel:
+    """A loaded artifact version. Arrays are memory-mapped read-only."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'metadata.json')) as handle:
+            self.metadata = json.load(handle)
+        if tuple(self.metadata['features']) != FEATURES:
+            raise ValueError(f"Model {path} was trained on different features")
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'))
+
+    @property
+    def version(self) -> str:
+        return self.metadata['version']
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Annualized return (fraction) for each row of an (n x features) matrix; NaN rows stay NaN."""
+        standardized = (features - self.feature_mean) / self.feature_scale
+        return standardized @ self.coef + self.intercept[0]
+
+    def predict_latest(self, tickers: Sequence[str], store=None) -> Dict[str, float]:
+        """Predicted 1-year return in percent for each ticker with a full feature window."""
+        store = store or get_store()
+        tickers = list(tickers)
+        _, benchmark, prices = aligned_closes(tickers, store=store)
+        rows = prices[-(FEATURE_WINDOW + 1):]
+        latest = feature_matrix(rows, benchmark[-(FEATURE_WINDOW + 1):])[-1]
+        predicted = np.clip(self.predict(latest) * 100, *PREDICTION_BOUNDS)
+        return {t: float(v) for t, v in zip(tickers, predicted) if np.isfinite(v)}
+
+
+def latest_version(model_dir: str = MODEL_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(model_dir, 'LATEST')) as handle:
+            return handle.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+_model = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+
+def get_model() -> Optional[ReturnModel]:
+    """The latest trained model, loaded on first use; None if nothing has been trained."""
+    global _model, _model_loaded
+    if not _model_loaded:
+        with _model_lock:
+            if not _model_loaded:
+                version = latest_version()
+                if version:
+                    try:
+                        _model = ReturnModel(os.path.join(MODEL_DIR, version))
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"Could not load return model {version}: {e}")
+                _model_loaded = True
+    return _model
+
+
+def reload_model() -> Optional[ReturnModel]:
+    global _model_loaded
+    with _model_lock:
+        _model_loaded = False
+    return get_model()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or run the return-prediction model")
+    sub = parser.add_subparsers(dest='command', required=True)
+    train_cmd = sub.add_parser('train', help='fit on stored price history and publish a new version')
+    train_cmd.add_argument('--horizon', type=int, default=DEFAULT_HORIZON)
+    train_cmd.add_argument('--step', type=int, default=5)
+    sub.add_parser('predict', help='print predictions for every ticker in the store')
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        train(horizon=args.horizon, step=args.step)
+    else:
+        model = get_model()
+        if model is None:
+            parser.error("no trained model; run 'train' first")
+        start = time.perf_counter()
+        predictions = model.predict_latest(get_store().tickers())
+        elapsed = time.perf_counter() - start
+        for ticker, value in sorted(predictions.items(), key=lambda item: -item[1]):
+            print(f"{ticker:<8} {value:>7.2f}%")
+        print(f"{model.version}: {len(predictions)} tickers in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+# rolling_stats.py
+#
+# Incremental rolling statistics over daily bars. A RollingStats tracker keeps, for every ticker,
+# the last `window` daily log returns in a ring buffer together with Welford-style running means
+# and co-moments (return variance, return/benchmark covariance, benchmark variance) and running
+# close sums for simple moving averages. Ingesting one day's bars adds the new return and removes
+# the one leaving the window, so it costs O(1) per ticker however long the window is. Values match
+# ml_models.analytics (same log returns, same handling of missing bars); the state is re-summed
+# from the ring buffers every so often to stop floating-point drift from accumulating.
+#
+# Days are ingested as the benchmark reaches them, so a ticker whose bar for a day is appended
+# after the benchmark's (the append CLI runs ticker by ticker) may be ingested as missing that day.
+# The tracker remembers each ticker's last ingested bar; get_tracker() rebuilds it when the store
+# holds a bar it skipped.
+#
+
+"""
+O(1)-per-bar rolling volatility, beta and moving averages
+"""
+
+import os
+import threading
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from ml_models.analytics import DEFAULT_WINDOW, TRADING_DAYS, aligned_closes
+from ml_models.market_data import BENCHMARK_TICKER, get_store
+
+SMA_WINDOWS = (50, 200)
+RESYNC_EVERY = int(os.environ.get('ROLLING_RESYNC_EVERY', '2520'))
+
+
+def _day_number(day) -> int:
+    """Days since the epoch for a datetime64 day or a plain day number"""
+    return int(np.datetime64(day, 'D').astype(np.int64)) if isinstance(day, np.datetime64) else int(day)
+
+
+class _CoMoments:
+    """
+    Running count, means and co-moment sum((x - mean_x) * (y - mean_y)) per column, with masked
+    add and remove so each column can skip missing observations independently.
+    """
+
+    def __init__(self, size: int):
+        self.count = np.zeros(size)
+        self.mean_x = np.zeros(size)
+        self.mean_y = np.zeros(size)
+        self.comoment = np.zeros(size)
+
+    def add(self, x, y, mask):
+        n = self.count + mask
+        safe_n = np.where(mask, n, 1.0)
+        dx = np.where(mask, x - self.mean_x, 0.0)
+        self.mean_x = self.mean_x + dx / safe_n
+        new_mean_y = np.where(mask, self.mean_y + (y - self.mean_y) / safe_n, self.mean_y)
+        self.comoment = self.comoment + np.where(mask, dx * (y - new_mean_y), 0.0)
+        self.mean_y = new_mean_y
+        self.count = n
+
+    def remove(self, x, y, mask):
+        n = self.count - mask
+        emptied = mask & (n == 0)
+        safe_n = np.where(n > 0, n, 1.0)
+        new_mean_x = np.where(mask, self.mean_x - (x - self.mean_x) / safe_n, self.mean_x)
+        new_mean_y = np.where(mask, self.mean_y - (y - self.mean_y) / safe_n, self.mean_y)
+        self.comoment = self.comoment - np.where(mask, (x - new_mean_x) * (y - self.mean_y), 0.0)
+        self.mean_x = np.where(emptied, 0.0, new_mean_x)
+        self.mean_y = np.where(emptied, 0.0, new_mean_y)
+        self.comoment = np.where(emptied, 0.0, self.comoment)
+        self.count = n
+
+    def reset(self, xs, ys, mask):
+        """Recompute exactly from (window x columns) observations."""
+        self.count = mask.sum(axis=0).astype(np.float64)
+        safe_n = np.where(self.count > 0, self.count, 1.0)
+        self.mean_x = np.where(mask, xs, 0.0).sum(axis=0) / safe_n
+        self.mean_y = np.where(mask, ys, 0.0).sum(axis=0) / safe_n
+        self.comoment = np.where(mask, (xs - self.mean_x) * (ys - self.mean_y), 0.0).sum(axis=0)
+
+
+class RollingStats:
+    """
+    Rolling window state for a fixed list of tickers advanced one trading day at a time.
+    """
+
+    def __init__(self, tickers: Sequence[str], window: int = DEFAULT_WINDOW, sma_windows=SMA_WINDOWS):
+        self.tickers = [t.upper() for t in tickers]
+        self.column = {t: j for j, t in enumerate(self.tickers)}
+        self.window = window
+        self.sma_windows = tuple(sma_windows)
+        size = len(self.tickers)
+
+        self.returns = np.full((window, size), np.nan)
+        self.benchmark_returns = np.full(window, np.nan)
+        self.position = 0
+        self.closes = np.full((max(self.sma_windows), size), np.nan)
+        self.close_position = 0
+        self.close_sums = {k: np.zeros(size) for k in self.sma_windows}
+        self.close_counts = {k: np.zeros(size) for k in self.sma_windows}
+        self.last_close = np.full(size, np.nan)
+        self.last_benchmark = np.nan
+        self.first_day = None
+        self.last_day = None
+        self.last_bar = np.full(size, -1, dtype=np.int64)  # day of each ticker's last ingested bar
+        self.updates = 0
+
+        self.variance = _CoMoments(size)       # (r, r) over valid returns
+        self.covariance = _CoMoments(size)     # (r, b) over days where both are valid
+        self.benchmark_var = _CoMoments(size)  # (b, b) over the same paired days
+
+    def update(self, day, closes: np.ndarray, benchmark_close: float):
+        """
+        Ingest one trading day: closes is aligned with self.tickers (NaN where a ticker has no bar).
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = np.log(closes / self.last_close)
+            b = float(np.log(benchmark_close / self.last_benchmark))
+
+        old_r = self.returns[self.position]
+        old_b = self.benchmark_returns[self.position]
+        old_valid = np.isfinite(old_r)
+        old_pair = old_valid & np.isfinite(old_b)
+        self.variance.remove(old_r, old_r, old_valid)
+        self.covariance.remove(old_r, old_b, old_pair)
+        self.benchmark_var.remove(old_b, old_b, old_pair)
+
+        new_valid = np.isfinite(r)
+        new_pair = new_valid & np.isfinite(b)
+        self.variance.add(r, r, new_valid)
+        self.covariance.add(r, b, new_pair)
+        self.benchmark_var.add(b, b, new_pair)
+        self.returns[self.position] = r
+        self.benchmark_returns[self.position] = b
+        self.position = (self.position + 1) % self.window
+
+        # Moving averages: add today's close, drop the one k days back for each window length
+        depth = len(self.closes)
+        for k in self.sma_windows:
+            leaving = self.closes[(self.close_position - k) % depth]
+            leaving_valid = np.isfinite(leaving)
+            self.close_sums[k] -= np.where(leaving_valid, leaving, 0.0)
+            self.close_counts[k] -= leaving_valid
+        close_valid = np.isfinite(closes)
+        for k in self.sma_windows:
+            self.close_sums[k] += np.where(close_valid, closes, 0.0)
+            self.close_counts[k] += close_valid
+        self.closes[self.close_position] = closes
+        self.close_position = (self.close_position + 1) % depth
+
+        self.last_close = closes
+        self.last_benchmark = benchmark_close
+        if self.first_day is None:
+            self.first_day = day
+        self.last_day = day
+        self.last_bar[close_valid] = _day_number(day)
+        self.updates += 1
+        if self.updates % RESYNC_EVERY == 0:
+            self.resync()
+
+    def resync(self):
+        """Rebuild every running sum from the ring buffers."""
+        r = self.returns
+        b = np.broadcast_to(self.benchmark_returns[:, None], r.shape)
+        valid = np.isfinite(r)
+        pair = valid & np.isfinite(b)
+        self.variance.reset(r, r, valid)
+        self.covariance.reset(r, b, pair)
+        self.benchmark_var.reset(b, b, pair)
+        depth = len(self.closes)
+        for k in self.sma_windows:
+            recent = self.closes[(self.close_position - 1 - np.arange(k)) % depth]
+            recent_valid = np.isfinite(recent)
+            self.close_sums[k] = np.where(recent_valid, recent, 0.0).sum(axis=0)
+            self.close_counts[k] = recent_valid.sum(axis=0).astype(np.float64)
+
+    def ingest(self, days: Iterable, closes: np.ndarray, benchmark_closes: np.ndarray):
+        """Ingest consecutive days; closes is (days x tickers)."""
+        for day, row, benchmark_close in zip(days, closes, benchmark_closes):
+            self.update(day, row, benchmark_close)
+
+    def volatility(self) -> np.ndarray:
+        n = self.variance.count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = np.maximum(self.variance.comoment, 0.0) / (n - 1)
+        return np.where(n >= 2, np.sqrt(variance * TRADING_DAYS), np.nan)
+
+    def beta(self) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            beta = self.covariance.comoment / self.benchmark_var.comoment
+        return np.where(self.covariance.count >= 2, beta, np.nan)
+
+    def moving_average(self, k: int) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.close_counts[k] == k, self.close_sums[k] / k, np.nan)
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Per-ticker volatility, beta and moving averages; tickers short of most of a window are omitted."""
+        volatility, beta = self.volatility(), self.beta()
+        averages = {k: self.moving_average(k) for k in self.sma_windows}
+        observations = self.variance.count
+        results = {}
+        for j, ticker in enumerate(self.tickers):
+            if observations[j] < self.window * 0.8 or not np.isfinite(volatility[j]):
+                continue
+            values = {
+                'volatility': float(volatility[j]),
+                'beta': float(beta[j]),
+                'observations': int(observations[j]),
+                'as_of': str(self.last_day),
+            }
+            for k, average in averages.items():
+                if np.isfinite(average[j]):
+                    values[f'sma_{k}'] = float(average[j])
+            results[ticker] = values
+        return results
+
+    def missed_bars(self, store=None) -> List[str]:
+        """
+        Tickers with a bar on a benchmark day already ingested without it (appended late); bars
+        before the first ingested day don't affect the state and are ignored.
+        """
+        if self.last_day is None:
+            return []
+        store = store or get_store()
+        first, last = _day_number(self.first_day), _day_number(self.last_day)
+        calendar = store.range(BENCHMARK_TICKER, self.first_day, self.last_day)
+        if calendar is None:
+            return []
+        missed = []
+        for j, ticker in enumerate(self.tickers):
+            history = store.history(ticker)
+            if history is None:
+                continue
+            lo = int(np.searchsorted(history.days, max(self.last_bar[j] + 1, first), side='left'))
+            hi = int(np.searchsorted(history.days, last, side='right'))
+            if lo < hi and np.isin(history.days[lo:hi], calendar.days).any():
+                missed.append(ticker)
+        return missed
+
+    def sync(self, store=None) -> int:
+        """Ingest every benchmark trading day the store has after the last one seen; returns days added."""
+        store = store or get_store()
+        start = None if self.last_day is None else self.last_day + np.timedelta64(1, 'D')
+        if self.last_day is None:
+            # Only the trailing window (plus the longest moving average) affects the state
+            latest = store.latest(BENCHMARK_TICKER, max(self.window, max(self.sma_windows)) + 1)
+            if latest is None or len(latest) == 0:
+                return 0
+            start = latest.dates[0]
+        days, benchmark, closes = aligned_closes(self.tickers, start, None, store)
+        self.ingest(days.view('datetime64[D]'), closes, benchmark)
+        return len(days)
+
+
+_tracker = None
+_tracker_rewrites = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker(store=None) -> RollingStats:
+    """
+    Process-wide tracker over every ticker in the store, brought up to date with any new bars.
+    Called whenever stock_predictor rebuilds its snapshot after the store changes, so appended
+    bars are ingested incrementally. The tracker is rebuilt if tickers are added to the store,
+    any history was replaced rather than appended to, or a bar landed for a day already ingested.
+    """
+    global _tracker, _tracker_rewrites
+    store = store or get_store()
+    with _tracker_lock:
+        tickers = store.tickers()
+        rewrites = store.version_info()['rewrites']
+        if (_tracker is None or _tracker.tickers != tickers or _tracker_rewrites != rewrites
+                or _tracker.missed_bars(store)):
+            _tracker = RollingStats(tickers)
+            _tracker_rewrites = rewrites
+        _tracker.sync(store)
+        return _tracker
@@ -10,10 +10,15 @@
 ML-powered stock prediction and risk assessment module
 """
 
+import bisect
+import hashlib
+import json
 import numpy as np
-import requests
 import os
+import threading
+import time
 from datetime import datetime, timedelta
+from types import MappingProxyType
 from typing import List, Dict, Tuple
 from dotenv import load_dotenv
 
@@ -200,50 +205,416 @@ STOCK_DATA = {
 }
 
 
-def calculate_risk_score(stock: Dict) -> float:
+RISK_BUCKETS = ('conservative', 'moderate', 'aggressive')
+
+# Risk profile stored on the user -> 1-10 risk tolerance used for ranking
+RISK_PROFILE_SCORES = {'conservative': 3, 'moderate': 6, 'aggressive': 9}
+
+CRYPTO_TICKERS = {'BTC', 'ETH'}
+ETF_TICKERS = {'SPY', 'VTI', 'VXUS', 'BND'}
+
+
+def _round1(values: np.ndarray) -> np.ndarray:
     """
-    Calculate risk score based on beta and volatility
+    Round to one decimal the way Python's round() does (nearest to the exact binary value),
+    rather than np.round's scale-then-round, so batch and scalar results agree
+    """
+    scaled = np.floor(values * 10)
+    midpoint = (2 * scaled + 1) / 20
+    result = np.where(values < midpoint, scaled / 10, (scaled + 1) / 10)
+    # Values sitting exactly on the float midpoint depend on its exact decimal expansion;
+    # there are very few of them, so let round() decide
+    ties = np.flatnonzero(values == midpoint)
+    if ties.size:
+        result[ties] = [round(float(v), 1) for v in values[ties]]
+    return result
+
+
+def calculate_risk_scores(beta: np.ndarray, volatility: np.ndarray) -> np.ndarray:
+    """
+    Vectorized risk score based on beta and volatility
     Lower score = safer, Higher score = riskier
     """
     beta_weight = 0.6
     volatility_weight = 0.4
     
     # Normalize beta (typically 0-3 range)
-    beta_norm = min(stock.get('beta', 1.0), 3.0) / 3.0
+    beta_norm = np.minimum(beta, 3.0) / 3.0
     
     # Normalize volatility (typically 0-1 range)
-    vol_norm = min(stock.get('volatility', 0.3), 1.0)
+    vol_norm = np.minimum(volatility, 1.0)
     
     # Calculate weighted risk score (1-10 scale)
     risk_score = (beta_norm * beta_weight + vol_norm * volatility_weight) * 10
     
-    return round(risk_score, 1)
+    return _round1(risk_score)
 
 
-def predict_returns(stock: Dict) -> float:
+def predict_returns_batch(beta: np.ndarray, volatility: np.ndarray, dividend_yield: np.ndarray) -> np.ndarray:
     """
-    Predict 1-year return based on historical patterns
+    Vectorized 1-year return prediction based on historical patterns
     Uses a combination of metrics
     """
-    base_return = stock.get('volatility', 0.3) * 30  # Basic volatility-based estimate
+    base_return = volatility * 30  # Basic volatility-based estimate
     
     # Adjust based on beta
-    beta_adjustment = (stock.get('beta', 1.0) - 1.0) * 5
+    beta_adjustment = (beta - 1.0) * 5
     
     # Consider dividend yield
-    dividend_adjustment = stock.get('dividend_yield', 0) * 2
+    dividend_adjustment = dividend_yield * 2
     
     predicted_return = base_return + beta_adjustment + dividend_adjustment
     
     # Cap at reasonable ranges
-    if stock.get('beta', 1.0) < 0.8:
-        predicted_return = min(predicted_return, 12.0)
-    elif stock.get('beta', 1.0) > 1.5:
-        predicted_return = min(predicted_return, 40.0)
-    else:
-        predicted_return = min(predicted_return, 20.0)
+    cap = np.where(beta < 0.8, 12.0, np.where(beta > 1.5, 40.0, 20.0))
+    predicted_return = np.minimum(predicted_return, cap)
     
-    return round(predicted_return, 1)
+    return _round1(predicted_return)
+
+
+def calculate_risk_score(stock: Dict) -> float:
+    """
+    Calculate risk score based on beta and volatility
+    Lower score = safer, Higher score = riskier
+    """
+    return float(calculate_risk_scores(
+        np.array([stock.get('beta', 1.0)]), np.array([stock.get('volatility', 0.3)])
+    )[0])
+
+
+def predict_returns(stock: Dict) -> float:
+    """
+    Predict 1-year return based on historical patterns
+    Uses a combination of metrics
+    """
+    return float(predict_returns_batch(
+        np.array([stock.get('beta', 1.0)]),
+        np.array([stock.get('volatility', 0.3)]),
+        np.array([stock.get('dividend_yield', 0)])
+    )[0])
+
+
+def asset_category(ticker: str, name: str, sector: str) -> str:
+    """
+    Asset class shown in the UI (stocks, bonds, etf, crypto)
+    """
+    ticker = ticker.upper()
+    if ticker in CRYPTO_TICKERS or 'Bitcoin' in name or 'Ethereum' in name:
+        return 'crypto'
+    elif 'ETF' in name or ticker in ETF_TICKERS:
+        return 'etf'
+    elif sector == 'Bonds' or 'Bond' in name:
+        return 'bonds'
+    return 'stocks'
+
+
+class StockUniverse:
+    """
+    Columnar view of the stock universe. Numeric fields are NumPy arrays so scoring and ranking
+    the whole universe is a single vectorized pass; per-stock dicts are only built for the rows
+    actually returned.
+    """
+
+    def __init__(self, tickers, names, sectors, buckets, current_price, beta, volatility, dividend_yield):
+        self.tickers = np.asarray(tickers, dtype=object)
+        self.names = np.asarray(names, dtype=object)
+        self.sectors = np.asarray(sectors, dtype=object)
+        self.buckets = np.asarray(buckets, dtype=np.int8)
+        self.current_price = np.asarray(current_price, dtype=np.float64)
+        self.beta = np.asarray(beta, dtype=np.float64)
+        self.volatility = np.asarray(volatility, dtype=np.float64)
+        self.dividend_yield = np.asarray(dividend_yield, dtype=np.float64)
+        self.categories = np.array(
+            [asset_category(t, n, s) for t, n, s in zip(self.tickers, self.names, self.sectors)], dtype=object
+        )
+        self.rescore()
+
+    @classmethod
+    def from_stock_data(cls, stock_data: Dict[str, List[Dict]]) -> 'StockUniverse':
+        rows = [(bucket, stock) for bucket in RISK_BUCKETS for stock in stock_data.get(bucket, [])]
+        return cls(
+            tickers=[stock['ticker'] for _, stock in rows],
+            names=[stock.get('name', '') for _, stock in rows],
+            sectors=[stock.get('sector', '') for _, stock in rows],
+            buckets=[RISK_BUCKETS.index(bucket) for bucket, _ in rows],
+            current_price=[stock.get('current_price', 0.0) for _, stock in rows],
+            beta=[stock.get('beta', 1.0) for _, stock in rows],
+            volatility=[stock.get('volatility', 0.3) for _, stock in rows],
+            dividend_yield=[stock.get('dividend_yield', 0) for _, stock in rows],
+        )
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def rescore(self):
+        """Recompute risk scores and predicted returns for every stock in one pass."""
+        self.risk_score = calculate_risk_scores(self.beta, self.volatility)
+        self.predicted_return_1yr = predict_returns_batch(self.beta, self.volatility, self.dividend_yield)
+
+    def rank(self, bucket: str = None) -> np.ndarray:
+        """Row indices (optionally limited to one risk bucket) sorted by predicted return, highest first."""
+        if bucket is None:
+            indices = np.arange(len(self))
+        else:
+            indices = np.flatnonzero(self.buckets == RISK_BUCKETS.index(bucket))
+        # Stable sort on the negated key keeps ties in their original order, like list.sort(reverse=True)
+        return indices[np.argsort(-self.predicted_return_1yr[indices], kind='stable')]
+
+    def record(self, i: int) -> Dict:
+        """Build the JSON-ready dict for a single row."""
+        return {
+            'ticker': self.tickers[i],
+            'name': self.names[i],
+            'current_price': float(self.current_price[i]),
+            'beta': float(self.beta[i]),
+            'volatility': float(self.volatility[i]),
+            'dividend_yield': float(self.dividend_yield[i]),
+            'sector': self.sectors[i],
+            'predicted_return_1yr': float(self.predicted_return_1yr[i]),
+            'risk_score': float(self.risk_score[i]),
+            'category': self.categories[i],
+        }
+
+    def freeze(self) -> 'StockUniverse':
+        """Make every column read-only; a frozen universe can be shared across threads safely."""
+        for column in (self.tickers, self.names, self.sectors, self.buckets, self.current_price, self.beta,
+                       self.volatility, self.dividend_yield, self.categories, self.risk_score,
+                       self.predicted_return_1yr):
+            column.flags.writeable = False
+        return self
+
+
+class TickerIndex:
+    """
+    Lookup structures over a universe, built once per snapshot: a case-normalized dict for exact
+    ticker lookups and sorted key lists searched with bisect for type-ahead by ticker prefix or
+    by the prefix of any word in the company name.
+    """
+
+    def __init__(self, universe: StockUniverse):
+        self.by_ticker = {ticker.upper(): i for i, ticker in enumerate(universe.tickers)}
+        self._ticker_keys = sorted(self.by_ticker.items())
+        name_keys = set()
+        for i, name in enumerate(universe.names):
+            lowered = name.lower()
+            name_keys.add((lowered, i))
+            for word in lowered.replace(',', ' ').replace('.', ' ').split():
+                name_keys.add((word, i))
+        self._name_keys = sorted(name_keys)
+
+    def lookup(self, ticker: str):
+        """Row index for an exact (case-insensitive) ticker, or None"""
+        return self.by_ticker.get(ticker.upper())
+
+    @staticmethod
+    def _prefix_rows(keys, prefix, limit, seen, out):
+        i = bisect.bisect_left(keys, (prefix,))
+        while i < len(keys) and len(out) < limit:
+            key, row = keys[i]
+            if not key.startswith(prefix):
+                break
+            if row not in seen:
+                seen.add(row)
+                out.append(row)
+            i += 1
+
+    def search(self, query: str, limit: int = 10) -> List[int]:
+        """
+        Row indices matching the query: exact ticker first, then ticker prefixes, then
+        company-name word prefixes
+        """
+        query = query.strip()
+        if not query:
+            return []
+        out, seen = [], set()
+        exact = self.lookup(query)
+        if exact is not None:
+            out.append(exact)
+            seen.add(exact)
+        self._prefix_rows(self._ticker_keys, query.upper(), limit, seen, out)
+        self._prefix_rows(self._name_keys, query.lower(), limit, seen, out)
+        return out[:limit]
+
+
+class RecommendationSnapshot:
+    """
+    Immutable, pre-ranked recommendations for every risk bucket, built once per market-data
+    version. Requests read from it without doing any scoring and without touching shared
+    mutable state; a data refresh builds a new snapshot and swaps the module reference.
+    """
+
+    def __init__(self, universe: StockUniverse, version: int, data_version: int = None):
+        self.version = version
+        self.data_version = data_version  # market data store version it was built from
+        self.built_at = datetime.utcnow()
+        self.universe = universe.freeze()
+        self.index = TickerIndex(universe)
+        self._recommendations = {}
+        self._json = {}
+        for bucket in RISK_BUCKETS:
+            records = tuple(MappingProxyType(universe.record(i)) for i in universe.rank(bucket))
+            self._recommendations[bucket] = records
+            self._json[bucket] = json.dumps([dict(r) for r in records], separators=(',', ':')).encode()
+        # Content hash, stable across processes, so offline jobs can tell which data they used
+        self.fingerprint = hashlib.sha256(b''.join(self._json[b] for b in RISK_BUCKETS)).hexdigest()[:16]
+
+    def recommendations(self, bucket: str) -> Tuple[MappingProxyType, ...]:
+        return self._recommendations[bucket]
+
+    def recommendations_json(self, bucket: str) -> bytes:
+        """Pre-serialized JSON array for the bucket, ready to splice into a response body"""
+        return self._json[bucket]
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_snapshot_checked_at = 0.0
+# How often get_snapshot() looks at the market data store's version (one small file read)
+SNAPSHOT_CHECK_SECONDS = float(os.getenv('SNAPSHOT_CHECK_SECONDS', '5'))
+
+
+def apply_latest_closes(universe: StockUniverse) -> StockUniverse:
+    """Overwrite current_price with the latest close from the local market data store, where present."""
+    from ml_models.market_data import get_store
+
+    closes = get_store().latest_closes(universe.tickers)
+    for i, ticker in enumerate(universe.tickers):
+        if ticker in closes:
+            universe.current_price[i] = closes[ticker]
+    return universe
+
+
+def apply_computed_metrics(universe: StockUniverse) -> StockUniverse:
+    """
+    Replace the listed beta and volatility with values measured from stored price history
+    (trailing window against the benchmark), then rescore. Tickers without enough history keep
+    their listed figures. The rolling tracker only ingests bars added since the last refresh.
+    """
+    from ml_models.rolling_stats import get_tracker
+
+    try:
+        metrics = get_tracker().metrics()
+    except LookupError as e:
+        print(f"Computed metrics unavailable: {e}")
+        return universe
+    for i, ticker in enumerate(universe.tickers):
+        measured = metrics.get(ticker)
+        if measured and np.isfinite(measured['beta']):
+            universe.beta[i] = round(measured['beta'], 2)
+            universe.volatility[i] = round(measured['volatility'], 2)
+    universe.rescore()
+    return universe
+
+
+def apply_model_predictions(universe: StockUniverse) -> StockUniverse:
+    """
+    With RETURN_MODEL=trained, replace the formula's predicted_return_1yr with the latest trained
+    return model (ml_models.return_model) for every ticker it can score. Must run after rescore().
+    """
+    if os.getenv('RETURN_MODEL', 'formula') != 'trained':
+        return universe
+    from ml_models.return_model import get_model
+
+    model = get_model()
+    if model is None:
+        print("RETURN_MODEL=trained but no trained model found; using the formula")
+        return universe
+    predictions = model.predict_latest(universe.tickers)
+    for i, ticker in enumerate(universe.tickers):
+        if ticker in predictions:
+            universe.predicted_return_1yr[i] = round(predictions[ticker], 1)
+    return universe
+
+
+def _market_data_version() -> int:
+    from ml_models.market_data import get_store
+    return get_store().version()
+
+
+def _publish_snapshot(universe: StockUniverse = None) -> RecommendationSnapshot:
+    # Caller holds _snapshot_lock. The data version is read before building, so bars appended
+    # mid-build make the next check rebuild again rather than be missed.
+    global _snapshot, _snapshot_checked_at
+    data_version = None
+    if universe is None:
+        data_version = _market_data_version()
+        universe = StockUniverse.from_stock_data(STOCK_DATA)
+        apply_latest_closes(universe)
+        apply_computed_metrics(universe)
+        apply_model_predictions(universe)
+    version = _snapshot.version + 1 if _snapshot is not None else 1
+    snapshot = RecommendationSnapshot(universe, version, data_version)
+    _snapshot = snapshot  # single reference assignment: atomic for concurrent readers
+    _snapshot_checked_at = time.monotonic()
+    return snapshot
+
+
+def refresh_snapshot(universe: StockUniverse = None) -> RecommendationSnapshot:
+    """
+    Build a new snapshot (from STOCK_DATA and the market data store unless a universe is given)
+    and publish it. Readers holding the old snapshot keep a consistent view until they finish.
+    """
+    with _snapshot_lock:
+        return _publish_snapshot(universe)
+
+
+def get_snapshot() -> RecommendationSnapshot:
+    """
+    Current snapshot. At most every SNAPSHOT_CHECK_SECONDS one caller compares the market data
+    store's version with the snapshot's and rebuilds it if bars were written since (by this or
+    any other process); the others keep serving the current snapshot meanwhile.
+    """
+    global _snapshot_checked_at
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _snapshot_checked_at < SNAPSHOT_CHECK_SECONDS:
+        return snapshot
+    # Only the first build makes callers wait
+    if not _snapshot_lock.acquire(blocking=snapshot is None):
+        return snapshot
+    try:
+        snapshot = _snapshot
+        if snapshot is None:
+            return _publish_snapshot()
+        if time.monotonic() - _snapshot_checked_at < SNAPSHOT_CHECK_SECONDS:
+            return snapshot
+        # Set before the I/O so a failing rebuild is retried once per interval, not per request
+        _snapshot_checked_at = time.monotonic()
+        # A snapshot built from a supplied universe (data_version None) is left alone
+        if snapshot.data_version is not None and snapshot.data_version != _market_data_version():
+            try:
+                return _publish_snapshot()
+            except Exception as e:
+                print(f"Error refreshing recommendation snapshot: {e}")
+        return snapshot
+    finally:
+        _snapshot_lock.release()
+
+
+def get_universe() -> StockUniverse:
+    return get_snapshot().universe
+
+
+def risk_bucket(risk_tolerance: int) -> str:
+    """
+    Map a 1-10 risk tolerance to a risk bucket
+    """
+    if risk_tolerance <= 3:
+        return 'conservative'
+    elif risk_tolerance <= 7:
+        return 'moderate'
+    return 'aggressive'
+
+
+def profile_risk_tolerance(profile: str) -> int:
+    """
+    1-10 risk tolerance for a stored risk profile: a profile name, or the number saved by
+    /update-risk-tolerance (unknown or missing -> moderate)
+    """
+    if isinstance(profile, int) or (isinstance(profile, str) and profile.isdigit()):
+        value = int(profile)
+        if 1 <= value <= 10:
+            return value
+    return RISK_PROFILE_SCORES.get(profile, RISK_PROFILE_SCORES['moderate'])
 
 
 def get_recommendations(risk_tolerance: int) -> List[Dict]:
@@ -251,36 +622,7 @@ def get_recommendations(risk_tolerance: int) -> List[Dict]:
     Get stock recommendations based on user's risk tolerance
     Returns filtered and sorted list of stocks
     """
-    # Determine which category to use
-    if risk_tolerance <= 3:
-        category = 'conservative'
-    elif risk_tolerance <= 7:
-        category = 'moderate'
-    else:
-        category = 'aggressive'
-    
-    # Get stocks from appropriate category
-    stocks = STOCK_DATA.get(category, [])
-    
-    # Add calculated predictions and category to each stock
-    for stock in stocks:
-        stock['predicted_return_1yr'] = predict_returns(stock)
-        stock['risk_score'] = calculate_risk_score(stock)
-        # Add category (stocks, bonds, etf, crypto)
-        ticker = stock.get('ticker', '')
-        if ticker in ['BTC', 'ETH'] or 'Bitcoin' in stock.get('name', '') or 'Ethereum' in stock.get('name', ''):
-            stock['category'] = 'crypto'
-        elif 'ETF' in stock.get('name', '') or ticker in ['SPY', 'VTI', 'VXUS', 'BND']:
-            stock['category'] = 'etf'
-        elif stock.get('sector', '') == 'Bonds' or 'Bond' in stock.get('name', ''):
-            stock['category'] = 'bonds'
-        else:
-            stock['category'] = 'stocks'
-    
-    # Sort by predicted returns (highest first)
-    stocks.sort(key=lambda x: x['predicted_return_1yr'], reverse=True)
-    
-    return stocks
+    return [dict(record) for record in get_snapshot().recommendations(risk_bucket(risk_tolerance))]
 
 
 def categorize_stock(beta: float, volatility: float) -> str:
@@ -299,20 +641,26 @@ def get_stock_details(ticker: str) -> Dict:
     """
     Get detailed information about a specific stock
     """
-    all_stocks = STOCK_DATA['conservative'] + STOCK_DATA['moderate'] + STOCK_DATA['aggressive']
-    
-    for stock in all_stocks:
-        if stock['ticker'].upper() == ticker.upper():
-            # Add category
-            if ticker.upper() in ['BTC', 'ETH'] or 'Bitcoin' in stock.get('name', '') or 'Ethereum' in stock.get('name', ''):
-                stock['category'] = 'crypto'
-            elif 'ETF' in stock.get('name', '') or ticker.upper() in ['SPY', 'VTI', 'VXUS', 'BND']:
-                stock['category'] = 'etf'
-            elif stock.get('sector', '') == 'Bonds' or 'Bond' in stock.get('name', ''):
-                stock['category'] = 'bonds'
-            else:
-                stock['category'] = 'stocks'
-            return stock
-    
-    return None
+    snapshot = get_snapshot()
+    row = snapshot.index.lookup(ticker)
+    if row is None:
+        return None
+    return snapshot.universe.record(row)
+
 
+def search_stocks(query: str, limit: int = 10) -> List[Dict]:
+    """
+    Type-ahead search by ticker or company name
+    """
+    snapshot = get_snapshot()
+    universe = snapshot.universe
+    return [
+        {
+            'ticker': universe.tickers[i],
+            'name': universe.names[i],
+            'sector': universe.sectors[i],
+            'current_price': float(universe.current_price[i]),
+            'category': universe.categories[i],
+        }
+        for i in snapshot.index.search(query, limit)
+    ]
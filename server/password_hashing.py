@@ -0,0 +1,194 @@
+# password_hashing.py
+#
+# bcrypt hashing and verification run in a bounded process pool instead of on the request thread.
+# At most HASH_MAX_PENDING operations may be queued or running per server process; past that the
+# call fails fast with PasswordHashingBusy (the API answers 503 with a Retry-After estimated from
+# recent hash times) instead of piling more work onto saturated CPUs.
+#
+# The cost factor is BCRYPT_ROUNDS. needs_rehash() tells whether a stored hash was made with a
+# different cost so login can replace it transparently once the password is known to be right.
+# HASH_WORKERS=0 hashes on the calling thread (still bounded by HASH_MAX_PENDING).
+#
+# HASH_WORKERS defaults to this machine's CPUs split across the WEB_CONCURRENCY server processes.
+# The pool forks its processes only while the server process is still single-threaded (start(),
+# called when app.py is imported); a pool first needed after request threads exist is started with
+# the spawn method instead, since forking a multi-threaded process can copy locks another thread holds.
+#
+
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import bcrypt
+
+ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+SERVER_PROCESSES = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+WORKERS = int(os.getenv("HASH_WORKERS", str(max((os.cpu_count() or 1) // SERVER_PROCESSES, 1))))
+MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(max(WORKERS, 1) * 4)))
+TIMEOUT = float(os.getenv("HASH_TIMEOUT", "10"))
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing queue is full; retry_after is a suggested wait in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+# Run in the worker processes, so they take and return bytes
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password, stored_hash):
+    try:
+        return bcrypt.checkpw(password, stored_hash)
+    except ValueError:  # not a bcrypt hash
+        return False
+
+
+def _to_bytes(value):
+    return value.encode("utf-8") if isinstance(value, str) else value
+
+
+def hash_rounds(stored_hash):
+    """Cost factor of a bcrypt hash ($2b$12$...), or None if it isn't one."""
+    parts = _to_bytes(stored_hash).split(b"$")
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """
+    workers      processes in the pool (0 = hash on the calling thread)
+    max_pending  operations allowed in flight before callers get PasswordHashingBusy
+    rounds       bcrypt cost for new hashes
+    """
+
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING, rounds=ROUNDS, timeout=TIMEOUT):
+        self.workers = workers
+        self.max_pending = max(int(max_pending), 1)
+        self.rounds = rounds
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._average_seconds = 0.25
+        self.stats = {"completed": 0, "rejected": 0}
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    method = "fork" if threading.active_count() == 1 else "spawn"
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context(method)
+                    )
+        return self._executor
+
+    def start(self):
+        """Start the pool's processes now (a forked pool starts all of them on its first task)."""
+        if self.workers > 0:
+            self._get_executor().submit(int).result()
+
+    def _finish(self, started):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._pending -= 1
+            self._average_seconds = 0.9 * self._average_seconds + 0.1 * elapsed
+        self._slots.release()
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up, from the queue depth and recent hash times."""
+        per_round = self._pending * self._average_seconds / max(self.workers, 1)
+        return max(1, math.ceil(per_round))
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self.stats["rejected"] += 1
+            raise PasswordHashingBusy(self.retry_after())
+        with self._lock:
+            self._pending += 1
+        started = time.perf_counter()
+        if self.workers <= 0:
+            try:
+                result = fn(*args)
+            finally:
+                self._finish(started)
+        else:
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except BaseException:
+                self._finish(started)
+                raise
+            # The slot stays taken until the task is done (or cancelled before it started), even if
+            # the caller stops waiting: a running task can't be cancelled and still occupies a worker
+            future.add_done_callback(lambda _: self._finish(started))
+            try:
+                result = future.result(timeout=self.timeout)
+            except FutureTimeout:
+                future.cancel()
+                raise PasswordHashingBusy(self.retry_after())
+        self.stats["completed"] += 1
+        return result
+
+    def hash_password(self, password):
+        """bcrypt hash (str) of password at the configured cost."""
+        return self._run(_hashpw, _to_bytes(password), self.rounds).decode("utf-8")
+
+    def verify_password(self, password, stored_hash):
+        return self._run(_checkpw, _to_bytes(password), _to_bytes(stored_hash))
+
+    def needs_rehash(self, stored_hash):
+        return hash_rounds(stored_hash) != self.rounds
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def pool_stats(self):
+        return dict(self.stats, pending=self._pending, max_pending=self.max_pending, workers=self.workers,
+                    rounds=self.rounds, average_ms=round(self._average_seconds * 1000, 1))
+
+
+# One hasher (and pool) per process, so forked server workers don't share executor state
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def get_hasher():
+    pid = os.getpid()
+    hasher = _hashers.get(pid)
+    if hasher is None:
+        with _hashers_lock:
+            hasher = _hashers.get(pid)
+            if hasher is None:
+                hasher = PasswordHasher()
+                _hashers[pid] = hasher
+    return hasher
+
+
+def start():
+    """Create this process's pool and start its workers; call before the server starts threads."""
+    get_hasher().start()
+
+
+def hash_password(password):
+    return get_hasher().hash_password(password)
+
+
+def verify_password(password, stored_hash):
+    return get_hasher().verify_password(password, stored_hash)
+
+
+def needs_rehash(stored_hash):
+    return get_hasher().needs_rehash(stored_hash)
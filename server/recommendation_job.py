@@ -0,0 +1,186 @@
+# recommendation_job.py
+#
+# Offline job that precomputes stock recommendations for every user into user_recommendations,
+# so /stock-recommendations is a single primary-key read. Recommendations are ranked once per risk
+# profile (from the current snapshot); each user's row is that list with their watchlisted stocks
+# moved to the front and flagged. Users are streamed in keyset batches (id > last id) and batches
+# are written by a thread pool. Progress is checkpointed in recommendation_job_state, so an
+# interrupted run resumes after the last contiguous finished batch; rows are upserts, so redoing a
+# batch is harmless. A row is only served while its risk_profile still matches the user's
+# risk_tolerance, so one written from a profile read just before the user changed it is ignored.
+#
+# Usage: python recommendation_job.py [--batch-size 1000] [--workers 4] [--restart]
+#
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import db_utils
+from ml_models.stock_predictor import get_snapshot, profile_risk_tolerance, risk_bucket
+
+JOB_NAME = "stock_recommendations"
+BATCH_SIZE = int(os.getenv("RECOMMENDATION_JOB_BATCH_SIZE", "1000"))
+DEFAULT_WORKERS = int(os.getenv("RECOMMENDATION_JOB_WORKERS", "4"))
+
+
+def personalize(records, watchlist):
+    """Recommendations with watchlisted tickers first (rank order kept within both groups)."""
+    watched = [dict(r, on_watchlist=True) for r in records if r["ticker"] in watchlist]
+    others = [dict(r, on_watchlist=False) for r in records if r["ticker"] not in watchlist]
+    return watched + others
+
+
+def build_rows(snapshot, users, watchlists):
+    """(user_id, risk_profile, recommendations_json, snapshot_hash) for each user in the batch."""
+    rows = []
+    for user_id, profile in users:
+        bucket = risk_bucket(profile_risk_tolerance(profile))
+        watchlist = watchlists.get(user_id)
+        records = snapshot.recommendations(bucket)
+        if watchlist and any(r["ticker"] in watchlist for r in records):
+            payload = json.dumps(personalize(records, watchlist), separators=(",", ":"))
+        else:
+            # Nothing to reorder: reuse the bucket's pre-serialized list as is
+            payload = snapshot.recommendations_json(bucket).decode()
+        rows.append((user_id, profile, payload, snapshot.fingerprint))
+    return rows
+
+
+def fetch_user_batch(after_id, batch_size):
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT id, risk_tolerance FROM users WHERE id > %s ORDER BY id LIMIT %s",
+                (after_id, batch_size),
+            )
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def write_batch(snapshot, users):
+    """Compute and upsert one batch; returns the number of users written."""
+    user_ids = [user_id for user_id, _ in users]
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor() as cur:
+            placeholders = ",".join(["%s"] * len(user_ids))
+            cur.execute(
+                f"SELECT user_id, stock_ticker FROM stock_watchlist WHERE user_id IN ({placeholders})",
+                user_ids,
+            )
+            watchlists = {}
+            for user_id, ticker in cur.fetchall():
+                watchlists.setdefault(user_id, set()).add(ticker.upper())
+
+            cur.executemany("""
+                INSERT INTO user_recommendations (user_id, risk_profile, recommendations_json, snapshot_hash)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE risk_profile=VALUES(risk_profile),
+                    recommendations_json=VALUES(recommendations_json), snapshot_hash=VALUES(snapshot_hash)
+            """, build_rows(snapshot, users, watchlists))
+        conn.commit()
+        return len(users)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def load_state():
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute("SELECT * FROM recommendation_job_state WHERE job_name=%s", (JOB_NAME,))
+            return cur.fetchone()
+    finally:
+        conn.close()
+
+
+def save_state(snapshot_hash, last_user_id, users_done, status):
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO recommendation_job_state (job_name, snapshot_hash, last_user_id, users_done, status)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE snapshot_hash=VALUES(snapshot_hash), last_user_id=VALUES(last_user_id),
+                    users_done=VALUES(users_done), status=VALUES(status)
+            """, (JOB_NAME, snapshot_hash, last_user_id, users_done, status))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run(batch_size=BATCH_SIZE, workers=DEFAULT_WORKERS, restart=False, log=print):
+    """
+    Precompute recommendations for every user. Resumes a previous run for the same snapshot
+    unless restart is set. Returns the number of users written in this run.
+    """
+    snapshot = get_snapshot()
+    state = None if restart else load_state()
+    if state and state["status"] == "running" and state["snapshot_hash"] == snapshot.fingerprint:
+        last_id, done = state["last_user_id"], state["users_done"]
+        log(f"Resuming after user {last_id} ({done} users already written)")
+    else:
+        last_id, done = 0, 0
+    save_state(snapshot.fingerprint, last_id, done, "running")
+
+    started = time.perf_counter()
+    written = 0
+    # Batches may finish out of order; the checkpoint only advances past a contiguous prefix
+    pending = {}
+    finished = {}
+    order = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        cursor_id = last_id
+        exhausted = False
+        while not exhausted or pending:
+            while not exhausted and len(pending) < workers * 2:
+                users = fetch_user_batch(cursor_id, batch_size)
+                if not users:
+                    exhausted = True
+                    break
+                batch_end = users[-1][0]
+                order.append(batch_end)
+                pending[pool.submit(write_batch, snapshot, users)] = batch_end
+                cursor_id = batch_end
+            if not pending:
+                break
+            completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in completed:
+                finished[pending.pop(future)] = future.result()
+
+            advanced = False
+            while order and order[0] in finished:
+                last_id = order.pop(0)
+                count = finished.pop(last_id)
+                written += count
+                done += count
+                advanced = True
+            if advanced:
+                save_state(snapshot.fingerprint, last_id, done, "running")
+                log(f"{done} users written (through id {last_id})")
+
+    save_state(snapshot.fingerprint, last_id, done, "complete")
+    elapsed = time.perf_counter() - started
+    log(f"Wrote {written} users in {elapsed:.1f}s ({written / elapsed if elapsed else 0:,.0f} users/s)")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute stock recommendations for every user")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and start over")
+    args = parser.parse_args()
+    run(batch_size=args.batch_size, workers=args.workers, restart=args.restart)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# serve.py
+#
+# Production launcher. --mode wsgi runs app:app under gunicorn with threaded workers (a request
+# holds a thread until it finishes); --mode asgi runs asgi:app under uvicorn, where /google-auth
+# and /forgot-password wait on the event loop and everything else uses a per-worker thread pool.
+# Set PRELOAD_INVESTMENT=true to load the ML stack before serving.
+#
+# Usage: python serve.py [--mode wsgi|asgi] [--host 0.0.0.0] [--port 5001] [--workers N] [--threads N]
+#
+
+import argparse
+import os
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with a production server")
+    parser.add_argument("--mode", choices=("wsgi", "asgi"), default=os.environ.get("SERVER_MODE", "wsgi"))
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5001)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                        help="server processes")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("WSGI_THREADS", 10)),
+                        help="request threads per process (asgi: for the routes run through Flask)")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    # password_hashing sizes each worker's pool from this
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+
+    if args.mode == "asgi":
+        import uvicorn
+        os.environ["WSGI_THREADS"] = str(args.threads)
+        uvicorn.run("asgi:app", host=args.host, port=args.port, workers=args.workers,
+                    lifespan="on", proxy_headers=True, access_log=False)
+    else:
+        # Replace this process with gunicorn so signals reach it directly
+        os.execvp(sys.executable, [
+            sys.executable, "-m", "gunicorn", "app:app",
+            "--bind", f"{args.host}:{args.port}",
+            "--workers", str(args.workers),
+            "--worker-class", "gthread",
+            "--threads", str(args.threads),
+        ])
+
+
+if __name__ == "__main__":
+    main()
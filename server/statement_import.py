@@ -0,0 +1,414 @@
+# statement_import.py
+#
+# Streaming bank-statement import (CSV or OFX) into the incomes/expenses tables.
+# parse -> validate -> classify (positive = income, negative = expense) -> batch encrypt -> batched insert.
+#
+# Files are read incrementally so memory stays bounded regardless of size. After every batch the
+# byte offset is checkpointed in the same transaction as the inserted rows, so an interrupted
+# import resumes exactly where it stopped. Every row is also recorded by content hash, so
+# re-importing the same (or an overlapping) statement skips rows that are already present.
+#
+# Usage: python statement_import.py --user-id 42 statement.csv [--format ofx] [--batch-size 2000] [--restart]
+#
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+import db_utils
+
+DEFAULT_BATCH_SIZE = 2000
+READ_BLOCK_SIZE = 64 * 1024
+
+CSV_COLUMNS = {
+    "date": ("date", "transaction date", "posted date", "posting date", "trans date"),
+    "amount": ("amount", "transaction amount", "amt"),
+    "debit": ("debit", "withdrawal", "withdrawals", "debit amount"),
+    "credit": ("credit", "deposit", "deposits", "credit amount"),
+    "description": ("description", "memo", "payee", "name", "details", "narrative"),
+    "reference": ("reference", "transaction id", "id", "fitid", "check number"),
+}
+
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%Y/%m/%d", "%d.%m.%Y", "%Y%m%d")
+
+
+class ImportFormatError(ValueError):
+    """Raised when a statement file can't be recognised as CSV or OFX."""
+
+
+class Transaction:
+    __slots__ = ("end_offset", "date", "amount", "description", "reference")
+
+    def __init__(self, end_offset, date, amount, description, reference):
+        self.end_offset = end_offset
+        self.date = date
+        self.amount = amount
+        self.description = description
+        self.reference = reference
+
+
+class RejectedRow:
+    __slots__ = ("end_offset", "reason")
+
+    def __init__(self, end_offset, reason):
+        self.end_offset = end_offset
+        self.reason = reason
+
+
+# ---- parsing ----------------------------------------------------------------
+
+def parse_amount(raw):
+    text = (raw or "").strip()
+    if not text:
+        return None
+    negative = text.startswith("(") and text.endswith(")")
+    text = re.sub(r"[^0-9.\-]", "", text)
+    if not text or text in ("-", "."):
+        raise ValueError(f"Invalid amount: {raw!r}")
+    value = float(text)
+    return -abs(value) if negative else value
+
+
+def parse_date(raw):
+    text = (raw or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {raw!r}")
+
+
+def _resolve_columns(header):
+    normalized = [h.strip().lower() for h in header]
+    columns = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in normalized:
+                columns[field] = normalized.index(alias)
+                break
+    if "date" not in columns or not ("amount" in columns or "debit" in columns or "credit" in columns):
+        raise ImportFormatError("CSV header needs a date column and an amount (or debit/credit) column")
+    return columns
+
+
+def _cell(row, columns, field):
+    index = columns.get(field)
+    if index is None or index >= len(row):
+        return ""
+    return row[index]
+
+
+def iter_csv(handle, start_offset=0):
+    """
+    Yield Transaction/RejectedRow objects from a binary CSV handle, one physical line at a time.
+    Quoted fields spanning several lines are not supported (bank exports don't produce them).
+    """
+    header_line = handle.readline()
+    header_text = header_line.decode("utf-8-sig", errors="replace")
+    try:
+        dialect = csv.Sniffer().sniff(header_text, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    columns = _resolve_columns(next(csv.reader([header_text], dialect)))
+
+    offset = max(start_offset, handle.tell())
+    handle.seek(offset)
+    while True:
+        line = handle.readline()
+        if not line:
+            return
+        offset += len(line)
+        text = line.decode("utf-8", errors="replace").strip()
+        if not text:
+            continue
+        row = next(csv.reader([text], dialect))
+        try:
+            amount = parse_amount(_cell(row, columns, "amount"))
+            if amount is None:
+                credit = parse_amount(_cell(row, columns, "credit")) or 0.0
+                debit = parse_amount(_cell(row, columns, "debit")) or 0.0
+                amount = abs(credit) - abs(debit)
+            yield Transaction(
+                offset,
+                parse_date(_cell(row, columns, "date")),
+                amount,
+                _cell(row, columns, "description").strip(),
+                _cell(row, columns, "reference").strip(),
+            )
+        except ValueError as e:
+            yield RejectedRow(offset, str(e))
+
+
+_OFX_TAG = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def _parse_ofx_date(raw):
+    digits = re.match(r"\d+", raw.strip())
+    if not digits or len(digits.group()) < 8:
+        raise ValueError(f"Unrecognised OFX date: {raw!r}")
+    value = digits.group()
+    return datetime.strptime(value[:14] if len(value) >= 14 else value[:8],
+                             "%Y%m%d%H%M%S" if len(value) >= 14 else "%Y%m%d")
+
+
+def iter_ofx(handle, start_offset=0):
+    """
+    Yield Transaction/RejectedRow objects from a binary OFX (SGML or XML) handle by scanning
+    for <STMTTRN> blocks in fixed-size reads, so single-line OFX files stream too.
+    """
+    handle.seek(start_offset)
+    buffer = b""
+    buffer_start = start_offset
+    while True:
+        block = handle.read(READ_BLOCK_SIZE)
+        buffer += block
+        while True:
+            begin = buffer.find(b"<STMTTRN>")
+            if begin < 0:
+                break
+            end = buffer.find(b"</STMTTRN>", begin)
+            if end < 0:
+                break
+            end += len(b"</STMTTRN>")
+            end_offset = buffer_start + end
+            fields = {tag.upper(): value.strip()
+                      for tag, value in _OFX_TAG.findall(buffer[begin:end].decode("utf-8", errors="replace"))}
+            buffer = buffer[end:]
+            buffer_start = end_offset
+            try:
+                yield Transaction(
+                    end_offset,
+                    _parse_ofx_date(fields.get("DTPOSTED", "")),
+                    parse_amount(fields.get("TRNAMT")),
+                    fields.get("NAME") or fields.get("MEMO", ""),
+                    fields.get("FITID", ""),
+                )
+            except (ValueError, TypeError) as e:
+                yield RejectedRow(end_offset, str(e))
+
+        if not block:
+            return
+        # Keep only a possible partial block; anything before an unmatched <STMTTRN> is header noise
+        keep_from = buffer.rfind(b"<STMTTRN>")
+        if keep_from < 0:
+            keep_from = max(0, len(buffer) - len(b"</STMTTRN>"))
+        buffer_start += keep_from
+        buffer = buffer[keep_from:]
+
+
+def detect_format(path):
+    with open(path, "rb") as handle:
+        head = handle.read(4096).lstrip().upper()
+    if head.startswith(b"OFXHEADER") or b"<OFX>" in head or head.startswith(b"<?XML"):
+        return "ofx"
+    return "csv"
+
+
+# ---- pipeline ---------------------------------------------------------------
+
+def source_key(path):
+    """Identify a statement file by its size and leading bytes (stable across renames)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        digest.update(handle.read(READ_BLOCK_SIZE))
+    digest.update(str(os.path.getsize(path)).encode())
+    return digest.hexdigest()
+
+
+def row_hash(user_id, txn, occurrence):
+    """
+    Content hash used for de-duplication. `occurrence` distinguishes genuinely repeated
+    transactions (two identical coffees on the same day) within one statement.
+    """
+    key = "|".join([
+        str(user_id),
+        txn.date.strftime("%Y-%m-%d"),
+        f"{txn.amount:.2f}",
+        " ".join(txn.description.lower().split()),
+        txn.reference,
+        str(occurrence),
+    ])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class StatementImporter:
+    """
+    Import one statement file for one user. progress(stats) is called after every committed
+    batch with a dict of counters and the fraction of the file processed.
+    """
+
+    def __init__(self, user_id, path, fmt=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+        self.user_id = user_id
+        self.path = path
+        self.fmt = fmt or detect_format(path)
+        if self.fmt not in ("csv", "ofx"):
+            raise ImportFormatError(f"Unsupported statement format: {self.fmt}")
+        self.batch_size = batch_size
+        self.progress = progress
+        self.file_size = os.path.getsize(path)
+        self.source_key = source_key(path)
+        self.stats = {"imported": 0, "duplicates": 0, "rejected": 0, "errors": []}
+        # Occurrence counters for the date currently being read (statements are date ordered);
+        # checkpointed with the offset so resumed imports hash identically.
+        self._occurrences_date = None
+        self._occurrences = {}
+
+    def _load_checkpoint(self, cursor, restart):
+        if restart:
+            cursor.execute("DELETE FROM statement_imports WHERE user_id=%s AND source_key=%s",
+                           (self.user_id, self.source_key))
+            return 0
+        cursor.execute(
+            "SELECT byte_offset, rows_imported, rows_duplicate, rows_rejected, state_json, status "
+            "FROM statement_imports WHERE user_id=%s AND source_key=%s",
+            (self.user_id, self.source_key)
+        )
+        row = cursor.fetchone()
+        if not row:
+            cursor.execute(
+                "INSERT INTO statement_imports (user_id, source_key, file_name, file_size, status) "
+                "VALUES (%s, %s, %s, %s, 'running')",
+                (self.user_id, self.source_key, os.path.basename(self.path), self.file_size)
+            )
+            return 0
+        offset, imported, duplicates, rejected, state_json, status = row
+        self.stats.update(imported=imported, duplicates=duplicates, rejected=rejected)
+        if state_json:
+            state = json.loads(state_json)
+            self._occurrences_date = state.get("date")
+            self._occurrences = state.get("occurrences", {})
+        return self.file_size if status == "completed" else offset
+
+    def _save_checkpoint(self, cursor, offset, status):
+        state = json.dumps({"date": self._occurrences_date, "occurrences": self._occurrences})
+        cursor.execute(
+            "UPDATE statement_imports SET byte_offset=%s, rows_imported=%s, rows_duplicate=%s, "
+            "rows_rejected=%s, state_json=%s, status=%s WHERE user_id=%s AND source_key=%s",
+            (offset, self.stats["imported"], self.stats["duplicates"], self.stats["rejected"],
+             state, status, self.user_id, self.source_key)
+        )
+
+    def _hash(self, txn):
+        day = txn.date.strftime("%Y-%m-%d")
+        if day != self._occurrences_date:
+            self._occurrences_date = day
+            self._occurrences = {}
+        base = row_hash(self.user_id, txn, 0)
+        occurrence = self._occurrences.get(base, 0)
+        self._occurrences[base] = occurrence + 1
+        return base if occurrence == 0 else row_hash(self.user_id, txn, occurrence)
+
+    def _commit_batch(self, conn, cursor, batch, offset):
+        hashed = [(self._hash(txn), txn) for txn in batch]
+        existing = set()
+        if hashed:
+            placeholders = ", ".join(["%s"] * len(hashed))
+            cursor.execute(
+                f"SELECT row_hash FROM import_row_hashes WHERE user_id=%s AND row_hash IN ({placeholders})",
+                [self.user_id] + [h for h, _ in hashed]
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+
+        incomes, expenses, new_hashes = [], [], []
+        for digest, txn in hashed:
+            if digest in existing:
+                self.stats["duplicates"] += 1
+                continue
+            existing.add(digest)
+            new_hashes.append((self.user_id, digest))
+            entry = {"amount": abs(txn.amount), "created_at": txn.date}
+            (incomes if txn.amount > 0 else expenses).append(entry)
+
+        if incomes:
+            db_utils.insert_entries(cursor, self.user_id, incomes, "incomes")
+        if expenses:
+            db_utils.insert_entries(cursor, self.user_id, expenses, "expenses")
+        if new_hashes:
+            cursor.executemany(
+                "INSERT INTO import_row_hashes (user_id, row_hash) VALUES (%s, %s)", new_hashes
+            )
+        self.stats["imported"] += len(new_hashes)
+        self._save_checkpoint(cursor, offset, "running")
+        conn.commit()
+        self._report(offset)
+
+    def _report(self, offset):
+        if self.progress:
+            done = offset / self.file_size if self.file_size else 1.0
+            self.progress(dict(self.stats, offset=offset, fraction=round(done, 4)))
+
+    def run(self, restart=False):
+        """Run (or resume) the import and return the final counters."""
+        conn = db_utils.get_connection()
+        cursor = conn.cursor()
+        try:
+            offset = self._load_checkpoint(cursor, restart)
+            if restart:
+                cursor.execute(
+                    "INSERT INTO statement_imports (user_id, source_key, file_name, file_size, status) "
+                    "VALUES (%s, %s, %s, %s, 'running')",
+                    (self.user_id, self.source_key, os.path.basename(self.path), self.file_size)
+                )
+            conn.commit()
+
+            if offset < self.file_size:
+                parse = iter_ofx if self.fmt == "ofx" else iter_csv
+                batch = []
+                with open(self.path, "rb") as handle:
+                    for item in parse(handle, offset):
+                        offset = item.end_offset
+                        if isinstance(item, RejectedRow):
+                            self.stats["rejected"] += 1
+                            if len(self.stats["errors"]) < 20:
+                                self.stats["errors"].append(f"byte {item.end_offset}: {item.reason}")
+                            continue
+                        if item.amount == 0:
+                            self.stats["rejected"] += 1
+                            continue
+                        batch.append(item)
+                        if len(batch) >= self.batch_size:
+                            self._commit_batch(conn, cursor, batch, offset)
+                            batch = []
+                self._commit_batch(conn, cursor, batch, self.file_size)
+
+            self._save_checkpoint(cursor, self.file_size, "completed")
+            conn.commit()
+            return self.stats
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+
+def import_statement(user_id, path, fmt=None, batch_size=DEFAULT_BATCH_SIZE, progress=None, restart=False):
+    return StatementImporter(user_id, path, fmt=fmt, batch_size=batch_size, progress=progress).run(restart=restart)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a CSV or OFX bank statement")
+    parser.add_argument("path")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--format", choices=("csv", "ofx"))
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+    args = parser.parse_args()
+
+    def report(stats):
+        print(f"{stats['fraction'] * 100:5.1f}%  imported={stats['imported']} "
+              f"duplicates={stats['duplicates']} rejected={stats['rejected']}")
+
+    stats = import_statement(args.user_id, args.path, fmt=args.format, batch_size=args.batch_size,
+                             progress=report, restart=args.restart)
+    for error in stats["errors"]:
+        print(f"rejected {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# token_revocation.py
+#
+# JWT revocation shared across workers and restarts. Logout inserts the token's jti into
+# revoked_tokens together with the token's expiry. Each process keeps a Bloom filter of the
+# revoked jtis that haven't expired and keeps it current by reading only rows added since its last
+# refresh (at most one indexed range query per REVOCATION_REFRESH_SECONDS). Ids are assigned at
+# insert but rows become visible at commit, so a row can appear below the last id already read;
+# each refresh also re-reads rows revoked since shortly before the previous one to catch those. A jti the filter has
+# never seen is definitely not revoked, so the usual @jwt_required check costs no I/O; a filter hit
+# is confirmed with a unique-key lookup, since it may be a false positive.
+#
+# Rows are purged once their token has expired (a revocation of an expired token is moot), and the
+# filter is rebuilt from the live rows every so often so it doesn't keep expired entries forever.
+# Tokens issued without an expiry (JWT_ACCESS_TOKEN_EXPIRES_HOURS=0) stay revoked indefinitely.
+#
+# Usage: python token_revocation.py purge | stats
+#
+
+import argparse
+import hashlib
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import db_utils
+
+REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "1"))
+REBUILD_SECONDS = float(os.getenv("REVOCATION_REBUILD_SECONDS", "3600"))
+FALSE_POSITIVE_RATE = 0.001
+MIN_CAPACITY = 10000
+# How late (in seconds) a revocation may commit after its row was inserted and still be picked up
+# by the next refresh rather than the next rebuild
+LATE_COMMIT_SECONDS = float(os.getenv("REVOCATION_LATE_COMMIT_SECONDS", "60"))
+PURGE_BATCH_SIZE = 1000
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one BLAKE2b digest)."""
+
+    def __init__(self, capacity, false_positive_rate=FALSE_POSITIVE_RATE):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(int(-self.capacity * math.log(false_positive_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationCache:
+    """Per-process view of revoked_tokens."""
+
+    def __init__(self):
+        self.bloom = None
+        self.last_id = 0
+        self.read_at = 0.0
+        self.refreshed_at = 0.0
+        self.rebuilt_at = 0.0
+        self.lock = threading.Lock()
+        self.stats = {"checks": 0, "bloom_hits": 0, "confirmed": 0, "refreshes": 0, "rebuilds": 0,
+                      "refresh_errors": 0}
+
+    def _rebuild(self, cur):
+        read_at = time.monotonic()
+        cur.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM revoked_tokens")
+        live, max_id = cur.fetchone()
+        bloom = BloomFilter(max(2 * live, MIN_CAPACITY))
+        cur.execute("""
+            SELECT jti FROM revoked_tokens
+            WHERE id <= %s AND (expires_at IS NULL OR expires_at > UTC_TIMESTAMP())
+        """, (max_id,))
+        for (jti,) in cur:
+            bloom.add(jti)
+        self.bloom = bloom
+        self.last_id = max_id
+        self.read_at = read_at
+        self.rebuilt_at = time.monotonic()
+        self.stats["rebuilds"] += 1
+
+    def _read_new(self, cur):
+        # New ids, plus anything revoked since shortly before the last read: a row inserted before
+        # that read but committed after it has an id we've passed, but a recent revoked_at
+        read_at = time.monotonic()
+        window = math.ceil(read_at - self.read_at + LATE_COMMIT_SECONDS)
+        cur.execute("""
+            SELECT id, jti FROM revoked_tokens
+            WHERE id > %s OR revoked_at >= NOW() - INTERVAL %s SECOND
+            ORDER BY id
+        """, (self.last_id, window))
+        for row_id, jti in cur.fetchall():
+            # Re-read rows are usually in the filter already; adding them again would inflate count
+            if row_id > self.last_id or jti not in self.bloom:
+                self.bloom.add(jti)
+            self.last_id = max(self.last_id, row_id)
+        self.read_at = read_at
+
+    def refresh(self, force=False):
+        """Bring the filter up to date if it is older than REFRESH_SECONDS (or force)."""
+        now = time.monotonic()
+        if not force and self.bloom is not None and now - self.refreshed_at < REFRESH_SECONDS:
+            return
+        # One thread refreshes; the others keep using the current filter rather than wait
+        if not self.lock.acquire(blocking=self.bloom is None or force):
+            return
+        try:
+            now = time.monotonic()
+            if not force and self.bloom is not None and now - self.refreshed_at < REFRESH_SECONDS:
+                return
+            # Set before the I/O so a failing database is retried once per interval, not per request
+            self.refreshed_at = now
+            rebuild = (self.bloom is None or now - self.rebuilt_at >= REBUILD_SECONDS
+                       or self.bloom.count > self.bloom.capacity)
+            if rebuild and self.bloom is not None:
+                # Drop expired rows first so the rebuilt filter is sized to live revocations
+                purge_expired()
+            conn = db_utils.get_connection()
+            try:
+                with conn.cursor() as cur:
+                    if rebuild:
+                        self._rebuild(cur)
+                    else:
+                        self._read_new(cur)
+            finally:
+                conn.close()
+            self.stats["refreshes"] += 1
+        finally:
+            self.lock.release()
+
+    def add_local(self, jti):
+        if self.bloom is not None:
+            self.bloom.add(jti)
+
+
+_cache = RevocationCache()
+
+
+def _expiry(exp):
+    """DATETIME (UTC) for a JWT exp claim, or None for a token that never expires."""
+    return datetime.fromtimestamp(int(exp), timezone.utc).replace(tzinfo=None) if exp else None
+
+
+def revoke(jti, user_id=None, exp=None):
+    """Record a revoked token; exp is the token's exp claim (seconds since the epoch)."""
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO revoked_tokens (jti, user_id, expires_at) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE jti = jti
+            """, (jti, user_id, _expiry(exp)))
+        conn.commit()
+    finally:
+        conn.close()
+    # Seen by this worker at once; other workers pick it up on their next refresh
+    _cache.add_local(jti)
+
+
+def is_revoked(jti):
+    if not jti:
+        return False
+    _cache.stats["checks"] += 1
+    try:
+        _cache.refresh()
+    except Exception as e:
+        _cache.stats["refresh_errors"] += 1
+        print(f"Error refreshing token revocations: {e}")
+        if _cache.bloom is None:
+            raise
+    if jti not in _cache.bloom:
+        return False
+
+    _cache.stats["bloom_hits"] += 1
+    conn = db_utils.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM revoked_tokens WHERE jti=%s LIMIT 1", (jti,))
+            revoked = cur.fetchone() is not None
+    finally:
+        conn.close()
+    _cache.stats["confirmed"] += revoked
+    return revoked
+
+
+def purge_expired(batch_size=PURGE_BATCH_SIZE):
+    """Delete revocations whose tokens have expired; returns the number of rows removed."""
+    removed = 0
+    while True:
+        conn = db_utils.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM revoked_tokens WHERE expires_at < UTC_TIMESTAMP() LIMIT %s", (batch_size,))
+                deleted = cur.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        removed += deleted
+        if deleted < batch_size:
+            return removed
+
+
+def revocation_stats():
+    bloom = _cache.bloom
+    return dict(_cache.stats, bloom_entries=bloom.count if bloom else 0,
+                bloom_capacity=bloom.capacity if bloom else 0, last_id=_cache.last_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the shared JWT revocation store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("purge", help="delete revocations of tokens that have expired")
+    sub.add_parser("stats", help="load the revocation filter and print its size")
+    args = parser.parse_args()
+
+    if args.command == "purge":
+        print(f"Purged {purge_expired()} expired revocations")
+    else:
+        _cache.refresh(force=True)
+        print(revocation_stats())
+
+
+if __name__ == "__main__":
+    main()
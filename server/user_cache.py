@@ -0,0 +1,100 @@
+# user_cache.py
+#
+# Per-process cache of user profiles and preferences, so routes that look up the current user on
+# every request (profile, recommendations, portfolio, goal projection) skip the users query and
+# the Fernet decrypt of annual_income. Entries are keyed by (kind, user_id), bounded by an LRU
+# limit and a TTL, and dropped by db_utils whenever it writes the user's profile or preferences.
+#
+# The cache is per process: a write handled by one worker invalidates only that worker's copy,
+# so other workers may serve the old values for up to USER_CACHE_TTL_SECONDS.
+#
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.getenv("USER_CACHE_SIZE", "10000"))
+TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+
+KINDS = ("profile", "preferences")
+
+
+class UserCache:
+    """
+    Thread-safe LRU cache with expiry. A load that overlaps an invalidation isn't stored, so a
+    read racing a write can't put the pre-write row back in the cache.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.max_entries = max(int(max_entries), 1)
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, kind, user_id, loader):
+        """Cached value for (kind, user_id), calling loader(user_id) on a miss; None is not cached."""
+        key = (kind, user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return dict(entry[1])
+                del self._entries[key]
+                self.stats["expirations"] += 1
+            self.stats["misses"] += 1
+            epoch = self._epoch
+
+        value = loader(user_id)
+        if value is None or self.ttl <= 0:
+            return value
+        with self._lock:
+            if epoch == self._epoch:
+                self._entries[key] = (time.monotonic() + self.ttl, dict(value))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats["evictions"] += 1
+        return value
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._epoch += 1
+            for kind in KINDS:
+                if self._entries.pop((kind, user_id), None) is not None:
+                    self.stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def cache_stats(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats, size=len(self._entries), max_entries=self.max_entries, ttl_seconds=self.ttl,
+                        hit_rate=round(self.stats["hits"] / lookups, 4) if lookups else None)
+
+
+_cache = UserCache()
+
+
+def get(kind, user_id, loader):
+    return _cache.get(kind, user_id, loader)
+
+
+def invalidate(user_id):
+    _cache.invalidate(user_id)
+
+
+def clear():
+    _cache.clear()
+
+
+def cache_stats():
+    return _cache.cache_stats()